@@ -0,0 +1,122 @@
+"""Cache the output of parse steps on disk.
+
+The output of a parse step is stored under a key derived from the checksum of
+its input files, the other step arguments, the identity of the step function
+and the prp version. The cache is bounded in size, the least recently used
+entries are removed when it grows too large.
+
+The cache entries are pickled and should only be read from a directory
+that is trusted.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+from typing import Any, Callable
+
+from . import VERSION
+from .parse.utils import get_checksum
+
+LOG = logging.getLogger(__name__)
+
+CACHE_SUFFIX = ".pkl"
+
+
+class ParseCache:
+    """Size bounded cache of parse step outputs."""
+
+    def __init__(self, cache_dir: str, max_size: int):
+        """Setup the cache directory.
+
+        :param cache_dir: Directory where the entries are stored
+        :type cache_dir: str
+        :param max_size: Maximum size of the cache in bytes
+        :type max_size: int
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_key(self, func: Callable, kwargs: dict[str, Any]) -> str:
+        """Get the cache key of a parse step.
+
+        Arguments that are paths to files are represented by the checksum of
+        the file content.
+        """
+        inputs = {}
+        for name, value in sorted(kwargs.items()):
+            checksum = get_checksum(value) if isinstance(value, str) else None
+            inputs[name] = {"sha256": checksum} if checksum else value
+        content = {
+            "parser": f"{func.__module__}.{func.__qualname__}",
+            "prp_version": VERSION,
+            "inputs": inputs,
+        }
+        serialized = json.dumps(content, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{CACHE_SUFFIX}")
+
+    def get(self, key: str) -> Any | None:
+        """Get a cached step output, returns None if it is not cached."""
+        path = self._get_path(key)
+        try:
+            with open(path, "rb") as inpt:
+                value = pickle.load(inpt)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            LOG.warning("Ignoring unreadable cache entry: %s", path)
+            return None
+        # mark the entry as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store a step output and evict old entries if the cache is full."""
+        path = self._get_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as outp:
+            pickle.dump(value, outp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits."""
+        entries = []
+        with os.scandir(self.cache_dir) as dir_entries:
+            for entry in dir_entries:
+                if not entry.name.endswith(CACHE_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        cache_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if cache_size <= self.max_size:
+                break
+            LOG.debug("Evicting cache entry: %s", path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            cache_size -= size
+
+    def __call__(self, func: Callable, kwargs: dict[str, Any]) -> Any:
+        """Run a parse step or get its output from the cache."""
+        key = self.get_key(func, kwargs)
+        value = self.get(key)
+        if value is None:
+            value = func(**kwargs)
+            self.put(key, value)
+        else:
+            LOG.info("Using cached result of %s", func.__name__)
+        return value
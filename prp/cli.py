@@ -2,53 +2,25 @@
 
 import json
 import logging
+import os
+from functools import partial
 from pathlib import Path
+from typing import TYPE_CHECKING, Iterable
 
 import click
-import numpy as np
-import pandas as pd
-import pysam
-from cyvcf2 import VCF, Writer
-from pydantic import TypeAdapter, ValidationError
 
 from prp import VERSION as __version__
 
-from .models.metadata import SoupType, SoupVersion
-from .models.phenotype import ElementType
-from .models.qc import QcMethodIndex, QcSoftware
-from .models.sample import MethodIndex, PipelineResult, ReferenceGenome, IgvAnnotationTrack
-from .parse import (
-    load_variants,
-    parse_alignment_results,
-    parse_amrfinder_amr_pred,
-    parse_amrfinder_vir_pred,
-    parse_cgmlst_results,
-    parse_emmtyper_pred,
-    parse_kraken_result,
-    parse_mlst_results,
-    parse_mykrobe_amr_pred,
-    parse_mykrobe_lineage_results,
-    parse_postalignqc_results,
-    parse_quast_results,
-    parse_resfinder_amr_pred,
-    parse_serotypefinder_oh_typing,
-    parse_shigapass_pred,
-    parse_tbprofiler_amr_pred,
-    parse_tbprofiler_lineage_results,
-    parse_virulencefinder_stx_typing,
-    parse_virulencefinder_vir_pred,
-)
-from .parse.phenotype.tbprofiler import (
-    EXPECTED_SCHEMA_VERSION as EXPECTED_TBPROFILER_SCHEMA_VERSION,
-)
-from .parse.metadata import get_database_info, get_gb_genome_version, parse_run_info
-from .parse.species import get_mykrobe_spp_prediction
-from .parse.utils import _get_path, get_db_version, parse_input_dir
-from .parse.variant import annotate_delly_variants
+if TYPE_CHECKING:  # pragma: no cover
+    from .cache import ParseCache
+    from .models.manifest import SampleManifest
+    from .models.sample import PipelineResult
 
-LOG = logging.getLogger(__name__)
+# Models, parsers and their dependencies are imported by the commands that use
+# them to keep the startup time of the cli short.
+# pylint: disable=import-outside-toplevel
 
-OUTPUT_SCHEMA_VERSION = 1
+LOG = logging.getLogger(__name__)
 
 
 @click.group()
@@ -69,6 +41,31 @@ def cli(silent, debug):
     )
 
 
+def _cache_options(func):
+    """Add options for caching parse step outputs to a command."""
+    func = click.option(
+        "--cache-size",
+        type=click.IntRange(min=1),
+        default=1024,
+        show_default=True,
+        help="Maximum size of the parse cache in MB",
+    )(func)
+    return click.option(
+        "--cache-dir",
+        type=click.Path(file_okay=False),
+        help="Reuse parsed results of identical input files from this directory",
+    )(func)
+
+
+def _get_cache(cache_dir: str | None, cache_size: int) -> "ParseCache | None":
+    """Setup the parse cache if a cache directory was given."""
+    if cache_dir is None:
+        return None
+    from .cache import ParseCache
+
+    return ParseCache(cache_dir, max_size=cache_size * 1024**2)
+
+
 @cli.command()
 @click.option("-i", "--sample-id", required=True, help="Sample identifier")
 @click.option(
@@ -120,7 +117,9 @@ def cli(silent, debug):
 @click.option("-e", "--emmtyper", type=click.Path(), help="Emmtyper m-type prediction results")
 @click.option("-g", "--shigapass", type=click.Path(), help="shigapass results")
 @click.option("-t", "--tbprofiler", type=click.Path(), help="tbprofiler results")
-@click.option("--bam", type=click.Path(), help="Read mapping to reference genome")
+@click.option(
+    "--bam", type=click.Path(), help="Read mapping to reference genome, bam or cram"
+)
 @click.option(
     "--reference-genome-fasta", type=click.Path(), help="reference genome fasta file"
 )
@@ -136,12 +135,32 @@ def cli(silent, debug):
 @click.option("--vcf", type=click.Path(), help="VCF filepath")
 @click.option("--snv-vcf", type=click.Path(), help="VCF with SNV variants")
 @click.option("--sv-vcf", type=click.Path(), help="VCF with SV variants")
+@click.option(
+    "--variant-regions",
+    type=click.Path(),
+    help="Only load variants in the regions of this bed file, read with the VCF index",
+)
 @click.option("--symlink-dir", type=click.Path(), help="Dir for symlink")
 @click.option("--correct_alleles", is_flag=True, help="Correct alleles")
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of worker processes used to parse results",
+)
+@_cache_options
+@click.option(
+    "--profile",
+    type=click.Path(dir_okay=False),
+    help="Write the time and memory used by each stage to a json file",
+)
 @click.option(
     "-o", "--output", required=True, type=click.Path(), help="output filepath"
 )
+@click.pass_context
 def create_bonsai_input(
+    ctx,
     sample_id,
     run_metadata,
     quast,
@@ -165,226 +184,70 @@ def create_bonsai_input(
     vcf,
     snv_vcf,
     sv_vcf,
+    variant_regions,
     symlink_dir,
     correct_alleles,
+    workers,
+    cache_dir,
+    cache_size,
+    profile,
     output,
 ):  # pylint: disable=too-many-arguments
     """Combine pipeline results into a standardized json output file."""
-    LOG.info("Start generating pipeline result json")
-    # Get basic sample object
-    sample_info, seq_info, pipeline_info = parse_run_info(run_metadata, process_metadata)
-    results = {
-        "sequencing": seq_info,
-        "pipeline": pipeline_info,
-        "qc": [],
-        "typing_result": [],
-        "element_type_result": [],
-        **sample_info  # add sample_name & lims_id
-    }
-    # qc
-    if quast:
-        LOG.info("Parse quast results")
-        res: QcMethodIndex = parse_quast_results(quast)
-        results["qc"].append(res)
-    if quality:
-        LOG.info("Parse quality results")
-        res: QcMethodIndex = parse_postalignqc_results(quality)
-        results["qc"].append(res)
-
-    # typing
-    if mlst:
-        LOG.info("Parse mlst results")
-        res: MethodIndex = parse_mlst_results(mlst)
-        results["typing_result"].append(res)
-    if cgmlst:
-        LOG.info("Parse cgmlst results")
-        res: MethodIndex = parse_cgmlst_results(cgmlst, correct_alleles=correct_alleles)
-        results["typing_result"].append(res)
-
-    # resfinder of different types
-    if resfinder:
-        LOG.info("Parse resistance results")
-        with open(resfinder, "r", encoding="utf-8") as resfinder_json:
-            pred_res = json.load(resfinder_json)
-            methods = [
-                ElementType.AMR,
-                ElementType.STRESS,
-            ]
-            for method in methods:
-                res: MethodIndex = parse_resfinder_amr_pred(pred_res, method)
-                # exclude empty results from output
-                if len(res.result.genes) > 0 and len(res.result.variants) > 0:
-                    results["element_type_result"].append(res)
-
-    # amrfinder
-    if amrfinder:
-        LOG.info("Parse amr results")
-        methods = [
-            ElementType.AMR,
-            ElementType.STRESS,
-        ]
-        for method in methods:
-            res: MethodIndex = parse_amrfinder_amr_pred(amrfinder, method)
-            results["element_type_result"].append(res)
-        vir: MethodIndex = parse_amrfinder_vir_pred(amrfinder)
-        results["element_type_result"].append(vir)
-
-    # get virulence factors in sample
-    if virulencefinder:
-        LOG.info("Parse virulencefinder results")
-        # virulence genes
-        vir: MethodIndex | None = parse_virulencefinder_vir_pred(virulencefinder)
-        if vir is not None:
-            results["element_type_result"].append(vir)
-
-        # stx typing
-        res: MethodIndex | None = parse_virulencefinder_stx_typing(virulencefinder)
-        if res is not None:
-            results["typing_result"].append(res)
-
-    if serotypefinder:
-        LOG.info("Parse serotypefinder results")
-        # OH typing
-        res: MethodIndex | None = parse_serotypefinder_oh_typing(serotypefinder)
-        if res is not None:
-            results["typing_result"].extend(res)
-
-    if emmtyper:
-        LOG.info("Parse emmtyper results")
-        # Emmtyping
-        res: MethodIndex | None = parse_emmtyper_pred(emmtyper)
-        if res is not None:
-            results["typing_result"].extend(res)
-
-    if shigapass:
-        LOG.info("Parse shigapass results")
-        # Shigatyping
-        res: MethodIndex | None = parse_shigapass_pred(shigapass)
-        if res is not None:
-            results["typing_result"].append(res)
-
-    # species id
-    results["species_prediction"] = []
-    if kraken:
-        LOG.info("Parse kraken results")
-        results["species_prediction"].append(parse_kraken_result(kraken))
-
-    # mycobacterium tuberculosis
-    # mykrobe
-    if mykrobe:
-        LOG.info("Parse mykrobe results")
-        pred_res = pd.read_csv(mykrobe, quotechar='"')
-        pred_res.columns.values[3] = "variants"
-        pred_res.columns.values[4] = "genes"
-        pred_res.replace(["NA", np.nan], None, inplace=True)
-        pred_res = pred_res.to_dict(orient="records")
-
-        # verify that sample id is in prediction result
-        if not sample_id in pred_res[0]["sample"]:
-            LOG.warning(
-                "Sample id %s is not in Mykrobe result, possible sample mixup",
-                sample_id,
-            )
-            raise click.Abort()
-
-        # add mykrobe db version to the list of softwares
-        results['pipeline'].softwares.append(
-            SoupVersion(
-                name="mykrobe-predictor",
-                version=pred_res[0]["mykrobe_version"],
-                type=SoupType.DB,
-            )
-        )
-        # parse mykrobe result
-        amr_res = parse_mykrobe_amr_pred(pred_res)
-        if amr_res is not None:
-            results["element_type_result"].append(amr_res)
-
-        lin_res: MethodIndex | None = parse_mykrobe_lineage_results(pred_res)
-        if lin_res is not None:
-            results["typing_result"].append(lin_res)
-
-        # parse mykrobe species prediction result
-        results["species_prediction"].append(get_mykrobe_spp_prediction(pred_res))
-
-    # tbprofiler
-    if tbprofiler:
-        LOG.info("Parse tbprofiler results")
-        with open(tbprofiler, "r", encoding="utf-8") as tbprofiler_json:
-            pred_res = json.load(tbprofiler_json)
-            # check schema version
-            schema_version = pred_res.get("schema_version")
-            if not EXPECTED_TBPROFILER_SCHEMA_VERSION == schema_version:
-                LOG.warning(
-                    "Unsupported TbProfiler schema version - output might be inaccurate; result schema: %s; expected: %s",
-                    schema_version,
-                    EXPECTED_TBPROFILER_SCHEMA_VERSION,
-                )
-            # store pipeline version
-            db_info: list[SoupVersion] = []
-            db_info = [
-                SoupVersion(
-                    name=pred_res["pipeline"]["db_version"]["name"],
-                    version=get_db_version(pred_res["pipeline"]["db_version"]),
-                    type=SoupType.DB,
-                )
-            ]
-            sw_list = results["pipeline"].softwares.extend(db_info)
-            lin_res: MethodIndex = parse_tbprofiler_lineage_results(pred_res)
-            results["typing_result"].append(lin_res)
-            amr_res: MethodIndex = parse_tbprofiler_amr_pred(pred_res)
-            results["element_type_result"].append(amr_res)
-
-    # parse SNV and SV variants.
-    if snv_vcf:
-        results["snv_variants"] = load_variants(snv_vcf)["snv_variants"]
-
-    if sv_vcf:
-        results["sv_variants"] = load_variants(sv_vcf)["sv_variants"]
-
-    if vcf:
-        results.update(load_variants(vcf))
-
-    # entries for reference genome and read mapping
-    if all([bam, reference_genome_fasta, reference_genome_gff]):
-        # verify that everything pertains to the same reference genome
-        ref_accession, ref_name = get_gb_genome_version(reference_genome_fasta)
-        # store file names
-        fasta_idx_path = fasta_idx_path = Path(f"{reference_genome_fasta}.fai")
-        results["reference_genome"] = ReferenceGenome(
-            name=ref_name,
-            accession=ref_accession,
-            fasta=Path(reference_genome_fasta).name,
-            fasta_index=fasta_idx_path.name if fasta_idx_path.is_file() else None,
-            genes=Path(reference_genome_gff).name,
-        )
-        results["read_mapping"] = _get_path(symlink_dir, "bam", bam)
-        # add annotations
-        annotations = [
-            {"name": f"annotation_{i}", "file": Path(annot).name}
-            for i, annot in enumerate(genome_annotation, start=1)
-        ]
-        vcf_dict = {"SV": sv_vcf, "SNV": snv_vcf, "VCF": vcf}
-        for name in vcf_dict:
-            vcf_filepath = vcf_dict[name]
-            if vcf_filepath:
-                vcf_filepath = _get_path(symlink_dir, "vcf", vcf_filepath)
-                annotations.append({"name": name, "file": vcf_filepath})
-        # store annotation results
-        results["genome_annotation"] = annotations if annotations else None
+    from pydantic import ValidationError
+
+    from .parse.sample import create_pipeline_result
+    from .profiling import profiling
+
+    ctx.with_resource(profiling(profile, command="create_bonsai_input"))
 
+    LOG.info("Start generating pipeline result json")
     try:
-        output_data = PipelineResult(
-            sample_id=sample_id, schema_version=OUTPUT_SCHEMA_VERSION, **results
+        output_data = create_pipeline_result(
+            sample_id=sample_id,
+            run_metadata=run_metadata,
+            process_metadata=process_metadata,
+            quast=quast,
+            quality=quality,
+            mlst=mlst,
+            cgmlst=cgmlst,
+            correct_alleles=correct_alleles,
+            resfinder=resfinder,
+            amrfinder=amrfinder,
+            virulencefinder=virulencefinder,
+            serotypefinder=serotypefinder,
+            emmtyper=emmtyper,
+            shigapass=shigapass,
+            kraken=kraken,
+            mykrobe=mykrobe,
+            tbprofiler=tbprofiler,
+            snv_vcf=snv_vcf,
+            sv_vcf=sv_vcf,
+            vcf=vcf,
+            variant_regions=variant_regions,
+            bam=bam,
+            reference_genome_fasta=reference_genome_fasta,
+            reference_genome_gff=reference_genome_gff,
+            genome_annotation=genome_annotation,
+            symlink_dir=symlink_dir,
+            workers=workers,
+            cache=_get_cache(cache_dir, cache_size),
         )
     except ValidationError as err:
         click.secho("Generated result failed validation", fg="red")
         click.secho(err)
         raise click.Abort
+    _write_pipeline_result(output_data, output)
+    click.secho("Finished generating pipeline output", fg="green")
+
+
+def _write_pipeline_result(output_data: "PipelineResult", output: str) -> None:
+    """Write sample result to file."""
+    from .profiling import profile_stage
+
     LOG.info("Storing results to: %s", output)
-    with open(output, "w", encoding="utf-8") as fout:
+    with profile_stage("serialize"), open(output, "w", encoding="utf-8") as fout:
         fout.write(output_data.model_dump_json(indent=2))
-    click.secho("Finished generating pipeline output", fg="green")
 
 
 @cli.command()
@@ -415,19 +278,318 @@ def create_bonsai_input(
     type=click.Path(file_okay=False, dir_okay=True),
     help="Output directory to incl. speciesDir [default: input_dir]",
 )
+@click.option(
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of samples to process in parallel",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Rerun all samples even if their inputs are unchanged",
+)
+@_cache_options
 @click.pass_context
-def rerun_bonsai_input(ctx, input_dir, jasen_dir, symlink_dir, output_dir) -> None:
-    """Rerun bonsai input creation for all samples in input directory."""
+def rerun_bonsai_input(
+    ctx,
+    input_dir,
+    jasen_dir,
+    symlink_dir,
+    output_dir,
+    jobs,
+    force,
+    cache_dir,
+    cache_size,
+) -> None:  # pylint: disable=too-many-arguments
+    """Rerun bonsai input creation for all samples in input directory.
+
+    Samples whose inputs are unchanged since the last rerun are skipped.
+    """
+    from .manifest import new_manifest, read_manifest, write_manifest
+    from .models.manifest import SampleManifest
+    from .parse.utils import parse_input_dir
+
     if input_dir:
         LOG.info("Parse input directory")
         input_arrays = parse_input_dir(input_dir, jasen_dir, symlink_dir, output_dir)
-        for input_array in input_arrays:
-            ctx.invoke(create_bonsai_input, **input_array)
+        output_dir = (
+            os.path.join(input_dir.rstrip("/"), "analysis_result")
+            if not output_dir
+            else output_dir
+        )
+        manifest = None if force else read_manifest(output_dir)
+        if manifest is None:
+            manifest = new_manifest()
+        previous = [manifest.samples.get(arr["sample_id"]) for arr in input_arrays]
+        rerun_sample = partial(_rerun_sample, cache=_get_cache(cache_dir, cache_size))
+        if jobs > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            LOG.info("Processing %d samples using %d jobs", len(input_arrays), jobs)
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                summary = list(executor.map(rerun_sample, input_arrays, previous))
+        else:
+            summary = list(map(rerun_sample, input_arrays, previous))
+
+        # report the outcome for each sample
+        n_failed = 0
+        for input_array, (sample_id, err, inputs) in zip(input_arrays, summary):
+            if err is None:
+                click.secho(f"{sample_id}: OK", fg="green")
+                manifest.samples[sample_id] = SampleManifest(
+                    output=input_array["output"], inputs=inputs
+                )
+            elif inputs is not None:
+                click.secho(f"{sample_id}: {err}")
+            else:
+                n_failed += 1
+                click.secho(f"{sample_id}: FAILED ({err})", fg="red")
+                manifest.samples.pop(sample_id, None)
+        write_manifest(manifest, output_dir)
+        click.secho(
+            f"Processed {len(summary)} samples, {n_failed} failed",
+            fg="red" if n_failed else "green",
+        )
+        if n_failed:
+            ctx.exit(1)
+
+
+def _rerun_sample(
+    input_array: dict[str, str],
+    previous: "SampleManifest | None" = None,
+    cache: "ParseCache | None" = None,
+) -> tuple[str, str | None, dict[str, str] | None]:
+    """Create bonsai input for one sample and isolate any failure.
+
+    :param input_array: Keyword arguments to create_bonsai_input
+    :type input_array: dict[str, str]
+    :param previous: Manifest entry from the previous run, defaults to None
+    :type previous: SampleManifest | None, optional
+    :param cache: Cache of parse step outputs, defaults to None
+    :type cache: ParseCache | None, optional
+    :return: Sample id, a message if the sample failed or was skipped and the
+        sample inputs if the result is up to date.
+    :rtype: tuple[str, str | None, dict[str, str] | None]
+    """
+    from .manifest import get_reusable_steps, get_sample_inputs
+    from .parse.sample import create_pipeline_result
+
+    sample_id = input_array["sample_id"]
+    try:
+        inputs = get_sample_inputs(input_array)
+        reused = get_reusable_steps(inputs, previous)
+        if reused is None:
+            return sample_id, "unchanged", inputs
+        kwargs = {key: val for key, val in input_array.items() if key != "output"}
+        output_data = create_pipeline_result(**kwargs, reused=reused, cache=cache)
+        _write_pipeline_result(output_data, input_array["output"])
+    except Exception as err:  # pylint: disable=broad-except
+        return sample_id, _get_failure_message(sample_id, err), None
+    return sample_id, None, inputs
+
+
+def _get_failure_message(sample_id: str, err: Exception) -> str:
+    """Describe why a sample failed."""
+    if isinstance(err, click.Abort):
+        return "aborted"
+    if isinstance(err, click.ClickException):
+        return err.format_message()
+    LOG.exception("Failed to process sample %s", sample_id)
+    return f"{type(err).__name__}: {err}"
+
+
+@cli.command()
+@click.option(
+    "--samplesheet",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help=(
+        "Tab separated file with one sample per row and create-bonsai-input "
+        "options as columns"
+    ),
+)
+@click.option(
+    "-o",
+    "--output-dir",
+    type=click.Path(file_okay=False, dir_okay=True, writable=True),
+    help="Output directory for samples without an output column",
+)
+@click.option(
+    "--ndjson",
+    is_flag=True,
+    help="Write results as newline-delimited json to stdout",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of worker processes used to parse the results of a sample",
+)
+@click.option(
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of samples to process in parallel",
+)
+@_cache_options
+@click.pass_context
+def create_bonsai_input_batch(  # pylint: disable=too-many-arguments
+    ctx, samplesheet, output_dir, ndjson, workers, jobs, cache_dir, cache_size
+):
+    """Combine pipeline results for all samples in a samplesheet.
+
+    Results are written to <output-dir>/<sample_id>_result.json unless the
+    samplesheet has an output column.
+    """
+    from .parse.sample import read_samplesheet
+
+    try:
+        samples = read_samplesheet(samplesheet)
+    except ValueError as err:
+        raise click.BadParameter(str(err), param_hint="--samplesheet") from err
+    if not ndjson and output_dir is None and any("output" not in s for s in samples):
+        raise click.UsageError(
+            "Either --output-dir, --ndjson or an output column is required"
+        )
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    create_sample = partial(
+        _create_batch_sample, workers=workers, cache=_get_cache(cache_dir, cache_size)
+    )
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        LOG.info("Processing %d samples using %d jobs", len(samples), jobs)
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            # results are reported in samplesheet order as they are done
+            summary = executor.map(create_sample, samples)
+            n_failed = _report_batch_samples(samples, summary, output_dir, ndjson)
+    else:
+        summary = map(create_sample, samples)
+        n_failed = _report_batch_samples(samples, summary, output_dir, ndjson)
+    click.secho(
+        f"Processed {len(samples)} samples, {n_failed} failed",
+        fg="red" if n_failed else "green",
+        err=ndjson,
+    )
+    if n_failed:
+        ctx.exit(1)
+
+
+def _create_batch_sample(
+    sample: dict[str, str], workers: int = 1, cache: "ParseCache | None" = None
+) -> tuple[str, "PipelineResult | None", str | None]:
+    """Create the result of a samplesheet row and isolate any failure.
+
+    :param sample: Keyword arguments to create_pipeline_result and the output path
+    :type sample: dict[str, str]
+    :param workers: Number of worker processes used to parse results, defaults to 1
+    :type workers: int, optional
+    :param cache: Cache of parse step outputs, defaults to None
+    :type cache: ParseCache | None, optional
+    :return: Sample id, the result and a message if the sample failed.
+    :rtype: tuple[str, PipelineResult | None, str | None]
+    """
+    from .parse.sample import create_pipeline_result
+
+    sample_id = sample.get("sample_id")
+    kwargs = {key: val for key, val in sample.items() if key != "output"}
+    try:
+        output_data = create_pipeline_result(**kwargs, workers=workers, cache=cache)
+    except Exception as err:  # pylint: disable=broad-except
+        return sample_id, None, _get_failure_message(sample_id, err)
+    return sample_id, output_data, None
+
+
+def _report_batch_samples(
+    samples: list[dict[str, str]],
+    summary: Iterable[tuple[str, "PipelineResult | None", str | None]],
+    output_dir: str | None,
+    ndjson: bool,
+) -> int:
+    """Write the results of a batch and report the outcome of each sample.
+
+    :return: Number of failed samples.
+    :rtype: int
+    """
+    n_failed = 0
+    for sample, (sample_id, output_data, err) in zip(samples, summary):
+        if err is not None:
+            n_failed += 1
+            click.secho(f"{sample_id}: FAILED ({err})", fg="red", err=ndjson)
+            continue
+        if ndjson:
+            click.echo(output_data.model_dump_json())
+        else:
+            output = sample.get(
+                "output", os.path.join(output_dir or "", f"{sample_id}_result.json")
+            )
+            _write_pipeline_result(output_data, output)
+            click.secho(f"{sample_id}: OK", fg="green")
+    return n_failed
+
+
+@cli.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    required=True,
+    type=click.Path(dir_okay=False),
+    help="Path of the Unix socket to listen on",
+)
+@click.option(
+    "--preload-reference",
+    type=click.Path(exists=True),
+    multiple=True,
+    help="Reference genome fasta to read at startup",
+)
+def serve(socket_path, preload_reference):
+    """Run prp as a server that accepts jobs on a Unix socket.
+
+    The server accepts create-bonsai-input, create-cdm-input and validate jobs
+    from the client command.
+    """
+    from .serve import serve as serve_jobs
+
+    serve_jobs(socket_path, reference_genomes=preload_reference)
+
+
+@cli.command(
+    context_settings={"ignore_unknown_options": True, "allow_interspersed_args": False}
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Unix socket of the prp server",
+)
+@click.argument("args", nargs=-1, required=True, type=click.UNPROCESSED)
+@click.pass_context
+def client(ctx, socket_path, args):
+    """Run a prp command on a prp server.
+
+    The arguments are the same as when the command is run directly, for
+    example: prp client --socket prp.sock validate -o result.json
+    """
+    from .serve import submit_job
+
+    response = submit_job(socket_path, list(args), os.getcwd())
+    click.echo(response["stdout"], nl=False)
+    click.echo(response["stderr"], nl=False, err=True)
+    ctx.exit(response["exit_code"])
 
 
 @cli.command()
 def print_schema():
     """Print Pipeline result output format schema."""
+    from .models.sample import PipelineResult
+
     click.secho(PipelineResult.schema_json(indent=2))
 
 
@@ -435,6 +597,10 @@ def print_schema():
 @click.option("-o", "--output", required=True, type=click.File("r"))
 def validate(output):
     """Validate output format of result json file."""
+    from pydantic import ValidationError
+
+    from .models.sample import PipelineResult
+
     js = json.load(output)
     try:
         PipelineResult(**js)
@@ -450,54 +616,197 @@ def validate(output):
 @click.option("-p", "--quality", type=click.Path(), help="postalignqc qc results")
 @click.option("-c", "--cgmlst", type=click.Path(), help="cgMLST prediction results")
 @click.option("--correct_alleles", is_flag=True, help="Correct alleles")
+@click.option("-b", "--bam", type=click.Path(), help="bam or cram file for read counts")
+@click.option(
+    "-r",
+    "--reference",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Reference fasta the cram file was written with",
+)
+@click.option(
+    "--ref-cache-dir",
+    type=click.Path(file_okay=False),
+    help="Cache of reference sequences used for decoding cram files",
+)
+@click.option("--cpus", type=click.INT, default=1, help="cpus for reading the bam")
+@click.option(
+    "--profile",
+    type=click.Path(dir_okay=False),
+    help="Write the time and memory used by each stage to a json file",
+)
 @click.option(
     "-o", "--output", required=True, type=click.File("w"), help="output filepath"
 )
-def create_cdm_input(quast, quality, cgmlst, correct_alleles, output) -> None:
+@click.pass_context
+def create_cdm_input(  # pylint: disable=too-many-arguments
+    ctx,
+    quast,
+    quality,
+    cgmlst,
+    correct_alleles,
+    bam,
+    reference,
+    ref_cache_dir,
+    cpus,
+    profile,
+    output,
+) -> None:
     """Format QC metrics into CDM compatible input file."""
+    from pydantic import TypeAdapter
+
+    from .models.qc import QcMethodIndex, QcSoftware
+    from .models.sample import MethodIndex
+    from .parse.qc import (
+        parse_flagstat_results,
+        parse_postalignqc_results,
+        parse_quast_results,
+    )
+    from .parse.typing import parse_cgmlst_results
+    from .profiling import profile_stage, profiling
+
+    ctx.with_resource(profiling(profile, command="create_cdm_input"))
     results = []
     if quality:
         LOG.info("Parse quality results")
-        res: QcMethodIndex = parse_postalignqc_results(quality)
+        with profile_stage("parse:quality"):
+            res: QcMethodIndex = parse_postalignqc_results(quality)
         results.append(res)
 
     if quast:
         LOG.info("Parse quast results")
-        res: QcMethodIndex = parse_quast_results(quast)
+        with profile_stage("parse:quast"):
+            res: QcMethodIndex = parse_quast_results(quast)
         results.append(res)
 
     if cgmlst:
         LOG.info("Parse cgmlst results")
-        res: MethodIndex = parse_cgmlst_results(cgmlst, correct_alleles=correct_alleles)
+        with profile_stage("parse:cgmlst"):
+            res: MethodIndex = parse_cgmlst_results(
+                cgmlst, correct_alleles=correct_alleles
+            )
         n_missing_loci = QcMethodIndex(
             software=QcSoftware.CHEWBBACA, result={"n_missing": res.result.n_missing}
         )
         results.append(n_missing_loci)
+
+    if bam:
+        from .parse.mapping import check_reference, is_cram, setup_reference_cache
+
+        if is_cram(bam):
+            # cram files are decoded with the reference they were written with
+            if reference is None:
+                raise click.UsageError("--reference is required for cram files")
+            if not check_reference(bam, reference):
+                raise click.BadParameter(
+                    f"{bam} was written with another reference than {reference}",
+                    param_hint="--bam",
+                )
+            with profile_stage("reference_cache"):
+                setup_reference_cache(reference, ref_cache_dir)
+        LOG.info("Count reads in bam file")
+        with profile_stage("parse:flagstat"):
+            res: QcMethodIndex = parse_flagstat_results(bam, threads=cpus)
+        results.append(res)
     # cast output as pydantic type for easy serialization
     qc_data = TypeAdapter(list[QcMethodIndex])
 
     LOG.info("Storing results to: %s", output.name)
-    output.write(qc_data.dump_json(results, indent=3).decode("utf-8"))
+    with profile_stage("serialize"):
+        output.write(qc_data.dump_json(results, indent=3).decode("utf-8"))
     click.secho("Finished generating QC output", fg="green")
 
 
 @cli.command()
 @click.option("-i", "--sample-id", required=True, help="Sample identifier")
-@click.option("-b", "--bam", required=True, type=click.File(), help="bam file")
+@click.option("-b", "--bam", required=True, type=click.File(), help="bam or cram file")
 @click.option("-e", "--bed", type=click.File(), help="bed file")
 @click.option("-a", "--baits", type=click.File(), help="baits file")
 @click.option(
     "-r", "--reference", required=True, type=click.File(), help="reference fasta"
 )
 @click.option("-c", "--cpus", type=click.INT, default=1, help="cpus")
+@click.option(
+    "--picard-insert-size",
+    is_flag=True,
+    help="Collect insert size metrics with Picard instead of pysam",
+)
+@click.option(
+    "--picard-hsmetrics",
+    is_flag=True,
+    help="Collect hybrid capture metrics with Picard instead of pysam",
+)
+@click.option(
+    "--quick",
+    is_flag=True,
+    help="Only count mapped reads using the bam index, without coverage metrics",
+)
+@click.option(
+    "--approximate",
+    type=click.FloatRange(0, 1, min_open=True),
+    help=(
+        "Estimate coverage, duplication and insert size with confidence "
+        "intervals from this fraction of the reference. Reads of cram files "
+        "are not counted"
+    ),
+)
+@click.option(
+    "--ref-cache-dir",
+    type=click.Path(file_okay=False),
+    help="Cache of reference sequences used for decoding cram files",
+)
+@click.option(
+    "--interval-cache-dir",
+    type=click.Path(file_okay=False),
+    help="Store Picard interval lists in this directory instead of next to bed files",
+)
+@click.option(
+    "--profile",
+    type=click.Path(dir_okay=False),
+    help="Write the time and memory used by each stage to a json file",
+)
 @click.option(
     "-o", "--output", required=True, type=click.File("w"), help="output filepath"
 )
-def create_qc_result(sample_id, bam, bed, baits, reference, cpus, output) -> None:
+@click.pass_context
+def create_qc_result(  # pylint: disable=too-many-arguments
+    ctx,
+    sample_id,
+    bam,
+    bed,
+    baits,
+    reference,
+    cpus,
+    picard_insert_size,
+    picard_hsmetrics,
+    quick,
+    approximate,
+    ref_cache_dir,
+    interval_cache_dir,
+    profile,
+    output,
+) -> None:
     """Generate QC metrics regarding bam file"""
+    from .parse.qc import parse_alignment_results
+    from .profiling import profiling
+
+    ctx.with_resource(profiling(profile, command="create_qc_result"))
     if bam and reference:
         LOG.info("Parse alignment results")
-        parse_alignment_results(sample_id, bam, reference, cpus, output, bed, baits)
+        parse_alignment_results(
+            sample_id,
+            bam,
+            reference,
+            cpus,
+            output,
+            bed,
+            baits,
+            picard_insert_size,
+            interval_cache_dir,
+            picard_hsmetrics,
+            quick,
+            approximate,
+            ref_cache_dir,
+        )
     click.secho("Finished generating QC output", fg="green")
 
 
@@ -513,6 +822,11 @@ def create_qc_result(sample_id, bam, bed, baits, reference, cpus, output) -> Non
 )
 def annotate_delly(vcf, bed, output):
     """Annotate Delly SV varinats with genes in BED file."""
+    import pysam
+    from cyvcf2 import VCF, Writer
+
+    from .parse.variant import annotate_delly_variants
+
     output = Path(output)
     # load annotation
     if bed is not None:
@@ -582,6 +896,8 @@ def annotate_delly(vcf, bed, output):
 )
 def add_igv_annotation_track(track_name, annotation_file, bonsai_input_file, output):
     """Add IGV annotation track to result (bonsai input file)."""
+    from .models.sample import IgvAnnotationTrack, PipelineResult
+
     with open(bonsai_input_file, "r", encoding="utf-8") as jfile:
         result_obj = PipelineResult(**json.load(jfile))
 
@@ -603,3 +919,130 @@ def add_igv_annotation_track(track_name, annotation_file, bonsai_input_file, out
     output.write(upd_result.model_dump_json(indent=3))
 
     click.secho(f"Wrote updated result to {output.name}", fg="green")
+
+
+@cli.group()
+def synth():
+    """Generate synthetic pipeline results for testing at scale."""
+
+
+@synth.command("chewbbaca")
+@click.option(
+    "-o", "--output", required=True, type=click.Path(), help="output filepath"
+)
+@click.option("--loci", default=7000, show_default=True, help="Number of loci")
+@click.option("--samples", default=1, show_default=True, help="Number of samples")
+@click.option("--seed", default=0, show_default=True, help="Random seed")
+def synth_chewbbaca(output, loci, samples, seed):
+    """Write a chewBBACA allele call matrix."""
+    from .testing.synth import write_chewbbaca_matrix
+
+    write_chewbbaca_matrix(output, n_loci=loci, n_samples=samples, seed=seed)
+    click.secho(f"Wrote {samples} samples with {loci} loci to {output}", fg="green")
+
+
+@synth.command("basecov")
+@click.option(
+    "-o", "--output", required=True, type=click.Path(), help="output filepath"
+)
+@click.option(
+    "--bases", default=1_000_000, show_default=True, help="Number of positions"
+)
+@click.option("--depth", default=60, show_default=True, help="Mean coverage")
+@click.option("--seed", default=0, show_default=True, help="Random seed")
+def synth_basecov(output, bases, depth, seed):
+    """Write a sambamba depth base coverage file."""
+    from .testing.synth import write_basecov
+
+    write_basecov(output, n_bases=bases, mean_depth=depth, seed=seed)
+    click.secho(f"Wrote coverage of {bases} positions to {output}", fg="green")
+
+
+@synth.command("vcf")
+@click.option(
+    "-o",
+    "--output",
+    required=True,
+    type=click.Path(),
+    help="output filepath, written as BCF if it ends with .bcf",
+)
+@click.option(
+    "--records", default=100_000, show_default=True, help="Number of variants"
+)
+@click.option("--seed", default=0, show_default=True, help="Random seed")
+def synth_vcf(output, records, seed):
+    """Write a VCF file with SNVs and indels."""
+    from .testing.synth import write_vcf
+
+    write_vcf(output, n_records=records, seed=seed)
+    click.secho(f"Wrote {records} variants to {output}", fg="green")
+
+
+@synth.command("bam")
+@click.option(
+    "-o", "--output", required=True, type=click.Path(), help="output filepath"
+)
+@click.option(
+    "-r",
+    "--reference",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Reference fasta the reads are sampled from",
+)
+@click.option("--pairs", default=10_000, show_default=True, help="Number of read pairs")
+@click.option("--seed", default=0, show_default=True, help="Random seed")
+def synth_bam(output, reference, pairs, seed):
+    """Write a sorted and indexed bam file with paired reads."""
+    from .testing.synth import write_bam
+
+    write_bam(output, n_pairs=pairs, reference=reference, seed=seed)
+    click.secho(f"Wrote {pairs} read pairs to {output}", fg="green")
+
+
+@synth.command("reference")
+@click.option(
+    "-o", "--output", required=True, type=click.Path(), help="output filepath"
+)
+@click.option("--length", default=100_000, show_default=True, help="Genome length")
+@click.option("--seed", default=0, show_default=True, help="Random seed")
+def synth_reference(output, length, seed):
+    """Write an indexed reference genome fasta."""
+    from .testing.synth import write_reference
+
+    write_reference(output, length=length, seed=seed)
+    click.secho(f"Wrote a {length} bp reference genome to {output}", fg="green")
+
+
+@synth.command("tbprofiler")
+@click.option(
+    "-o", "--output", required=True, type=click.Path(), help="output filepath"
+)
+@click.option(
+    "--variants", default=10_000, show_default=True, help="Number of variants"
+)
+@click.option("--seed", default=0, show_default=True, help="Random seed")
+def synth_tbprofiler(output, variants, seed):
+    """Write a tbprofiler result."""
+    from .testing.synth import make_tbprofiler_result, write_json
+
+    write_json(make_tbprofiler_result(n_variants=variants, seed=seed), output)
+    click.secho(f"Wrote {variants} variants to {output}", fg="green")
+
+
+@synth.command("resfinder")
+@click.option(
+    "-o", "--output", required=True, type=click.Path(), help="output filepath"
+)
+@click.option("--genes", default=1000, show_default=True, help="Number of genes")
+@click.option(
+    "--variations", default=100, show_default=True, help="Number of point mutations"
+)
+@click.option("--seed", default=0, show_default=True, help="Random seed")
+def synth_resfinder(output, genes, variations, seed):
+    """Write a resfinder result."""
+    from .testing.synth import make_resfinder_result, write_json
+
+    result = make_resfinder_result(n_genes=genes, n_variations=variations, seed=seed)
+    write_json(result, output)
+    click.secho(
+        f"Wrote {genes} genes and {variations} variations to {output}", fg="green"
+    )
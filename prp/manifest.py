@@ -0,0 +1,145 @@
+"""Track which inputs were used to create the sample results in a directory.
+
+The manifest is used by rerun_bonsai_input to skip samples whose inputs are
+unchanged and to only rerun the parse steps whose input files have changed.
+"""
+
+import json
+import logging
+import os
+from typing import Any
+
+from pydantic import ValidationError
+
+from . import VERSION
+from .models.manifest import RerunManifest, SampleManifest
+from .parse.sample import (
+    OUTPUT_SCHEMA_VERSION,
+    PARSE_STEPS,
+    StepResult,
+    get_previous_step_result,
+)
+from .parse.utils import get_checksum
+
+LOG = logging.getLogger(__name__)
+
+MANIFEST_FNAME = "prp_manifest.json"
+
+# inputs that are read when creating the sample result, other inputs are only
+# stored as paths in the result
+CONTENT_INPUTS = {
+    *(params[0] for _, _, params in PARSE_STEPS),
+    "run_metadata",
+    "process_metadata",
+    "reference_genome_fasta",
+    "variant_regions",
+}
+
+
+def read_manifest(output_dir: str) -> RerunManifest | None:
+    """Read the manifest in the output directory.
+
+    :param output_dir: Output directory of the sample results
+    :type output_dir: str
+    :return: The manifest or None if it is missing or was created by another
+        version of prp.
+    :rtype: RerunManifest | None
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_FNAME)
+    if not os.path.isfile(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as jsonfile:
+            manifest = RerunManifest(**json.load(jsonfile))
+    except (ValueError, ValidationError):
+        LOG.warning("Ignoring malformed manifest: %s", manifest_path)
+        return None
+    if (
+        manifest.prp_version != VERSION
+        or manifest.schema_version != OUTPUT_SCHEMA_VERSION
+    ):
+        LOG.info(
+            "Manifest was created with prp %s, all samples will be rerun",
+            manifest.prp_version,
+        )
+        return None
+    return manifest
+
+
+def write_manifest(manifest: RerunManifest, output_dir: str) -> None:
+    """Write manifest to the output directory."""
+    manifest_path = os.path.join(output_dir, MANIFEST_FNAME)
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fout:
+        fout.write(manifest.model_dump_json(indent=2))
+    os.replace(tmp_path, manifest_path)
+
+
+def new_manifest() -> RerunManifest:
+    """Create an empty manifest for the running prp version."""
+    return RerunManifest(prp_version=VERSION, schema_version=OUTPUT_SCHEMA_VERSION)
+
+
+def get_sample_inputs(input_array: dict[str, Any]) -> dict[str, Any]:
+    """Describe the inputs of a sample.
+
+    Files that are read are represented by their checksum, the remaining
+    options by their value.
+
+    :param input_array: Keyword arguments to create_bonsai_input
+    :type input_array: dict[str, Any]
+    :return: Description of the sample inputs.
+    :rtype: dict[str, Any]
+    """
+    inputs = {}
+    for name, value in sorted(input_array.items()):
+        if name == "output":
+            continue
+        if name in CONTENT_INPUTS and value:
+            if isinstance(value, (list, tuple)):
+                value = [get_checksum(path) for path in value]
+            else:
+                value = get_checksum(value)
+        inputs[name] = value
+    return inputs
+
+
+def get_reusable_steps(
+    inputs: dict[str, Any], previous: SampleManifest | None
+) -> dict[str, StepResult] | None:
+    """Get the output of the parse steps that can be reused from a previous result.
+
+    :param inputs: Current sample inputs from get_sample_inputs
+    :type inputs: dict[str, Any]
+    :param previous: Manifest entry of the previous result
+    :type previous: SampleManifest | None
+    :return: Reusable step outputs or None if the sample is unchanged.
+    :rtype: dict[str, StepResult] | None
+    """
+    if previous is None or not os.path.isfile(previous.output):
+        return {}
+    changed = {
+        name
+        for name in inputs.keys() | previous.inputs.keys()
+        if inputs.get(name) != previous.inputs.get(name)
+    }
+    if len(changed) == 0:
+        return None
+    step_inputs = {params[0]: name for name, _, params in PARSE_STEPS}
+    # changes that are not limited to a parse step requires a full rerun
+    if any(name not in step_inputs for name in changed):
+        return {}
+    try:
+        with open(previous.output, "r", encoding="utf-8") as jsonfile:
+            previous_result = json.load(jsonfile)
+    except ValueError:
+        return {}
+    reused = {}
+    for name, _, params in PARSE_STEPS:
+        if params[0] in changed or not inputs.get(params[0]):
+            continue
+        step_result = get_previous_step_result(name, previous_result)
+        if step_result is not None:
+            reused[name] = step_result
+    LOG.info("Inputs changed: %s", ", ".join(sorted(changed)))
+    return reused
@@ -0,0 +1,22 @@
+"""Data model of the rerun manifest."""
+
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+
+class SampleManifest(BaseModel):
+    """Inputs used to create the result of a sample."""
+
+    output: str
+    inputs: dict[str, Any] = Field(
+        ..., description="Input options, files are represented by their checksum."
+    )
+
+
+class RerunManifest(BaseModel):
+    """Record of the inputs and prp version used to create sample results."""
+
+    prp_version: str
+    schema_version: int
+    samples: dict[str, SampleManifest] = {}
@@ -1,7 +1,7 @@
 """QC data models."""
 from enum import Enum
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_serializer
 
 from .base import RWModel
 from .typing import TypingSoftware
@@ -13,6 +13,7 @@ class QcSoftware(Enum):
     QUAST = "quast"
     FASTQC = "fastqc"
     POSTALIGNQC = "postalignqc"
+    FLAGSTAT = "flagstat"
     CHEWBBACA = TypingSoftware.CHEWBBACA.value
 
 
@@ -29,20 +30,128 @@ class QuastQcResult(BaseModel):
     duplication_ratio: float | None = None
 
 
+# fields that are only included in the serialized results if they have a value
+OPTIONAL_POSTALIGNQC_FIELDS = (
+    "n_total_reads",
+    "n_total_mapped_reads",
+    "n_mapped_reads_by_contig",
+    "confidence_intervals",
+    "sampled_fraction",
+)
+
+
 class PostAlignQcResult(BaseModel):
     """Alignment QC metrics."""
 
     ins_size: int | None = None
     ins_size_dev: int | None = None
-    mean_cov: int
-    pct_above_x: dict[str, float]
-    n_reads: int
-    n_mapped_reads: int
-    n_read_pairs: int
+    mean_cov: int | None = None
+    pct_above_x: dict[str, float] | None = None
+    n_reads: int | None = Field(
+        ...,
+        description=(
+            "Number of alignments passing QC, same as the passed total of "
+            "samtools flagstat. Not known when counted from the bam index."
+        ),
+    )
+    n_mapped_reads: int | None = Field(
+        ..., description="Number of mapped alignments passing QC"
+    )
+    n_total_reads: int | None = Field(
+        None,
+        description=(
+            "Number of alignments including reads failing QC, secondary and "
+            "supplementary alignments, same as the total of samtools idxstats"
+        ),
+    )
+    n_total_mapped_reads: int | None = Field(
+        None, description="Number of mapped alignments, counted as n_total_reads"
+    )
+    n_mapped_reads_by_contig: dict[str, int] | None = Field(
+        None,
+        description="Number of mapped alignments of each contig, counted as "
+        "n_total_reads",
+    )
+    n_read_pairs: int | None = None
     coverage_uniformity: float | None = None
-    quartile1: float
-    median_cov: float
-    quartile3: float
+    quartile1: float | None = None
+    median_cov: float | None = None
+    quartile3: float | None = None
+    confidence_intervals: dict[str, list[float]] | None = Field(
+        None, description="95% confidence intervals of approximate metrics"
+    )
+    sampled_fraction: float | None = None
+
+    @model_serializer(mode="wrap")
+    def _serialize(self, handler):
+        """Leave out the optional fields added after the first version if empty."""
+        data = handler(self)
+        for field in OPTIONAL_POSTALIGNQC_FIELDS:
+            if data.get(field) is None:
+                data.pop(field, None)
+        return data
+
+
+class FlagstatCount(BaseModel):
+    """Number of reads passing and failing QC in a flagstat category."""
+
+    passed: int = 0
+    failed: int = 0
+
+
+class FlagstatResult(BaseModel):
+    """Alignment counts by SAM flag, same categories as samtools flagstat."""
+
+    total: FlagstatCount
+    primary: FlagstatCount
+    secondary: FlagstatCount
+    supplementary: FlagstatCount
+    duplicates: FlagstatCount
+    primary_duplicates: FlagstatCount
+    mapped: FlagstatCount
+    primary_mapped: FlagstatCount
+    paired: FlagstatCount = Field(..., description="Paired in sequencing")
+    read1: FlagstatCount
+    read2: FlagstatCount
+    properly_paired: FlagstatCount
+    both_mapped: FlagstatCount = Field(..., description="With itself and mate mapped")
+    singletons: FlagstatCount
+    mate_diff_chr: FlagstatCount = Field(
+        ..., description="With mate mapped to a different chr"
+    )
+    mate_diff_chr_mapq5: FlagstatCount = Field(
+        ..., description="With mate mapped to a different chr (mapQ>=5)"
+    )
+
+
+class InsertSizeResult(BaseModel):
+    """Insert size metrics of read pairs, same as Picard CollectInsertSizeMetrics."""
+
+    median_insert_size: float
+    median_absolute_deviation: float
+    mean_insert_size: float
+    standard_deviation: float | None = None
+    read_pairs: int
+    pair_orientation: str
+
+
+class HsMetricsResult(BaseModel):
+    """Hybrid capture metrics, named as in Picard CollectHsMetrics."""
+
+    bait_territory: int
+    target_territory: int
+    genome_size: int
+    pf_uq_bases_aligned: int
+    on_bait_bases: int
+    near_bait_bases: int
+    off_bait_bases: int
+    on_target_bases: int
+    pct_selected_bases: float | None = None
+    pct_off_bait: float | None = None
+    mean_target_coverage: float | None = None
+    median_target_coverage: float | None = None
+    fold_enrichment: float | None = None
+    fold_80_base_penalty: float | None = None
 
 
 class GenomeCompleteness(BaseModel):
@@ -60,4 +169,4 @@ class QcMethodIndex(RWModel):
 
     software: QcSoftware
     version: str | None = None
-    result: QuastQcResult | PostAlignQcResult | GenomeCompleteness
+    result: QuastQcResult | PostAlignQcResult | GenomeCompleteness | FlagstatResult
@@ -9,11 +9,11 @@ from .metadata import SequencingInfo, PipelineInfo
 from .phenotype import (
     AMRMethodIndex,
     StressMethodIndex,
-    VariantBase,
     VirulenceMethodIndex,
 )
 from .qc import QcMethodIndex
 from .species import SppMethodIndex
+from .variant_store import VariantList
 from .typing import (
     ResultLineageBase,
     ShigaTypingMethodIndex,
@@ -89,9 +89,9 @@ class PipelineResult(SampleBase):
         Union[VirulenceMethodIndex, AMRMethodIndex, StressMethodIndex, MethodIndex]
     ] = Field(..., alias="elementTypeResult")
     # optional variant info
-    snv_variants: Optional[list[VariantBase]] = None
-    sv_variants: Optional[list[VariantBase]] = None
-    indel_variants: Optional[list[VariantBase]] = None
+    snv_variants: Optional[VariantList] = None
+    sv_variants: Optional[VariantList] = None
+    indel_variants: Optional[VariantList] = None
     # optional alignment info
     reference_genome: Optional[ReferenceGenome] = None
     read_mapping: Optional[str] = None
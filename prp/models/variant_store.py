@@ -0,0 +1,162 @@
+"""Columnar storage of variants parsed from VCF files.
+
+Whole genome variant files have hundreds of thousands of records. Instead of
+validating a VariantBase model for each of them, the values are validated
+and stored by column when a variant is added. Repeated strings, such as the
+contig, variant type and calling method, are stored once and referenced by a
+code. The VariantBase models are only created when the variants are read or
+serialized.
+"""
+
+import math
+from array import array
+from typing import Annotated, Any, Callable, Iterator
+
+from pydantic import GetCoreSchemaHandler
+from pydantic_core import core_schema
+
+from .phenotype import VariantBase, VariantSubType, VariantType
+
+# passed_qc is stored as a byte, -1 for unknown
+_UNKNOWN_QC = -1
+
+
+def _validate_optional_float(value: Any) -> float:
+    """Validate an optional float, missing values are stored as NaN."""
+    return math.nan if value is None else float(value)
+
+
+def _get_optional_float(value: float) -> float | None:
+    return None if math.isnan(value) else value
+
+
+class VariantStore:  # pylint: disable=too-many-instance-attributes
+    """Variants stored by column and read as VariantBase models."""
+
+    def __init__(self):
+        self.ids = array("q")
+        self.starts = array("q")
+        self.ends = array("q")
+        self.ref_nts: list[str] = []
+        self.alt_nts: list[str] = []
+        self.depths = array("d")
+        self.frequencies = array("d")
+        self.confidences = array("d")
+        self.passed_qc = array("b")
+        # codes of values in categories
+        self.variant_types = array("l")
+        self.variant_subtypes = array("l")
+        self.references = array("l")
+        self.methods = array("l")
+        self.categories: list[str | None] = []
+        self._category_codes: dict[tuple[str, Any], int] = {}
+
+    def _get_code(
+        self, column: str, value: Any, validate: Callable[[Any], Any] | None = None
+    ) -> int:
+        """Get the code of a value, new values are validated and added."""
+        key = (column, value)
+        code = self._category_codes.get(key)
+        if code is None:
+            code = len(self.categories)
+            self.categories.append(value if validate is None else validate(value))
+            self._category_codes[key] = code
+        return code
+
+    def append(  # pylint: disable=too-many-arguments
+        self,
+        id: int,  # pylint: disable=redefined-builtin
+        variant_type: VariantType | str,
+        variant_subtype: VariantSubType | str,
+        reference_sequence: str | None,
+        start: int,
+        end: int,
+        ref_nt: str,
+        alt_nt: str,
+        depth: float | None = None,
+        frequency: float | None = None,
+        confidence: float | None = None,
+        method: str | None = None,
+        passed_qc: bool | None = None,
+    ) -> None:
+        """Validate a variant and add it, same arguments as VariantBase.
+
+        :raises ValueError: If a value is not valid.
+        """
+        self.variant_types.append(
+            self._get_code("type", variant_type, lambda val: VariantType(val).value)
+        )
+        self.variant_subtypes.append(
+            self._get_code(
+                "subtype", variant_subtype, lambda val: VariantSubType(val).value
+            )
+        )
+        self.references.append(self._get_code("reference", reference_sequence))
+        self.methods.append(self._get_code("method", method))
+        self.ids.append(int(id))
+        self.starts.append(int(start))
+        self.ends.append(int(end))
+        self.ref_nts.append(str(ref_nt))
+        self.alt_nts.append(str(alt_nt))
+        self.depths.append(_validate_optional_float(depth))
+        self.frequencies.append(_validate_optional_float(frequency))
+        self.confidences.append(_validate_optional_float(confidence))
+        self.passed_qc.append(_UNKNOWN_QC if passed_qc is None else int(passed_qc))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, idx: int) -> VariantBase:
+        """Create the model of a variant without validating it again."""
+        passed_qc = self.passed_qc[idx]
+        return VariantBase.model_construct(
+            id=self.ids[idx],
+            variant_type=self.categories[self.variant_types[idx]],
+            variant_subtype=self.categories[self.variant_subtypes[idx]],
+            phenotypes=[],
+            reference_sequence=self.categories[self.references[idx]],
+            accession=None,
+            start=self.starts[idx],
+            end=self.ends[idx],
+            ref_nt=self.ref_nts[idx],
+            alt_nt=self.alt_nts[idx],
+            ref_aa=None,
+            alt_aa=None,
+            depth=_get_optional_float(self.depths[idx]),
+            frequency=_get_optional_float(self.frequencies[idx]),
+            confidence=_get_optional_float(self.confidences[idx]),
+            method=self.categories[self.methods[idx]],
+            passed_qc=None if passed_qc == _UNKNOWN_QC else bool(passed_qc),
+        )
+
+    def __iter__(self) -> Iterator[VariantBase]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+
+def _serialize_variants(value: Any, handler: Callable[[Any], Any]) -> Any:
+    """Serialize stored variants as a list of VariantBase models."""
+    if isinstance(value, VariantStore):
+        value = list(value)
+    return handler(value)
+
+
+class _AcceptVariantStore:  # pylint: disable=too-few-public-methods
+    """Let a list of variants field hold a variant store without converting it."""
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source: Any, handler: GetCoreSchemaHandler
+    ) -> core_schema.CoreSchema:
+        list_schema = handler(source)
+        return core_schema.union_schema(
+            [core_schema.is_instance_schema(VariantStore), list_schema],
+            mode="left_to_right",
+            serialization=core_schema.wrap_serializer_function_ser_schema(
+                _serialize_variants, schema=list_schema
+            ),
+        )
+
+
+# variants given as a list or a variant store, always serialized as a list
+VariantList = Annotated[list[VariantBase], _AcceptVariantStore]
@@ -0,0 +1,206 @@
+"""Estimate alignment QC metrics from a random sample of the reference.
+
+The regions of the reference are split into blocks of equal size and the
+reads of a random fraction of the blocks are read from the indexed bam file.
+The metrics are estimated as ratios of totals over the sampled blocks, such
+as the summed depth over the number of positions, with confidence intervals
+from the variance of the ratio estimator between blocks.
+
+The estimates are intended for a first look at a sample and are replaced by
+the exact metrics once the full pass over the bam file is done.
+"""
+
+import logging
+import math
+import random
+from concurrent.futures import Executor
+from typing import Any
+
+import numpy as np
+
+from .bam_qc import _collect_shard_stats
+from .coverage import DepthAccumulator
+from .flagstat import FlagstatCounter
+from .insert_size import InsertSizeCounter, get_max_insert_size
+
+LOG = logging.getLogger(__name__)
+
+SAMPLE_BLOCK_SIZE = 10_000
+# two sided 95% confidence interval of a normal distribution
+CONFIDENCE_Z = 1.96
+
+
+def get_sample_accumulators(regions: list[tuple]) -> dict:
+    """Get the accumulators of the metrics of a sampled block.
+
+    :param regions: Contig, start and end of the block
+    :type regions: list[tuple]
+    :return: Accumulators by the name of their metric
+    :rtype: dict
+    """
+    return {
+        "flagstat": FlagstatCounter(),
+        "depth": DepthAccumulator(regions),
+        "insert_size": InsertSizeCounter(stop_after=None),
+    }
+
+
+def get_sample_blocks(
+    regions: list[tuple], fraction: float, block_size: int, seed: int = 0
+) -> tuple[list[tuple[str, int, int]], int]:
+    """Split the regions into blocks and pick a random fraction of them.
+
+    At least two blocks are picked so that the variance can be estimated.
+
+    :param regions: Contig, start and end of the regions, see get_regions
+    :type regions: list[tuple]
+    :param fraction: Fraction of the blocks to pick
+    :type fraction: float
+    :param block_size: Number of positions in a block
+    :type block_size: int
+    :param seed: Seed of the random generator, defaults to 0
+    :type seed: int, optional
+    :return: Picked blocks in reference order and the total number of blocks.
+    :rtype: tuple[list[tuple[str, int, int]], int]
+    """
+    blocks = [
+        (contig, start, min(start + block_size, end))
+        for contig, reg_start, end in regions
+        for start in range(reg_start, end, block_size)
+    ]
+    n_picked = min(max(math.ceil(fraction * len(blocks)), 2), len(blocks))
+    picked = sorted(random.Random(seed).sample(range(len(blocks)), n_picked))
+    return [blocks[idx] for idx in picked], len(blocks)
+
+
+def _get_ratio_estimate(
+    values: list[float], weights: list[float], sampled_fraction: float
+) -> tuple[float, list[float]] | None:
+    """Estimate the ratio of two totals from the sampled blocks.
+
+    :return: The ratio and its confidence interval, None if all weights are 0.
+    """
+    total_weight = sum(weights)
+    if not total_weight:
+        return None
+    ratio = sum(values) / total_weight
+    n_blocks = len(values)
+    if n_blocks < 2:
+        return ratio, [ratio, ratio]
+    mean_weight = total_weight / n_blocks
+    residuals = sum((val - ratio * wt) ** 2 for val, wt in zip(values, weights))
+    # with finite population correction for the blocks that were not sampled
+    variance = (1 - sampled_fraction) * residuals / (n_blocks - 1)
+    variance /= n_blocks * mean_weight**2
+    margin = CONFIDENCE_Z * math.sqrt(max(variance, 0))
+    return ratio, [ratio - margin, ratio + margin]
+
+
+def _get_insert_size_estimate(
+    counters: list[InsertSizeCounter], sampled_fraction: float
+) -> tuple[float, list[float]] | None:
+    """Estimate the mean insert size from the insert sizes of sampled blocks.
+
+    Outliers are trimmed using the median of all sampled pairs, same as for the
+    whole file, and each block is weighted by its pairs that remain.
+    """
+    merged = InsertSizeCounter(stop_after=None)
+    for counter in counters:
+        merged.merge(counter)
+    metrics = merged.result()
+    if metrics is None:
+        return None
+    max_size = get_max_insert_size(
+        metrics.median_insert_size, metrics.median_absolute_deviation
+    )
+    sums, n_pairs = [], []
+    for counter in counters:
+        histogram = counter.histograms.get(metrics.pair_orientation, {})
+        kept = [(size, count) for size, count in histogram.items() if size <= max_size]
+        sums.append(float(sum(size * count for size, count in kept)))
+        n_pairs.append(sum(count for _, count in kept))
+    return _get_ratio_estimate(sums, n_pairs, sampled_fraction)
+
+
+def collect_approximate_stats(  # pylint: disable=too-many-arguments,too-many-locals
+    bam_path: str,
+    regions: list[tuple],
+    fraction: float,
+    thresholds: list[str],
+    executor: Executor | None = None,
+    block_size: int = SAMPLE_BLOCK_SIZE,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """Estimate the depth, duplication and insert size from sampled blocks.
+
+    Unplaced reads are not sampled.
+
+    :param bam_path: Path to an indexed bam or cram file
+    :type bam_path: str
+    :param regions: Contig, start and end of the regions, see get_regions
+    :type regions: list[tuple]
+    :param fraction: Fraction of the regions to sample
+    :type fraction: float
+    :param thresholds: Depths used to calculate the percent of positions
+        with at least that depth
+    :type thresholds: list[str]
+    :param executor: Executor running the blocks in parallel, defaults to None
+    :type executor: Executor | None, optional
+    :param block_size: Number of positions in a sampled block
+    :type block_size: int, optional
+    :param seed: Seed of the random generator, defaults to 0
+    :type seed: int, optional
+    :return: Estimated metrics using the keys of the QC results and their
+        confidence intervals.
+    :rtype: dict[str, Any]
+    """
+    blocks, n_blocks = get_sample_blocks(regions, fraction, block_size, seed)
+    LOG.info("Sampling %d of %d blocks from: %s", len(blocks), n_blocks, bam_path)
+    args = [(bam_path, block, [block], get_sample_accumulators) for block in blocks]
+    if executor is None:
+        block_stats = [_collect_shard_stats(*block_args) for block_args in args]
+    else:
+        futures = [executor.submit(_collect_shard_stats, *arg) for arg in args]
+        block_stats = [future.result() for future in futures]
+    sampled_fraction = len(blocks) / n_blocks
+
+    histograms = [stats["depth"].result() for stats in block_stats]
+    n_positions = [end - start for _, start, end in blocks]
+    estimates = {
+        "mean_cov": _get_ratio_estimate(
+            [float(np.arange(len(hist)) @ hist) for hist in histograms],
+            n_positions,
+            sampled_fraction,
+        )
+    }
+    for min_val in thresholds:
+        estimate = _get_ratio_estimate(
+            [100 * float(hist[int(min_val) :].sum()) for hist in histograms],
+            n_positions,
+            sampled_fraction,
+        )
+        estimates[f"pct_above_x.{min_val}"] = estimate
+
+    flagstats = [stats["flagstat"].result() for stats in block_stats]
+    estimates["dup_pct"] = _get_ratio_estimate(
+        [flagstat.duplicates.passed for flagstat in flagstats],
+        [flagstat.mapped.passed for flagstat in flagstats],
+        sampled_fraction,
+    )
+    estimates["ins_size"] = _get_insert_size_estimate(
+        [stats["insert_size"] for stats in block_stats], sampled_fraction
+    )
+
+    results: dict[str, Any] = {"pct_above_x": {}, "confidence_intervals": {}}
+    for name, estimate in estimates.items():
+        if estimate is None:
+            continue
+        value, interval = estimate
+        if name.startswith("pct_above_x."):
+            min_val = name.split(".", 1)[1]
+            results["pct_above_x"][min_val] = value
+        else:
+            results[name] = value
+        results["confidence_intervals"][name] = interval
+    results["sampled_fraction"] = sampled_fraction
+    return results
@@ -0,0 +1,281 @@
+"""Collect alignment QC metrics in a single pass over a bam file.
+
+Every read is passed to a set of accumulators, each collecting one kind of
+metric such as flag counts, insert sizes or the depth histogram. The bam file
+is only decompressed once regardless of the number of metrics.
+
+Indexed bam files can also be split into shards, regions of the reference
+that are processed in parallel. Each read is counted by the shard where it
+starts, except by accumulators of metrics by reference position, such as the
+depth, which get every read overlapping the shard. The accumulators of the
+shards are then merged into the result of the whole file.
+"""
+
+import logging
+import math
+from collections import Counter
+from concurrent.futures import Executor
+from typing import Any, Callable, Protocol
+
+import pysam
+
+LOG = logging.getLogger(__name__)
+
+# split the reference into more shards than processes to balance the load
+SHARDS_PER_PROCESS = 4
+# region of unmapped reads without a position
+UNPLACED_SHARD = ("*", 0, 0)
+
+
+class Accumulator(Protocol):
+    """Collect a metric from alignments one read at a time.
+
+    Accumulators of metrics by reference position set by_position to True.
+    """
+
+    def add(self, read: pysam.AlignedSegment) -> None:
+        """Add a read to the metric."""
+
+    def merge(self, other: Any) -> None:
+        """Add the reads of another accumulator of the same type."""
+
+    def result(self) -> Any:
+        """Get the metric once all reads have been added."""
+
+
+class MappingQualityHistogram:
+    """Count the primary alignments with each mapping quality."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+
+    def add(self, read: pysam.AlignedSegment) -> None:
+        """Count the mapping quality of a read."""
+        # skip unmapped reads and secondary or supplementary alignments
+        if not read.flag & 0x904:
+            self.counts[read.mapping_quality] += 1
+
+    def merge(self, other: "MappingQualityHistogram") -> None:
+        """Add the counts of another histogram."""
+        self.counts.update(other.counts)
+
+    def result(self) -> dict[int, int]:
+        """Get the number of reads with each mapping quality."""
+        return dict(sorted(self.counts.items()))
+
+
+class MappedReadCounter:
+    """Count the mapped reads on each contig, same as samtools idxstats."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+
+    def add(self, read: pysam.AlignedSegment) -> None:
+        """Count a read if it is mapped."""
+        if not read.flag & 0x4:
+            self.counts[read.reference_name] += 1
+
+    def merge(self, other: "MappedReadCounter") -> None:
+        """Add the counts of another counter."""
+        self.counts.update(other.counts)
+
+    def result(self) -> dict[str, int]:
+        """Get the number of mapped reads by contig."""
+        return dict(self.counts)
+
+
+def get_index_read_counts(bam: pysam.AlignmentFile) -> tuple[dict[str, int], int]:
+    """Get the number of reads from the index without reading the alignments.
+
+    The counts include secondary, supplementary and qc failed alignments,
+    same as samtools idxstats.
+
+    :param bam: Indexed alignment file
+    :type bam: pysam.AlignmentFile
+    :return: Mapped reads by contig and the number of unmapped reads.
+    :rtype: tuple[dict[str, int], int]
+    """
+    mapped = {stat.contig: stat.mapped for stat in bam.get_index_statistics()}
+    by_contig = {contig: mapped.get(contig, 0) for contig in bam.references}
+    return by_contig, bam.unmapped
+
+
+def count_mapped_reads(bam_path: str) -> tuple[dict[str, int], int]:
+    """Count the reads of a cram file, which has no counts in its index.
+
+    Only the flags and contigs of the reads are decoded.
+
+    :param bam_path: Path to a cram file
+    :type bam_path: str
+    :return: Mapped reads by contig and the number of unmapped reads.
+    :rtype: tuple[dict[str, int], int]
+    """
+    counter = MappedReadCounter()
+    n_unmapped = 0
+    # decode only the FLAG and RNAME fields
+    with pysam.AlignmentFile(bam_path, format_options=[b"required_fields=0x6"]) as bam:
+        for read in bam.fetch(until_eof=True):
+            if read.flag & 0x4:
+                n_unmapped += 1
+            else:
+                counter.add(read)
+        mapped = counter.result()
+        return {contig: mapped.get(contig, 0) for contig in bam.references}, n_unmapped
+
+
+def _add_reads(
+    bam: pysam.AlignmentFile,
+    accumulators: dict[str, Accumulator],
+    shard: tuple[str, int, int] | None = None,
+) -> None:
+    """Pass the reads of the file, or of a shard, to the accumulators."""
+    if shard is None:
+        add_read = [accumulator.add for accumulator in accumulators.values()]
+        for read in bam.fetch(until_eof=True):
+            for add in add_read:
+                add(read)
+        return
+    add_position = []
+    add_read = []
+    for accumulator in accumulators.values():
+        if getattr(accumulator, "by_position", False):
+            add_position.append(accumulator.add)
+        else:
+            add_read.append(accumulator.add)
+    if shard == UNPLACED_SHARD:
+        # unplaced reads have no position
+        reads, start = bam.fetch(shard[0]), -1
+    else:
+        reads, start = bam.fetch(*shard), shard[1]
+    for read in reads:
+        for add in add_position:
+            add(read)
+        # reads overlapping the start are counted by the previous shard
+        if read.reference_start >= start:
+            for add in add_read:
+                add(read)
+
+
+def collect_alignment_stats(
+    bam_path: str, accumulators: dict[str, Accumulator], threads: int = 1
+) -> dict[str, Any]:
+    """Pass every read of an alignment file to the accumulators.
+
+    :param bam_path: Path to a sam, bam or cram file
+    :type bam_path: str
+    :param accumulators: Accumulators by the name of their metric
+    :type accumulators: dict[str, Accumulator]
+    :param threads: Number of threads used for decompressing the file
+    :type threads: int, optional
+    :return: Result of each accumulator by name.
+    :rtype: dict[str, Any]
+    """
+    LOG.info("Collecting %s from: %s", ", ".join(accumulators), bam_path)
+    with pysam.AlignmentFile(bam_path, threads=max(threads or 1, 1)) as bam:
+        _add_reads(bam, accumulators)
+    return {name: accumulator.result() for name, accumulator in accumulators.items()}
+
+
+def get_shards(bam: pysam.AlignmentFile, n_shards: int) -> list[tuple[str, int, int]]:
+    """Split the reference into shards with about the same number of reads.
+
+    The number of reads on each contig is taken from the index. Contigs
+    without reads are not included. Cram indexes have no read counts, the
+    contigs are then split by their length.
+
+    :param bam: Indexed alignment file
+    :type bam: pysam.AlignmentFile
+    :param n_shards: Approximate number of shards
+    :type n_shards: int
+    :return: Contig, start and end of each shard.
+    :rtype: list[tuple[str, int, int]]
+    """
+    n_reads = {stat.contig: stat.total for stat in bam.get_index_statistics()}
+    total_reads = sum(n_reads.values())
+    if not total_reads:
+        n_reads = dict(zip(bam.references, bam.lengths))
+        total_reads = sum(bam.lengths)
+    shards = []
+    for contig, length in zip(bam.references, bam.lengths):
+        if not n_reads.get(contig):
+            continue
+        n_contig_shards = max(round(n_shards * n_reads[contig] / total_reads), 1)
+        shard_size = math.ceil(length / n_contig_shards)
+        for start in range(0, length, shard_size):
+            shards.append((contig, start, min(start + shard_size, length)))
+    return shards
+
+
+def _get_shard_regions(
+    regions: list[tuple], shard: tuple[str, int, int]
+) -> list[tuple[str, int, int]]:
+    """Get the parts of the regions that are in a shard."""
+    contig, shard_start, shard_end = shard
+    shard_regions = []
+    for reg_contig, reg_start, reg_end in regions:
+        start, end = max(reg_start, shard_start), min(reg_end, shard_end)
+        if reg_contig == contig and start < end:
+            shard_regions.append((contig, start, end))
+    return shard_regions
+
+
+def _collect_shard_stats(
+    bam_path: str,
+    shard: tuple[str, int, int],
+    regions: list[tuple],
+    get_accumulators: Callable[[list[tuple]], dict[str, Accumulator]],
+) -> dict[str, Accumulator]:
+    """Collect the metrics of the reads in a shard."""
+    accumulators = get_accumulators(regions)
+    with pysam.AlignmentFile(bam_path) as bam:
+        _add_reads(bam, accumulators, shard)
+    return accumulators
+
+
+def collect_alignment_stats_parallel(  # pylint: disable=too-many-locals
+    bam_path: str,
+    get_accumulators: Callable[[list[tuple]], dict[str, Accumulator]],
+    regions: list[tuple],
+    executor: Executor,
+    n_shards: int,
+) -> dict[str, Any]:
+    """Collect the metrics of an indexed alignment file in parallel.
+
+    The accumulators are created for each shard by get_accumulators, which
+    gets the regions of the reference that are in the shard. It must be
+    possible to pickle the function. Accumulators that depend on the order
+    of the reads in the file, such as insert sizes collected from the first
+    reads, give different results when run in parallel.
+
+    :param bam_path: Path to an indexed bam or cram file
+    :type bam_path: str
+    :param get_accumulators: Function creating the accumulators for the regions
+    :type get_accumulators: Callable[[list[tuple]], dict[str, Accumulator]]
+    :param regions: Contig, start and end of the regions, see get_regions
+    :type regions: list[tuple]
+    :param executor: Executor running the shards
+    :type executor: Executor
+    :param n_shards: Approximate number of shards
+    :type n_shards: int
+    :return: Result of each accumulator by name.
+    :rtype: dict[str, Any]
+    """
+    with pysam.AlignmentFile(bam_path) as bam:
+        shards = get_shards(bam, n_shards)
+    shard_regions = [_get_shard_regions(regions, shard) for shard in shards]
+    # regions on contigs without reads are counted with the unplaced reads
+    sharded_contigs = {contig for contig, _, _ in shards}
+    shards.append(UNPLACED_SHARD)
+    shard_regions.append([reg for reg in regions if reg[0] not in sharded_contigs])
+    LOG.info("Collecting alignment stats from %d shards: %s", len(shards), bam_path)
+    futures = [
+        executor.submit(
+            _collect_shard_stats, bam_path, shard, shard_regs, get_accumulators
+        )
+        for shard, shard_regs in zip(shards, shard_regions)
+    ]
+    accumulators = futures[0].result()
+    for future in futures[1:]:
+        for name, accumulator in future.result().items():
+            accumulators[name].merge(accumulator)
+    return {name: accumulator.result() for name, accumulator in accumulators.items()}
@@ -0,0 +1,310 @@
+"""Calculate read depth statistics from a depth histogram.
+
+The histogram is a numpy array where the value at index i is the number of
+positions with depth i. It is built either by streaming the alignments of a
+bam file or by reading a sambamba depth base file, and the statistics are
+derived from it without holding the depth of every position in memory.
+"""
+
+import logging
+import math
+
+import numpy as np
+import pandas as pd
+import pysam
+
+from .intervals import read_bed_regions
+
+LOG = logging.getLogger(__name__)
+
+WINDOW_SIZE = 1_000_000
+BASECOV_CHUNK_SIZE = 1_000_000
+# cigar operation for skipped regions of the reference
+CIGAR_REF_SKIP = 3
+# unmapped, qc fail and duplicate reads are not counted
+DEPTH_EXCLUDE_FLAGS = 0x4 | 0x200 | 0x400
+
+
+def merge_histograms(histogram: np.ndarray, other: np.ndarray) -> np.ndarray:
+    """Add two depth histograms of possibly different length."""
+    if len(other) > len(histogram):
+        histogram, other = other, histogram
+    histogram[: len(other)] += other
+    return histogram
+
+
+def _get_read_spans(read: pysam.AlignedSegment) -> list[tuple[int, int]]:
+    """Get the reference intervals covered by a read.
+
+    Deletions are counted as covered while skipped regions are not.
+    """
+    if "N" not in (read.cigarstring or ""):
+        return [(read.reference_start, read.reference_end)]
+    spans = []
+    start = pos = read.reference_start
+    for operation, length in read.cigartuples:
+        if operation == CIGAR_REF_SKIP:
+            if pos > start:
+                spans.append((start, pos))
+            start = pos + length
+        # operations that consume the reference (M, D, N, =, X)
+        if operation in (0, 2, 3, 7, 8):
+            pos += length
+    if pos > start:
+        spans.append((start, pos))
+    return spans
+
+
+def get_regions(bam: pysam.AlignmentFile, bed: str | None = None) -> list[tuple]:
+    """Get the regions for which depth is calculated.
+
+    :param bam: Alignment file
+    :type bam: pysam.AlignmentFile
+    :param bed: Bed file with regions, defaults to the whole reference
+    :type bed: str | None, optional
+    :return: Contig, start and end of each region.
+    :rtype: list[tuple]
+    """
+    if bed is None:
+        return list(zip(bam.references, [0] * bam.nreferences, bam.lengths))
+    return read_bed_regions(bed)
+
+
+class DepthAccumulator:
+    """Build a depth histogram from coordinate sorted alignments.
+
+    The depth is calculated in windows as the reads are added, reads
+    extending past the end of a window are carried over to the next window.
+    """
+
+    # the depth of a region depends on every read overlapping it
+    by_position = True
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        regions: list[tuple],
+        window_size: int = WINDOW_SIZE,
+        min_mapq: int = 1,
+        exclude_flags: int = DEPTH_EXCLUDE_FLAGS,
+        aligned_only: bool = False,
+    ):
+        """Setup the accumulator.
+
+        The default filters are the same as the sambamba depth defaults.
+
+        :param regions: Contig, start and end of the regions, see get_regions
+        :type regions: list[tuple]
+        :param window_size: Number of positions processed at once
+        :type window_size: int, optional
+        :param min_mapq: Minimum mapping quality of counted reads, defaults to 1
+        :type min_mapq: int, optional
+        :param exclude_flags: Reads with any of these flags are not counted
+        :type exclude_flags: int, optional
+        :param aligned_only: Only count aligned bases, not deletions
+        :type aligned_only: bool, optional
+        """
+        self.window_size = window_size
+        self.min_mapq = min_mapq
+        self.exclude_flags = exclude_flags
+        self.aligned_only = aligned_only
+        self.regions: dict[str, list[tuple[int, int]]] = {}
+        for contig, start, end in regions:
+            self.regions.setdefault(contig, []).append((start, end))
+        self.histogram = np.zeros(1, dtype=np.int64)
+        self._done_contigs: set[str] = set()
+        self._contig: str | None = None
+        self._contig_end = 0
+        self._win_start = 0
+        self._win_end = window_size
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        self._carry: list[tuple[int, int]] = []
+
+    def _add_span(self, start: int, end: int) -> None:
+        """Add a covered interval to the current window."""
+        if end > self._win_end:
+            self._carry.append((max(start, self._win_end), end))
+        start, end = max(start, self._win_start), min(end, self._win_end)
+        if start < end:
+            self._starts.append(start - self._win_start)
+            self._ends.append(end - self._win_start)
+
+    def _flush_window(self) -> None:
+        """Add the depth of the current window to the histogram."""
+        win_start = self._win_start
+        win_end = min(self._win_end, self._contig_end)
+        length = win_end - win_start
+        if self._starts:
+            # spans may end after the last position of the regions
+            size = self.window_size + 1
+            diff = np.bincount(self._starts, minlength=size).astype(np.int64)
+            diff -= np.bincount(self._ends, minlength=size)
+            depth = np.cumsum(diff[:length])
+        else:
+            depth = None
+        for reg_start, reg_end in self.regions[self._contig]:
+            start, end = max(reg_start, win_start), min(reg_end, win_end)
+            if start >= end:
+                continue
+            if depth is None:
+                self.histogram[0] += end - start
+            else:
+                region_depth = depth[start - win_start : end - win_start]
+                self.histogram = merge_histograms(
+                    self.histogram, np.bincount(region_depth)
+                )
+        # move to the next window
+        self._win_start = self._win_end
+        self._win_end += self.window_size
+        self._starts, self._ends = [], []
+        carry, self._carry = self._carry, []
+        for start, end in carry:
+            self._add_span(start, end)
+
+    def _finish_contig(self) -> None:
+        """Add the depth of the remaining windows of the current contig."""
+        if self._contig is None:
+            return
+        while self._win_start < self._contig_end:
+            self._flush_window()
+        self._done_contigs.add(self._contig)
+        self._contig = None
+
+    def add(self, read: pysam.AlignedSegment) -> None:
+        """Add the depth of a read."""
+        if read.flag & self.exclude_flags or read.mapping_quality < self.min_mapq:
+            return
+        contig = read.reference_name
+        if contig != self._contig:
+            if contig not in self.regions:
+                return
+            if contig in self._done_contigs:
+                raise ValueError("Alignments must be sorted by coordinate")
+            self._finish_contig()
+            self._contig = contig
+            self._contig_end = max(end for _, end in self.regions[contig])
+            self._win_start, self._win_end = 0, self.window_size
+        start = read.reference_start
+        if start < self._win_start:
+            raise ValueError("Alignments must be sorted by coordinate")
+        while start >= self._win_end:
+            self._flush_window()
+        spans = read.get_blocks() if self.aligned_only else _get_read_spans(read)
+        for span_start, span_end in spans:
+            if span_end <= self._win_end:
+                # the span starts in the current window
+                self._starts.append(span_start - self._win_start)
+                self._ends.append(span_end - self._win_start)
+            else:
+                self._add_span(span_start, span_end)
+
+    def merge(self, other: "DepthAccumulator") -> None:
+        """Add the histogram of another accumulator."""
+        self.histogram = merge_histograms(self.histogram, other.result())
+
+    def result(self) -> np.ndarray:
+        """Get the depth histogram once all reads have been added.
+
+        :return: Number of positions with each depth.
+        :rtype: np.ndarray
+        """
+        self._finish_contig()
+        # positions of contigs without reads have no coverage
+        for contig, regions in self.regions.items():
+            if contig not in self._done_contigs:
+                self.histogram[0] += sum(end - start for start, end in regions)
+                self._done_contigs.add(contig)
+        return self.histogram
+
+
+def get_basecov_histogram(
+    basecov_fpath: str, chunk_size: int = BASECOV_CHUNK_SIZE
+) -> np.ndarray:
+    """Build a depth histogram from a sambamba depth base file.
+
+    The file is read in chunks so memory use depends on the maximum depth
+    rather than the number of positions.
+
+    :param basecov_fpath: Path to the base coverage file
+    :type basecov_fpath: str
+    :param chunk_size: Number of positions read at once
+    :type chunk_size: int, optional
+    :return: Number of positions with each depth.
+    :rtype: np.ndarray
+    """
+    histogram = np.zeros(1, dtype=np.int64)
+    chunks = pd.read_csv(
+        basecov_fpath,
+        sep="\t",
+        comment="#",
+        header=0,
+        usecols=["COV"],
+        dtype={"COV": np.int64},
+        chunksize=chunk_size,
+    )
+    with chunks:
+        for chunk in chunks:
+            chunk_hist = np.bincount(chunk["COV"].to_numpy())
+            histogram = merge_histograms(histogram, chunk_hist)
+    return histogram
+
+
+def _get_quantile(cum_counts: np.ndarray, n_positions: int, quantile: float) -> float:
+    """Get a quantile of the depth with linear interpolation.
+
+    The quantile is calculated with the same floating point operations as
+    numpy.percentile, which is used by pandas, to give identical results.
+    """
+    virtual_index = (n_positions - 1) * quantile
+    prev_index = max(min(math.floor(virtual_index), n_positions - 1), 0)
+    next_index = max(min(prev_index + 1, n_positions - 1), 0)
+    # the depth at an index of the sorted depths
+    prev_value = int(np.searchsorted(cum_counts, prev_index, side="right"))
+    next_value = int(np.searchsorted(cum_counts, next_index, side="right"))
+    gamma = virtual_index - prev_index
+    diff = next_value - prev_value
+    if gamma >= 0.5:
+        return float(next_value - diff * (1 - gamma))
+    return float(prev_value + diff * gamma)
+
+
+def get_depth_stats(histogram: np.ndarray, thresholds: list[str]) -> dict:
+    """Get depth statistics from a depth histogram.
+
+    :param histogram: Number of positions with each depth
+    :type histogram: np.ndarray
+    :param thresholds: Depths used to calculate the percent of positions
+        with at least that depth
+    :type thresholds: list[str]
+    :return: Depth statistics using the keys of the QC results.
+    :rtype: dict
+    """
+    n_positions = int(histogram.sum())
+    depths = np.arange(len(histogram), dtype=np.int64)
+    # number of positions with depth greater or equal to each depth
+    n_above = np.cumsum(histogram[::-1])[::-1]
+    pct_above = {}
+    for min_val in thresholds:
+        count = int(n_above[int(min_val)]) if int(min_val) < len(n_above) else 0
+        pct_above[min_val] = 100 * (count / n_positions)
+
+    mean_cov = float(int((depths * histogram).sum())) / n_positions
+
+    # Calculate the inter-quartile range / median (IQR/median)
+    cum_counts = np.cumsum(histogram)
+    quartile1 = _get_quantile(cum_counts, n_positions, 0.25)
+    median_cov = _get_quantile(cum_counts, n_positions, 0.5)
+    quartile3 = _get_quantile(cum_counts, n_positions, 0.75)
+    iqr = quartile3 - quartile1
+
+    coverage_uniformity = (
+        iqr / median_cov if quartile1 and quartile3 and median_cov else None
+    )
+    return {
+        "pct_above_x": pct_above,
+        "mean_cov": mean_cov,
+        "coverage_uniformity": coverage_uniformity,
+        "quartile1": quartile1,
+        "median_cov": median_cov,
+        "quartile3": quartile3,
+    }
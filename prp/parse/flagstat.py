@@ -0,0 +1,111 @@
+"""Count alignments by SAM flag, same as samtools flagstat.
+
+Reads are counted by the combination of flag, whether the mate is on a
+different contig and whether the mapping quality is at least 5. The flagstat
+categories are derived from these counts once all reads have been counted.
+"""
+
+import logging
+from collections import Counter
+
+import pysam
+
+from ..models.qc import FlagstatCount, FlagstatResult
+
+LOG = logging.getLogger(__name__)
+
+FLAG_PAIRED = 0x1
+FLAG_PROPER_PAIR = 0x2
+FLAG_UNMAPPED = 0x4
+FLAG_MATE_UNMAPPED = 0x8
+FLAG_READ1 = 0x40
+FLAG_READ2 = 0x80
+FLAG_SECONDARY = 0x100
+FLAG_QCFAIL = 0x200
+FLAG_DUPLICATE = 0x400
+FLAG_SUPPLEMENTARY = 0x800
+MIN_DIFF_CHR_MAPQ = 5
+
+
+class FlagstatCounter:
+    """Accumulate flagstat counts of reads."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+
+    def add(self, read: pysam.AlignedSegment) -> None:
+        """Count a read."""
+        self.counts[
+            (
+                read.flag,
+                read.next_reference_id != read.reference_id,
+                read.mapping_quality >= MIN_DIFF_CHR_MAPQ,
+            )
+        ] += 1
+
+    def merge(self, other: "FlagstatCounter") -> None:
+        """Add the counts of another counter."""
+        self.counts.update(other.counts)
+
+    def result(self) -> FlagstatResult:
+        """Get the number of reads in each flagstat category."""
+        categories = {name: [0, 0] for name in FlagstatResult.model_fields}
+        for (flag, diff_chr, high_mapq), count in self.counts.items():
+            # index 0 is reads passing qc and 1 reads failing qc
+            qc_idx = 1 if flag & FLAG_QCFAIL else 0
+            mapped = not flag & FLAG_UNMAPPED
+            primary = not flag & (FLAG_SECONDARY | FLAG_SUPPLEMENTARY)
+            secondary = flag & FLAG_SECONDARY
+            hits = {
+                "total": True,
+                "primary": primary,
+                "secondary": secondary,
+                # secondary alignments are not counted as supplementary
+                "supplementary": not secondary and flag & FLAG_SUPPLEMENTARY,
+                "duplicates": flag & FLAG_DUPLICATE,
+                "primary_duplicates": primary and flag & FLAG_DUPLICATE,
+                "mapped": mapped,
+                "primary_mapped": primary and mapped,
+            }
+            # pair statistics only include primary alignments
+            if primary and flag & FLAG_PAIRED:
+                both_mapped = mapped and not flag & FLAG_MATE_UNMAPPED
+                hits.update(
+                    {
+                        "paired": True,
+                        "read1": flag & FLAG_READ1,
+                        "read2": flag & FLAG_READ2,
+                        "properly_paired": mapped and flag & FLAG_PROPER_PAIR,
+                        "both_mapped": both_mapped,
+                        "singletons": mapped and flag & FLAG_MATE_UNMAPPED,
+                        "mate_diff_chr": both_mapped and diff_chr,
+                        "mate_diff_chr_mapq5": both_mapped and diff_chr and high_mapq,
+                    }
+                )
+            for name, hit in hits.items():
+                if hit:
+                    categories[name][qc_idx] += count
+        return FlagstatResult(
+            **{
+                name: FlagstatCount(passed=passed, failed=failed)
+                for name, (passed, failed) in categories.items()
+            }
+        )
+
+
+def get_flagstat(bam_path: str, threads: int = 1) -> FlagstatResult:
+    """Count the reads of an alignment file in the flagstat categories.
+
+    :param bam_path: Path to a sam, bam or cram file
+    :type bam_path: str
+    :param threads: Number of threads used for decompressing the file
+    :type threads: int, optional
+    :return: Number of reads passing and failing qc in each category.
+    :rtype: FlagstatResult
+    """
+    LOG.info("Counting reads in: %s", bam_path)
+    counter = FlagstatCounter()
+    with pysam.AlignmentFile(bam_path, threads=max(threads or 1, 1)) as bam:
+        for read in bam.fetch(until_eof=True):
+            counter.add(read)
+    return counter.result()
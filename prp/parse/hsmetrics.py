@@ -0,0 +1,172 @@
+"""Calculate hybrid capture metrics from the alignments of a bam file.
+
+The metrics follow Picard CollectHsMetrics without the need for a JVM or
+interval list files. Bait and target regions are read from bed files into
+an interval index of sorted, merged intervals that is searched with
+bisection.
+"""
+
+import logging
+
+import numpy as np
+import pysam
+
+from ..models.qc import HsMetricsResult
+from .coverage import DepthAccumulator, get_depth_stats
+from .intervals import IntervalIndex, load_interval_index
+
+LOG = logging.getLogger(__name__)
+
+# reads within this distance of a bait are near bait
+NEAR_DISTANCE = 250
+# minimum mapping quality of reads counted in the target coverage
+MIN_MAPQ = 20
+# unmapped, secondary, qc fail, duplicate and supplementary reads
+HS_EXCLUDE_FLAGS = 0x4 | 0x100 | 0x200 | 0x400 | 0x800
+
+
+class HsPanel:  # pylint: disable=too-few-public-methods
+    """Bait and target regions of a hybrid capture panel."""
+
+    def __init__(self, baits: IntervalIndex, targets: IntervalIndex):
+        self.baits = baits
+        self.targets = targets
+        self.near_baits = baits.padded(NEAR_DISTANCE)
+
+
+def load_hs_panel(baits: str, targets: str) -> HsPanel:
+    """Load the bait and target regions of a panel from bed files.
+
+    :param baits: Path to the bed file of the baits
+    :type baits: str
+    :param targets: Path to the bed file of the targets
+    :type targets: str
+    :return: The panel.
+    :rtype: HsPanel
+    """
+    return HsPanel(load_interval_index(baits), load_interval_index(targets))
+
+
+class HsBaseCounter:
+    """Count the aligned bases on, near and off the baits of a panel."""
+
+    def __init__(self, panel: HsPanel):
+        self.panel = panel
+        self.aligned = 0
+        self.on_bait = 0
+        self.near_bait = 0
+        self.off_bait = 0
+        self.on_target = 0
+
+    def add(self, read: pysam.AlignedSegment) -> None:
+        """Count the aligned bases of a read.
+
+        Same as Picard, reads with mapping quality 0 are not counted.
+        """
+        if read.flag & HS_EXCLUDE_FLAGS or read.mapping_quality == 0:
+            return
+        contig = read.reference_name
+        blocks = read.get_blocks()
+        n_aligned = sum(end - start for start, end in blocks)
+        self.aligned += n_aligned
+        panel = self.panel
+        for start, end in blocks:
+            self.on_target += panel.targets.overlap(contig, start, end)
+        # reads near a bait are counted as near unless the bases are on the bait
+        if panel.near_baits.overlaps(contig, read.reference_start, read.reference_end):
+            on_bait = sum(
+                panel.baits.overlap(contig, start, end) for start, end in blocks
+            )
+            self.on_bait += on_bait
+            self.near_bait += n_aligned - on_bait
+        else:
+            self.off_bait += n_aligned
+
+    def merge(self, other: "HsBaseCounter") -> None:
+        """Add the counts of another counter."""
+        self.aligned += other.aligned
+        self.on_bait += other.on_bait
+        self.near_bait += other.near_bait
+        self.off_bait += other.off_bait
+        self.on_target += other.on_target
+
+    def result(self) -> dict[str, int]:
+        """Get the number of bases in each category."""
+        return {
+            "pf_uq_bases_aligned": self.aligned,
+            "on_bait_bases": self.on_bait,
+            "near_bait_bases": self.near_bait,
+            "off_bait_bases": self.off_bait,
+            "on_target_bases": self.on_target,
+        }
+
+
+def get_target_depth_accumulator(regions: list[tuple]) -> DepthAccumulator:
+    """Get an accumulator of the target coverage, same filters as Picard.
+
+    :param regions: Contig, start and end of the targets
+    :type regions: list[tuple]
+    :return: Accumulator of the depth of the merged targets.
+    :rtype: DepthAccumulator
+    """
+    return DepthAccumulator(
+        IntervalIndex(regions).regions(),
+        min_mapq=MIN_MAPQ,
+        exclude_flags=HS_EXCLUDE_FLAGS,
+        aligned_only=True,
+    )
+
+
+def _get_fold_80_base_penalty(histogram: np.ndarray, mean_cov: float) -> float | None:
+    """Get the fold over coverage needed to raise 80% of covered bases to the mean."""
+    covered = np.cumsum(histogram[1:])
+    if len(covered) == 0 or covered[-1] == 0:
+        return None
+    # depth at the 20th percentile of the positions with non-zero depth
+    depth = int(np.searchsorted(covered, 0.2 * covered[-1])) + 1
+    return mean_cov / depth
+
+
+def get_hs_metrics(
+    bases: dict[str, int],
+    target_depth: np.ndarray,
+    panel: HsPanel,
+    genome_size: int,
+) -> HsMetricsResult:
+    """Get the hybrid capture metrics.
+
+    :param bases: Number of bases in each category, see HsBaseCounter
+    :type bases: dict[str, int]
+    :param target_depth: Depth histogram of the targets
+    :type target_depth: np.ndarray
+    :param panel: Baits and targets of the panel
+    :type panel: HsPanel
+    :param genome_size: Length of the reference
+    :type genome_size: int
+    :return: The hybrid capture metrics.
+    :rtype: HsMetricsResult
+    """
+    result = HsMetricsResult(
+        bait_territory=panel.baits.territory,
+        target_territory=panel.targets.territory,
+        genome_size=genome_size,
+        **bases,
+    )
+    aligned = result.pf_uq_bases_aligned
+    if aligned:
+        result.pct_selected_bases = (
+            result.on_bait_bases + result.near_bait_bases
+        ) / aligned
+        result.pct_off_bait = result.off_bait_bases / aligned
+        if result.bait_territory:
+            result.fold_enrichment = (result.on_bait_bases / aligned) / (
+                result.bait_territory / genome_size
+            )
+    if target_depth.sum():
+        depth_stats = get_depth_stats(target_depth, [])
+        result.mean_target_coverage = depth_stats["mean_cov"]
+        result.median_target_coverage = depth_stats["median_cov"]
+        result.fold_80_base_penalty = _get_fold_80_base_penalty(
+            target_depth, result.mean_target_coverage
+        )
+    return result
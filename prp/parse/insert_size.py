@@ -0,0 +1,168 @@
+"""Calculate insert size metrics of read pairs.
+
+The metrics are calculated the same way as Picard CollectInsertSizeMetrics.
+Each pair is counted once, by its second read, and pairs are grouped by the
+orientation of the reads. The median and median absolute deviation are
+calculated from all pairs while the mean and standard deviation exclude pairs
+with an insert size above the median plus ten median absolute deviations.
+"""
+
+import logging
+from collections import Counter, defaultdict
+
+import numpy as np
+import pysam
+
+from ..models.qc import InsertSizeResult
+
+LOG = logging.getLogger(__name__)
+
+STOP_AFTER = 1_000_000
+DEVIATIONS = 10
+# orientations with fewer pairs are not reported
+MINIMUM_PCT = 0.05
+PAIR_ORIENTATIONS = ["FR", "RF", "TANDEM"]
+# unmapped, mate unmapped, first in pair, secondary, duplicate and supplementary
+INSERT_SIZE_EXCLUDE_FLAGS = 0x4 | 0x8 | 0x40 | 0x100 | 0x400 | 0x800
+
+
+def _passes_insert_size_filter(read: pysam.AlignedSegment) -> bool:
+    """Check if a read is counted, same as the Picard filter."""
+    flag = read.flag
+    return (
+        flag & 0x1
+        and not flag & INSERT_SIZE_EXCLUDE_FLAGS
+        and read.template_length != 0
+    )
+
+
+def _get_pair_orientation(read: pysam.AlignedSegment) -> str:
+    """Get the orientation of a read pair from one of the reads."""
+    if read.is_reverse == read.mate_is_reverse:
+        return "TANDEM"
+    # 1-based 5' positions of the reads on each strand
+    if read.is_reverse:
+        positive_five_prime = read.next_reference_start + 1
+        negative_five_prime = read.reference_end
+    else:
+        positive_five_prime = read.reference_start + 1
+        negative_five_prime = read.reference_start + 1 + read.template_length
+    return "FR" if negative_five_prime > positive_five_prime else "RF"
+
+
+def _get_median(values: np.ndarray, counts: np.ndarray) -> float:
+    """Get the median of sorted values occurring counts times."""
+    cum_counts = np.cumsum(counts)
+    n_values = int(cum_counts[-1])
+    # the middle values of the sorted values
+    lower = values[np.searchsorted(cum_counts, (n_values - 1) // 2, side="right")]
+    upper = values[np.searchsorted(cum_counts, n_values // 2, side="right")]
+    return (float(lower) + float(upper)) / 2
+
+
+class InsertSizeCounter:
+    """Accumulate the insert sizes of read pairs by pair orientation."""
+
+    def __init__(self, stop_after: int | None = STOP_AFTER):
+        """Setup the counter.
+
+        :param stop_after: Ignore reads after this many reads, defaults to 1000000
+        :type stop_after: int | None, optional
+        """
+        self.stop_after = stop_after
+        self.n_reads = 0
+        self.histograms: dict[str, Counter] = defaultdict(Counter)
+
+    def add(self, read: pysam.AlignedSegment) -> None:
+        """Count the insert size of a read pair."""
+        self.n_reads += 1
+        if self.stop_after and self.n_reads > self.stop_after:
+            return
+        if _passes_insert_size_filter(read):
+            orientation = _get_pair_orientation(read)
+            self.histograms[orientation][abs(read.template_length)] += 1
+
+    def merge(self, other: "InsertSizeCounter") -> None:
+        """Add the insert sizes of another counter."""
+        self.n_reads += other.n_reads
+        for orientation, histogram in other.histograms.items():
+            self.histograms[orientation].update(histogram)
+
+    def result(self) -> InsertSizeResult | None:
+        """Get the metrics of the first reported pair orientation.
+
+        :return: Insert size metrics, None if there are no read pairs.
+        :rtype: InsertSizeResult | None
+        """
+        n_pairs = sum(sum(hist.values()) for hist in self.histograms.values())
+        for orientation in PAIR_ORIENTATIONS:
+            histogram = self.histograms.get(orientation)
+            if histogram and sum(histogram.values()) / n_pairs >= MINIMUM_PCT:
+                return _get_insert_size_metrics(histogram, orientation)
+        return None
+
+
+def get_max_insert_size(median: float, mad: float) -> int:
+    """Get the largest insert size included in the mean and standard deviation.
+
+    :param median: Median insert size
+    :type median: float
+    :param mad: Median absolute deviation of the insert sizes
+    :type mad: float
+    :return: The largest insert size that is not an outlier.
+    :rtype: int
+    """
+    return int(median + DEVIATIONS * mad)
+
+
+def _get_insert_size_metrics(histogram: Counter, orientation: str) -> InsertSizeResult:
+    """Calculate the metrics of an insert size histogram."""
+    values = np.array(sorted(histogram), dtype=np.int64)
+    counts = np.array([histogram[value] for value in values], dtype=np.int64)
+    median = _get_median(values, counts)
+    deviations = np.abs(values - median)
+    order = np.argsort(deviations, kind="stable")
+    mad = _get_median(deviations[order], counts[order])
+
+    # exclude outliers from the mean and standard deviation
+    keep = values <= get_max_insert_size(median, mad)
+    values, counts = values[keep], counts[keep]
+    n_pairs = int(counts.sum())
+    mean = float((values * counts).sum()) / n_pairs
+    std = (
+        float(np.sqrt((counts * (values - mean) ** 2).sum() / (n_pairs - 1)))
+        if n_pairs > 1
+        else None
+    )
+    return InsertSizeResult(
+        median_insert_size=median,
+        median_absolute_deviation=mad,
+        mean_insert_size=mean,
+        standard_deviation=std,
+        read_pairs=int(sum(histogram.values())),
+        pair_orientation=orientation,
+    )
+
+
+def get_insert_size_metrics(
+    bam_path: str, stop_after: int | None = STOP_AFTER, threads: int = 1
+) -> InsertSizeResult | None:
+    """Calculate insert size metrics of the read pairs in an alignment file.
+
+    :param bam_path: Path to a sam, bam or cram file
+    :type bam_path: str
+    :param stop_after: Stop after reading this many reads, defaults to 1000000
+    :type stop_after: int | None, optional
+    :param threads: Number of threads used for decompressing the file
+    :type threads: int, optional
+    :return: Insert size metrics, None if there are no read pairs.
+    :rtype: InsertSizeResult | None
+    """
+    LOG.info("Collecting insert sizes from: %s", bam_path)
+    counter = InsertSizeCounter(stop_after)
+    with pysam.AlignmentFile(bam_path, threads=max(threads or 1, 1)) as bam:
+        for read in bam.fetch(until_eof=True):
+            if stop_after and counter.n_reads >= stop_after:
+                break
+            counter.add(read)
+    return counter.result()
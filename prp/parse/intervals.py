@@ -0,0 +1,125 @@
+"""Index the regions of bed files.
+
+Regions are stored as sorted, merged intervals of each contig that are
+searched with bisection. The index of a bed file is built once and reused
+for every sample analysed with the same file.
+"""
+
+import logging
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+from .utils import get_checksum
+
+LOG = logging.getLogger(__name__)
+
+
+def read_bed_regions(bed: str) -> list[tuple]:
+    """Read the regions of a bed file.
+
+    :param bed: Path to the bed file
+    :type bed: str
+    :return: Contig, start and end of each region.
+    :rtype: list[tuple]
+    """
+    regions = []
+    with open(bed, "r", encoding="utf-8") as bedfile:
+        for line in bedfile:
+            if not line.strip() or line.startswith(("#", "track", "browser")):
+                continue
+            contig, start, end, *_ = line.split("\t")
+            regions.append((contig, int(start), int(end)))
+    return regions
+
+
+class IntervalIndex:
+    """Sorted and merged intervals of each contig searched with bisection."""
+
+    def __init__(self, regions: list[tuple]):
+        """Build the index.
+
+        :param regions: Contig, start and end of possibly overlapping regions
+        :type regions: list[tuple]
+        """
+        by_contig: dict[str, list[tuple[int, int]]] = {}
+        for contig, start, end in regions:
+            by_contig.setdefault(contig, []).append((start, end))
+        self.starts: dict[str, list[int]] = {}
+        self.ends: dict[str, list[int]] = {}
+        for contig, intervals in by_contig.items():
+            starts, ends = [], []
+            for start, end in sorted(intervals):
+                if ends and start <= ends[-1]:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self.starts[contig] = starts
+            self.ends[contig] = ends
+
+    @property
+    def territory(self) -> int:
+        """Number of positions in the intervals."""
+        return sum(
+            end - start
+            for contig, starts in self.starts.items()
+            for start, end in zip(starts, self.ends[contig])
+        )
+
+    def regions(self) -> list[tuple[str, int, int]]:
+        """Get the merged intervals as regions."""
+        return [
+            (contig, start, end)
+            for contig, starts in self.starts.items()
+            for start, end in zip(starts, self.ends[contig])
+        ]
+
+    def padded(self, padding: int) -> "IntervalIndex":
+        """Get an index of the intervals extended on both sides."""
+        return IntervalIndex(
+            [
+                (contig, max(start - padding, 0), end + padding)
+                for contig, start, end in self.regions()
+            ]
+        )
+
+    def _find(self, contig: str, start: int, end: int) -> tuple[int, int]:
+        """Get the index range of the intervals overlapping a region."""
+        if contig not in self.ends:
+            return 0, 0
+        first = bisect_right(self.ends[contig], start)
+        last = bisect_left(self.starts[contig], end)
+        return first, last
+
+    def overlaps(self, contig: str, start: int, end: int) -> bool:
+        """Check if a region overlaps any interval."""
+        first, last = self._find(contig, start, end)
+        return first < last
+
+    def overlap(self, contig: str, start: int, end: int) -> int:
+        """Get the number of positions of a region that are in the intervals."""
+        first, last = self._find(contig, start, end)
+        starts, ends = self.starts.get(contig, []), self.ends.get(contig, [])
+        return sum(
+            min(ends[idx], end) - max(starts[idx], start) for idx in range(first, last)
+        )
+
+
+@lru_cache(maxsize=16)
+def _read_interval_index(bed: str, checksum: str | None) -> IntervalIndex:
+    """Build the index of a bed file, cached by the content of the file."""
+    LOG.info("Building interval index of: %s (%s)", bed, checksum)
+    return IntervalIndex(read_bed_regions(bed))
+
+
+def load_interval_index(bed: str) -> IntervalIndex:
+    """Load the interval index of a bed file.
+
+    The index is only built again if the content of the file has changed.
+
+    :param bed: Path to the bed file
+    :type bed: str
+    :return: Index of the regions in the file.
+    :rtype: IntervalIndex
+    """
+    return _read_interval_index(bed, get_checksum(bed))
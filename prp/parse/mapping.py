@@ -1,17 +1,158 @@
-"""Parse mapping and alignment files."""
+"""Parse mapping and alignment files.
+
+Alignment files can be in sam, bam or cram format. The reads of cram files
+are decoded using the reference sequences, which htslib finds by their MD5
+checksum in a reference cache. The cache is populated from the reference
+fasta once and shared by every sample aligned to the same reference.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+from functools import lru_cache
 
 import pysam
 
+from .utils import get_checksum
+
+LOG = logging.getLogger(__name__)
+
+CRAM_MAGIC = b"CRAM"
+DEFAULT_REF_CACHE_DIR = os.path.join(tempfile.gettempdir(), "prp_ref_cache")
+
+
+def is_cram(path: str) -> bool:
+    """Check if an alignment file is in cram format.
+
+    :param path: Path to a sam, bam or cram file
+    :type path: str
+    :return: True if the file is a cram file.
+    :rtype: bool
+    """
+    with open(path, "rb") as inpt:
+        return inpt.read(len(CRAM_MAGIC)) == CRAM_MAGIC
+
+
+def _get_cache_pattern(cache_dir: str) -> str:
+    """Get the htslib path pattern of sequences in a reference cache."""
+    return os.path.join(cache_dir, "%2s", "%2s", "%s")
+
+
+@lru_cache(maxsize=8)
+def get_reference_md5(reference: str, checksum: str | None) -> dict[str, str]:
+    """Get the MD5 checksum of each sequence in a fasta file.
+
+    The checksums are calculated as in the M5 tag of sam headers, from the
+    upper case sequence. They are cached by the content of the file.
+
+    :param reference: Path to the fasta file
+    :type reference: str
+    :param checksum: Checksum of the content of the file
+    :type checksum: str | None
+    :return: MD5 checksum by sequence name.
+    :rtype: dict[str, str]
+    """
+    LOG.info("Calculating sequence checksums of: %s (%s)", reference, checksum)
+    md5 = {}
+    with pysam.FastxFile(reference) as fasta:
+        for record in fasta:
+            md5[record.name] = hashlib.md5(record.sequence.upper().encode()).hexdigest()
+    return md5
+
+
+def _populate_reference_cache(reference: str, cache_dir: str) -> None:
+    """Write the sequences of a fasta file that are not in the cache."""
+    md5 = get_reference_md5(reference, get_checksum(reference))
+    missing = {}
+    for name, seq_md5 in md5.items():
+        path = os.path.join(cache_dir, seq_md5[:2], seq_md5[2:4], seq_md5[4:])
+        if not os.path.exists(path):
+            missing[name] = path
+    if not missing:
+        return
+    LOG.info("Adding %d sequences to reference cache: %s", len(missing), cache_dir)
+    with pysam.FastxFile(reference) as fasta:
+        for record in fasta:
+            if record.name not in missing:
+                continue
+            path = missing[record.name]
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write to a temporary file so that other runs never read a partial sequence
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as outp:
+                    outp.write(record.sequence.upper())
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+
+def setup_reference_cache(reference: str, cache_dir: str | None = None) -> str:
+    """Let htslib decode cram files with sequences from a reference cache.
+
+    The sequences of the reference are added to the cache if they are not
+    already there, and the REF_PATH and REF_CACHE environment variables are
+    set so that htslib reads them from the cache instead of loading the
+    reference fasta or downloading them.
+
+    :param reference: Path to the reference fasta
+    :type reference: str
+    :param cache_dir: Directory of the cache, defaults to DEFAULT_REF_CACHE_DIR
+    :type cache_dir: str | None, optional
+    :return: Path to the cache directory.
+    :rtype: str
+    """
+    cache_dir = cache_dir or DEFAULT_REF_CACHE_DIR
+    _populate_reference_cache(reference, cache_dir)
+    pattern = _get_cache_pattern(cache_dir)
+    os.environ["REF_PATH"] = pattern
+    os.environ["REF_CACHE"] = pattern
+    return cache_dir
+
+
+def check_reference(alignment_path: str, reference: str) -> bool:
+    """Check that a cram file was written with the sequences of a reference.
+
+    Only the header is read. Missing files, files that are not cram files
+    and sequences without a M5 tag are not checked.
+
+    :param alignment_path: Path to a sam, bam or cram file
+    :type alignment_path: str
+    :param reference: Path to the reference fasta
+    :type reference: str
+    :return: False if the checksum of any sequence differs from the reference.
+    :rtype: bool
+    """
+    if not os.path.isfile(alignment_path) or not is_cram(alignment_path):
+        return True
+    md5 = get_reference_md5(reference, get_checksum(reference))
+    with pysam.AlignmentFile(alignment_path, check_sq=False) as aln:
+        sequences = aln.header.to_dict().get("SQ", [])
+    for sequence in sequences:
+        if "M5" in sequence and md5.get(sequence["SN"]) != sequence["M5"]:
+            LOG.warning(
+                "Sequence %s of %s differs from reference: %s",
+                sequence["SN"],
+                alignment_path,
+                reference,
+            )
+            return False
+    return True
+
 
-def get_reference_seq_accnr(bam_path: str) -> str:
+def get_reference_seq_accnr(bam_path: str, reference: str | None = None) -> str:
     """Get reference sequence accession number.
 
-    :param sam_path: sam file path
-    :type sam_path: str
+    :param bam_path: sam, bam or cram file path
+    :type bam_path: str
+    :param reference: Reference fasta used for decoding cram files
+    :type reference: str | None, optional
     :return: accession number
     :rtype: str
     """
-    samfile = pysam.AlignmentFile(bam_path)
-    # get first read
-    read = next(samfile.fetch())
-    return read.reference_name
+    with pysam.AlignmentFile(bam_path, reference_filename=reference) as samfile:
+        # get first read
+        read = next(samfile.fetch(until_eof=True))
+        return read.reference_name
@@ -1,9 +1,9 @@
 """Parse metadata passed to pipeline."""
 import json
 import logging
+import os
 from datetime import datetime
-
-from Bio import SeqIO
+from functools import lru_cache
 
 from ..models.metadata import PipelineInfo, SequencingInfo, SoupVersion
 
@@ -20,16 +20,28 @@ def get_database_info(process_metadata: list[str]) -> list[SoupVersion]:
     """
     db_info = []
     for soup_filepath in process_metadata:
-        with open(soup_filepath, "r", encoding="utf-8") as soup:
-            dbs = json.load(soup)
-            if isinstance(dbs, (list, tuple)):
-                for db in dbs:
-                    db_info.append(SoupVersion(**db))
-            else:
-                db_info.append(SoupVersion(**dbs))
+        db_info.extend(
+            _read_soup_versions(soup_filepath, os.stat(soup_filepath).st_mtime_ns)
+        )
     return db_info
 
 
+@lru_cache(maxsize=128)
+def _read_soup_versions(
+    soup_filepath: str, mtime: int  # pylint: disable=unused-argument
+) -> tuple[SoupVersion, ...]:
+    """Read database or software versions from file.
+
+    The files are often shared by all samples in a run, the modification time
+    is part of the cache key so edited files are reread.
+    """
+    with open(soup_filepath, "r", encoding="utf-8") as soup:
+        dbs = json.load(soup)
+    if isinstance(dbs, (list, tuple)):
+        return tuple(SoupVersion(**db) for db in dbs)
+    return (SoupVersion(**dbs),)
+
+
 def parse_sequence_date_from_run_id(run_id: str) -> datetime | None:
     err_msg = 'Unrecognized format of run_id, sequence time cant be determined'
     if '_' not in run_id:
@@ -81,7 +93,20 @@ def parse_run_info(run_metadata: str, process_metadata: list[str]) -> tuple[Sequ
     return sample_info, seq_info, pipeline_info
 
 
-def get_gb_genome_version(fasta_path: str) -> str:
+def get_gb_genome_version(fasta_path: str) -> tuple[str, str]:
     """Retrieve genbank genome version"""
+    return _read_gb_genome_version(fasta_path, os.stat(fasta_path).st_mtime_ns)
+
+
+@lru_cache(maxsize=32)
+def _read_gb_genome_version(
+    fasta_path: str, mtime: int  # pylint: disable=unused-argument
+) -> tuple[str, str]:
+    """Read genome version from the first fasta record.
+
+    The modification time is part of the cache key so edited files are reread.
+    """
+    from Bio import SeqIO  # pylint: disable=import-outside-toplevel
+
     record = next(SeqIO.parse(fasta_path, "fasta"))
     return record.id, record.description.rstrip(", complete genome")
@@ -1,24 +1,121 @@
 """Parse output of QC tools."""
 import csv
+import hashlib
 import json
 import logging
+import multiprocessing
 import os
 import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
 
-import pandas as pd
 import pysam
 from click.types import File
 
 from ..models.qc import PostAlignQcResult, QcMethodIndex, QcSoftware, QuastQcResult
+from ..profiling import profile_stage
+from .approximate_qc import collect_approximate_stats
+from .bam_qc import (
+    SHARDS_PER_PROCESS,
+    MappedReadCounter,
+    MappingQualityHistogram,
+    collect_alignment_stats,
+    collect_alignment_stats_parallel,
+    count_mapped_reads,
+    get_index_read_counts,
+)
+from .coverage import (
+    DepthAccumulator,
+    get_basecov_histogram,
+    get_depth_stats,
+    get_regions,
+)
+from .flagstat import FlagstatCounter, get_flagstat
+from .hsmetrics import (
+    HsBaseCounter,
+    HsPanel,
+    get_hs_metrics,
+    get_target_depth_accumulator,
+    load_hs_panel,
+)
+from .insert_size import InsertSizeCounter, get_insert_size_metrics
+from .mapping import is_cram, setup_reference_cache
+from .tool_graph import ToolStep, get_reserved_cpus, run_tool_steps
+from .utils import get_checksum
 
 LOG = logging.getLogger(__name__)
 
+DEPTH_THRESHOLDS = ["1", "10", "30", "100", "250", "500", "1000"]
+
+
+def get_interval_list_path(cache_dir: str, bed: str, dict_file: str) -> str:
+    """Get the path of a cached interval list.
+
+    The interval list is identified by the content of the bed file and the
+    sequence dictionary it is created from, not by their paths.
+
+    :param cache_dir: Directory where the interval lists are stored
+    :type cache_dir: str
+    :param bed: Path to the bed file
+    :type bed: str
+    :param dict_file: Path to the sequence dictionary
+    :type dict_file: str
+    :return: Path of the interval list in the cache directory.
+    :rtype: str
+    """
+    content = f"bed:{get_checksum(bed)}\ndict:{get_checksum(dict_file)}"
+    key = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{key}.interval_list")
+
+
+def get_qc_accumulators(
+    regions: list[tuple], insert_size: bool = False, hs_panel: HsPanel | None = None
+) -> dict:
+    """Get the accumulators of the alignment metrics.
+
+    :param regions: Contig, start and end of the regions used for depth
+    :type regions: list[tuple]
+    :param insert_size: Collect insert sizes, defaults to False
+    :type insert_size: bool, optional
+    :param hs_panel: Collect hybrid capture metrics of the panel, the regions
+        must be its targets, defaults to None
+    :type hs_panel: HsPanel | None, optional
+    :return: Accumulators by the name of their metric
+    :rtype: dict
+    """
+    accumulators = {
+        "flagstat": FlagstatCounter(),
+        "mapq": MappingQualityHistogram(),
+        "mapped_by_contig": MappedReadCounter(),
+        "depth": DepthAccumulator(regions),
+    }
+    if insert_size:
+        accumulators["insert_size"] = InsertSizeCounter()
+    if hs_panel is not None:
+        accumulators["hs_bases"] = HsBaseCounter(hs_panel)
+        accumulators["target_depth"] = get_target_depth_accumulator(regions)
+    return accumulators
+
 
 class QC:
     """Class for retrieving qc results"""
 
-    def __init__(
-        self, sample_id, bam, reference, cpus, bed: str = None, baits: str = None
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        sample_id,
+        bam,
+        reference,
+        cpus,
+        bed: str = None,
+        baits: str = None,
+        picard_insert_size: bool = False,
+        interval_cache_dir: str | None = None,
+        picard_hsmetrics: bool = False,
+        quick: bool = False,
+        approximate: float | None = None,
+        ref_cache_dir: str | None = None,
     ):
         self.results = {}
         self.bam = bam
@@ -27,17 +124,46 @@ class QC:
         self.cpus = cpus
         self.baits = baits
         self.reference = reference
-        self.paired = self.is_paired()
+        self.picard_insert_size = picard_insert_size
+        self.interval_cache_dir = interval_cache_dir
+        self.picard_hsmetrics = picard_hsmetrics
+        self.quick = quick
+        self.approximate = approximate
+        # cram files are decoded with the reference sequences from a cache
+        if self.reference and is_cram(self.bam):
+            with profile_stage("reference_cache"):
+                setup_reference_cache(self.reference, ref_cache_dir)
+        with profile_stage("check_paired"):
+            self.paired = self.is_paired()
         self.rm_files = True
 
     def write_json_result(self, json_result: dict, output_filepath: str) -> None:
         """Write out json file"""
-        with open(output_filepath, "w", encoding="utf-8") as json_file:
+        with profile_stage("serialize"), open(
+            output_filepath, "w", encoding="utf-8"
+        ) as json_file:
             json.dump(json_result, json_file, indent=4)
 
-    def convert2intervals(self, bed_baits: str, dict_file: str) -> None:
-        """Convert files to interval lists"""
-        bed2int_cmd = [
+    def get_dict_file(self) -> str:
+        """Get the sequence dictionary of the reference"""
+        dict_file = self.reference
+        if not dict_file.endswith(".dict"):
+            dict_file += ".dict"
+        return dict_file
+
+    def get_interval_list_path(self, bed_baits: str) -> str:
+        """Get the path of the interval list of a bed file"""
+        if self.interval_cache_dir is None:
+            return f"{bed_baits}.interval_list"
+        return get_interval_list_path(
+            self.interval_cache_dir, bed_baits, self.get_dict_file()
+        )
+
+    def get_interval_list_cmd(
+        self, bed_baits: str, dict_file: str, output: str | None = None
+    ) -> list:
+        """Get command converting a bed file to an interval list"""
+        return [
             "java",
             "-jar",
             "/usr/bin/picard.jar",
@@ -45,11 +171,38 @@ class QC:
             "-I",
             bed_baits,
             "-O",
-            f"{bed_baits}.interval_list",
+            output or f"{bed_baits}.interval_list",
             "-SD",
             dict_file,
         ]
-        self.system_p(bed2int_cmd)
+
+    def convert2intervals(self, bed_baits: str, dict_file: str) -> None:
+        """Convert files to interval lists"""
+        self.system_p(self.get_interval_list_cmd(bed_baits, dict_file))
+
+    def create_interval_list(self, bed_baits: str) -> str:
+        """Create the interval list of a bed file unless it already exists.
+
+        The interval list is written to a temporary file that is renamed when
+        it is complete, so samples running concurrently never read a partial
+        interval list.
+        """
+        interval_list = self.get_interval_list_path(bed_baits)
+        if os.path.isfile(interval_list):
+            LOG.info("Using existing interval list: %s", interval_list)
+            return interval_list
+        out_dir = os.path.dirname(os.path.abspath(interval_list))
+        os.makedirs(out_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".interval_list", dir=out_dir)
+        os.close(fd)
+        try:
+            cmd = self.get_interval_list_cmd(bed_baits, self.get_dict_file(), tmp_path)
+            self.system_p(cmd)
+            os.replace(tmp_path, interval_list)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return interval_list
 
     def parse_hsmetrics(self, hsmetrics: str) -> None:
         """Parse hs metrics"""
@@ -76,35 +229,9 @@ class QC:
                     break
 
     def parse_basecov_bed(self, basecov_fpath: str, thresholds: list) -> None:
-        """Parse base coverage bed file using pandas"""
-        df = pd.read_csv(basecov_fpath, sep="\t", comment="#", header=0)
-
-        tot_bases = len(df)
-        pct_above = {
-            min_val: len(df[df["COV"] >= int(min_val)]) for min_val in thresholds
-        }
-        pct_above = {
-            min_val: 100 * (pct_above[min_val] / tot_bases) for min_val in thresholds
-        }
-
-        mean_cov = df["COV"].mean()
-
-        # Calculate the inter-quartile range / median (IQR/median)
-        quartile1 = df["COV"].quantile(0.25)
-        median_cov = df["COV"].median()
-        quartile3 = df["COV"].quantile(0.75)
-        iqr = quartile3 - quartile1
-
-        coverage_uniformity = (
-            iqr / median_cov if quartile1 and quartile3 and median_cov else None
-        )
-
-        self.results["pct_above_x"] = pct_above
-        self.results["mean_cov"] = mean_cov
-        self.results["coverage_uniformity"] = coverage_uniformity
-        self.results["quartile1"] = quartile1
-        self.results["median_cov"] = median_cov
-        self.results["quartile3"] = quartile3
+        """Parse base coverage bed file using a depth histogram"""
+        histogram = get_basecov_histogram(basecov_fpath)
+        self.results.update(get_depth_stats(histogram, thresholds))
 
     def is_paired(self) -> bool:
         """Check if reads are paired"""
@@ -122,118 +249,278 @@ class QC:
     def system_p(self, cmd: list) -> None:
         """Execute subprocess"""
         LOG.info("RUNNING: %s", " ".join(cmd))
-        result = subprocess.run(cmd, check=True, text=True)
-        if result.stderr:
-            print(f"stderr: {result.stderr}")
+        # name picard commands after the tool
+        tool = cmd[3] if cmd[0] == "java" else " ".join(cmd[:2])
+        with profile_stage(f"subprocess:{tool}"):
+            result = subprocess.run(cmd, check=False, capture_output=True, text=True)
         if result.stdout:
-            print(f"stdout: {result.stdout}")
+            LOG.debug("%s stdout: %s", tool, result.stdout)
+        if result.stderr:
+            LOG.debug("%s stderr: %s", tool, result.stderr)
+        result.check_returncode()
+
+    def get_hsmetrics_cmd(self) -> list:
+        """Get Picard hsmetrics command"""
+        return [
+            "java",
+            "-jar",
+            "/usr/bin/picard.jar",
+            "CollectHsMetrics",
+            "-I",
+            self.bam,
+            "-O",
+            f"{self.bam}.hsmetrics",
+            "-R",
+            self.reference,
+            "-BAIT_INTERVALS",
+            self.get_interval_list_path(self.baits),
+            "-TARGET_INTERVALS",
+            self.get_interval_list_path(self.bed),
+        ]
+
+    def get_ismetrics_cmd(self) -> list:
+        """Get Picard insert size metrics command"""
+        return [
+            "java",
+            "-jar",
+            "/usr/bin/picard.jar",
+            "CollectInsertSizeMetrics",
+            "-I",
+            self.bam,
+            "-R",
+            self.reference,
+            "-O",
+            f"{self.bam}.inssize",
+            "-H",
+            f"{self.bam}.ins.pdf",
+            "-STOP_AFTER",
+            "1000000",
+        ]
+
+    def parse_picard_ismetrics(self) -> None:
+        """Parse and remove the output of Picard insert size metrics"""
+        self.parse_ismetrics(f"{self.bam}.inssize")
+
+        if self.rm_files:
+            # Remove ismetrics files
+            os.remove(f"{self.bam}.inssize")
+            os.remove(f"{self.bam}.ins.pdf")
+
+    def collect_picard_ismetrics(self) -> None:
+        """Collect insert size metrics with Picard"""
+        self.system_p(self.get_ismetrics_cmd())
+        self.parse_picard_ismetrics()
+
+    def index_bam(self) -> None:
+        """Index bam or cram file if .bai, .csi or .crai does not exist"""
+        index_exts = (".bai", ".csi", ".crai")
+        if not any(os.path.exists(f"{self.bam}{ext}") for ext in index_exts):
+            LOG.info("Indexing alignment file: %s", self.bam)
+            with profile_stage("index"):
+                pysam.index(self.bam)
+
+    def collect_stats_parallel(
+        self,
+        regions: list[tuple],
+        insert_size: bool,
+        hs_panel: HsPanel | None,
+        cpus: int,
+    ) -> dict:
+        """Collect alignment stats from regions of the bam file in parallel"""
+        self.index_bam()
+
+        # the stats are collected in a thread of the step runner and forking a
+        # process with other threads running can deadlock the workers
+        start_method = (
+            "forkserver"
+            if "forkserver" in multiprocessing.get_all_start_methods()
+            else "spawn"
+        )
+        with ProcessPoolExecutor(
+            max_workers=cpus, mp_context=multiprocessing.get_context(start_method)
+        ) as executor:
+            # insert sizes are collected from the first reads of the file
+            if insert_size:
+                ismetrics = executor.submit(get_insert_size_metrics, self.bam)
+            stats = collect_alignment_stats_parallel(
+                self.bam,
+                partial(get_qc_accumulators, hs_panel=hs_panel),
+                regions,
+                executor,
+                n_shards=cpus * SHARDS_PER_PROCESS,
+            )
+            if insert_size:
+                stats["insert_size"] = ismetrics.result()
+        return stats
+
+    def collect_stats(
+        self,
+        insert_size: bool,
+        hs_panel: HsPanel | None = None,
+        cpus: int | None = None,
+    ) -> dict:
+        """Collect alignment stats, in parallel if there are multiple cpus"""
+        cpus = self.cpus if cpus is None else cpus
+        with pysam.AlignmentFile(self.bam) as bam:
+            regions = get_regions(bam, self.bed)
+            genome_size = sum(bam.lengths)
+            references = bam.references
+        if cpus and cpus > 1:
+            stats = self.collect_stats_parallel(regions, insert_size, hs_panel, cpus)
+        else:
+            accumulators = get_qc_accumulators(regions, insert_size, hs_panel)
+            stats = collect_alignment_stats(self.bam, accumulators)
+        # include contigs without mapped reads, same as the index counts
+        mapped = stats["mapped_by_contig"]
+        stats["mapped_by_contig"] = {
+            contig: mapped.get(contig, 0) for contig in references
+        }
+        if hs_panel is not None:
+            stats["hsmetrics"] = get_hs_metrics(
+                stats.pop("hs_bases"), stats.pop("target_depth"), hs_panel, genome_size
+            )
+        return stats
+
+    def run_quick(self) -> dict:
+        """Count reads from the bam index without reading the alignments.
+
+        Cram indexes have no read counts, so the flags of all reads of a cram
+        file are decoded instead.
+        """
+        if is_cram(self.bam):
+            # cram indexes have no read counts
+            with profile_stage("count_reads"):
+                mapped, n_unmapped = count_mapped_reads(self.bam)
+        else:
+            self.index_bam()
+            with profile_stage("index_stats"), pysam.AlignmentFile(self.bam) as bam:
+                mapped, n_unmapped = get_index_read_counts(bam)
+        n_mapped = sum(mapped.values())
+        # reads failing qc can not be told apart in the index counts
+        self.results["n_total_reads"] = n_mapped + n_unmapped
+        self.results["n_total_mapped_reads"] = n_mapped
+        self.results["n_mapped_reads_by_contig"] = mapped
+        self.results["sample_id"] = self.sample_id
+        return self.results
+
+    def run_approximate(self) -> dict:
+        """Estimate QC metrics from a random sample of the bam file.
+
+        The read counts of a bam file are exact counts from its index. Cram
+        files are not counted, as that requires decoding every read.
+        """
+        # sampled blocks are fetched using the index
+        self.index_bam()
+        if is_cram(self.bam):
+            LOG.info("Skipping read counts of cram file: %s", self.bam)
+            self.results["sample_id"] = self.sample_id
+        else:
+            self.run_quick()
+        with pysam.AlignmentFile(self.bam) as bam:
+            regions = get_regions(bam, self.bed)
+        parallel = self.cpus and self.cpus > 1
+        with profile_stage("approximate_stats"), (
+            ProcessPoolExecutor(max_workers=self.cpus) if parallel else nullcontext()
+        ) as executor:
+            estimates = collect_approximate_stats(
+                self.bam, regions, self.approximate, DEPTH_THRESHOLDS, executor
+            )
+        if not self.paired:
+            estimates.pop("ins_size", None)
+            estimates["confidence_intervals"].pop("ins_size", None)
+        self.results.update(estimates)
+        return self.results
 
     def run(self) -> dict:
         """Run QC info extraction"""
-        if self.baits and self.reference:
+        if self.quick:
+            return self.run_quick()
+        if self.approximate:
+            return self.run_approximate()
+        # external tools and the alignment stats are run concurrently
+        steps = []
+        hs_panel = None
+        if self.baits and self.bed and not self.picard_hsmetrics:
             LOG.info("Calculating HS-metrics...")
-            dict_file = self.reference
-            if not dict_file.endswith(".dict"):
-                dict_file += ".dict"
-
+            hs_panel = load_hs_panel(self.baits, self.bed)
+        elif self.baits and self.reference:
+            LOG.info("Calculating HS-metrics with Picard...")
             # Convert bed/baits file to interval list
-            if not os.path.isfile(f"{self.bed}.interval_list"):
-                self.convert2intervals(self.bed, dict_file)
-            if not os.path.isfile(f"{self.baits}.interval_list"):
-                self.convert2intervals(self.baits, dict_file)
+            interval_steps = []
+            for bed_baits in dict.fromkeys([self.bed, self.baits]):
+                interval_steps.append(f"BedToIntervalList:{bed_baits}")
+                steps.append(
+                    ToolStep(
+                        interval_steps[-1],
+                        func=partial(self.create_interval_list, bed_baits),
+                    )
+                )
 
             # Run picard hsmetrics command
-            hsmet_cmd = [
-                "java",
-                "-jar",
-                "/usr/bin/picard.jar",
-                "CollectHsMetrics",
-                "-I",
-                self.bam,
-                "-O",
-                f"{self.bam}.hsmetrics",
-                "-R",
-                self.reference,
-                "-BAIT_INTERVALS",
-                f"{self.baits}.interval_list",
-                "-TARGET_INTERVALS",
-                f"{self.bed}.interval_list",
-            ]
-            self.system_p(hsmet_cmd)
-
-            # Parse hsmetrics output file
-            self.parse_hsmetrics(f"{self.bam}.hsmetrics")
-
-        # Collect basic sequencing statistics
-        LOG.info("Collecting basic stats...")
-        sambamba_flagstat_cmd = (
-            f"sambamba flagstat {'-t '+ str(self.cpus) if self.cpus else ''} {self.bam}"
+            steps.append(
+                ToolStep(
+                    "CollectHsMetrics",
+                    cmd=self.get_hsmetrics_cmd(),
+                    requires=interval_steps,
+                )
+            )
+
+        # Get insert size metrics with picard
+        if self.paired and self.picard_insert_size:
+            LOG.info("Collect insert sizes...")
+            steps.append(
+                ToolStep("CollectInsertSizeMetrics", cmd=self.get_ismetrics_cmd())
+            )
+
+        # Collect the alignment metrics in a single pass over the bam file,
+        # leaving the cpus used by the other steps
+        LOG.info("Collecting alignment stats...")
+        insert_size = self.paired and not self.picard_insert_size
+        stats_cpus = max(1, (self.cpus or 1) - get_reserved_cpus(steps))
+        steps.append(
+            ToolStep(
+                "alignment_stats",
+                func=partial(self.collect_stats, insert_size, hs_panel, stats_cpus),
+                cpus=stats_cpus,
+            )
         )
-        flagstat = subprocess.check_output(
-            sambamba_flagstat_cmd, shell=True, text=True
-        ).splitlines()
-        n_reads = int(flagstat[0].split()[0])
-        n_dup_reads = int(flagstat[3].split()[0])
-        n_mapped_reads = int(flagstat[4].split()[0])
-        n_read_pairs = int(flagstat[5].split()[0])
+        outputs = run_tool_steps(steps, cpus=self.cpus or 1)
+        stats = outputs["alignment_stats"]
 
-        # Get insert size metrics
-        if self.paired:
-            LOG.info("Collect insert sizes...")
-            cmd = [
-                "java",
-                "-jar",
-                "/usr/bin/picard.jar",
-                "CollectInsertSizeMetrics",
-                "-I",
-                self.bam,
-                "-O",
-                f"{self.bam}.inssize",
-                "-H",
-                f"{self.bam}.ins.pdf",
-                "-STOP_AFTER",
-                "1000000",
-            ]
-            self.system_p(cmd)
+        # Parse hsmetrics output file
+        if "CollectHsMetrics" in outputs:
+            self.parse_hsmetrics(f"{self.bam}.hsmetrics")
+        elif "hsmetrics" in stats:
+            hsmetrics = stats["hsmetrics"]
+            self.results["pct_on_target"] = hsmetrics.pct_selected_bases
+            self.results["fold_enrichment"] = hsmetrics.fold_enrichment
+            self.results["median_coverage"] = hsmetrics.median_target_coverage
+            self.results["fold_80"] = hsmetrics.fold_80_base_penalty
 
-            # Parse ismetrics output file
-            self.parse_ismetrics(f"{self.bam}.inssize")
-
-            if self.rm_files:
-                # Remove ismetrics files
-                os.remove(f"{self.bam}.inssize")
-                os.remove(f"{self.bam}.ins.pdf")
-
-        out_prefix = f"{self.bam}_postalnQC"
-        thresholds = ["1", "10", "30", "100", "250", "500", "1000"]
-
-        # Index bam file if .bai does not exist
-        if not os.path.exists(f"{self.bam}.bai"):
-            LOG.info("Indexing bam file: %s.bai", self.bam)
-            sambamba_index_cmd = ["sambamba", "index", self.bam]
-            self.system_p(sambamba_index_cmd)
-
-        # Generate sambamba depth command
-        LOG.info("Collecting depth stats...")
-        sambamba_depth_cmd = ["sambamba", "depth", "base", "-c", "0"]
-        if self.cpus:
-            sambamba_depth_cmd.extend(["-t", str(self.cpus)])
-        if self.bed:
-            sambamba_depth_cmd.extend(["-L", self.bed])
-        sambamba_depth_cmd.extend([self.bam, "-o", f"{out_prefix}.basecov.bed"])
-        self.system_p(sambamba_depth_cmd)
-
-        # Parse base coverage file
-        self.parse_basecov_bed(f"{out_prefix}.basecov.bed", thresholds)
-        if self.rm_files:
-            # Remove base coverage file
-            os.remove(f"{out_prefix}.basecov.bed")
-
-        self.results["n_reads"] = n_reads
-        self.results["n_mapped_reads"] = n_mapped_reads
-        self.results["n_read_pairs"] = n_read_pairs
-        self.results["n_dup_reads"] = n_dup_reads
-        self.results["dup_pct"] = n_dup_reads / n_mapped_reads
+        # Get insert size metrics
+        if "CollectInsertSizeMetrics" in outputs:
+            self.parse_picard_ismetrics()
+        elif stats.get("insert_size") is not None:
+            ismetrics = stats["insert_size"]
+            self.results["ins_size"] = ismetrics.mean_insert_size
+            if ismetrics.standard_deviation is not None:
+                self.results["ins_size_dev"] = ismetrics.standard_deviation
+
+        self.results.update(get_depth_stats(stats["depth"], DEPTH_THRESHOLDS))
+        self.results["mapq_histogram"] = stats["mapq"]
+
+        flagstat = stats["flagstat"]
+        self.results["n_reads"] = flagstat.total.passed
+        self.results["n_mapped_reads"] = flagstat.mapped.passed
+        # all reads are counted, same as the counts of the index in quick mode
+        self.results["n_total_reads"] = flagstat.total.passed + flagstat.total.failed
+        self.results["n_total_mapped_reads"] = (
+            flagstat.mapped.passed + flagstat.mapped.failed
+        )
+        self.results["n_mapped_reads_by_contig"] = stats["mapped_by_contig"]
+        self.results["n_read_pairs"] = flagstat.paired.passed
+        self.results["n_dup_reads"] = flagstat.duplicates.passed
+        self.results["dup_pct"] = flagstat.duplicates.passed / flagstat.mapped.passed
         self.results["sample_id"] = self.sample_id
 
         return self.results
@@ -285,21 +572,51 @@ def parse_postalignqc_results(postalignqc_fpath: str) -> QcMethodIndex:
             ins_size_dev=None
             if "ins_size_dev" not in qc_dict
             else int(float(qc_dict["ins_size_dev"])),
-            mean_cov=int(qc_dict["mean_cov"]),
-            pct_above_x=qc_dict["pct_above_x"],
-            n_reads=int(qc_dict["n_reads"]),
-            n_mapped_reads=int(qc_dict["n_mapped_reads"]),
-            n_read_pairs=int(qc_dict["n_read_pairs"]),
+            mean_cov=None if "mean_cov" not in qc_dict else int(qc_dict["mean_cov"]),
+            pct_above_x=qc_dict.get("pct_above_x"),
+            n_reads=None if "n_reads" not in qc_dict else int(qc_dict["n_reads"]),
+            n_mapped_reads=None
+            if "n_mapped_reads" not in qc_dict
+            else int(qc_dict["n_mapped_reads"]),
+            n_total_reads=qc_dict.get("n_total_reads"),
+            n_total_mapped_reads=qc_dict.get("n_total_mapped_reads"),
+            n_mapped_reads_by_contig=qc_dict.get("n_mapped_reads_by_contig"),
+            n_read_pairs=None
+            if "n_read_pairs" not in qc_dict
+            else int(qc_dict["n_read_pairs"]),
             coverage_uniformity=float(qc_dict["coverage_uniformity"])
             if qc_dict.get("coverage_uniformity") is not None
             else None,
-            quartile1=float(qc_dict["quartile1"]),
-            median_cov=float(qc_dict["median_cov"]),
-            quartile3=float(qc_dict["quartile3"]),
+            quartile1=None
+            if "quartile1" not in qc_dict
+            else float(qc_dict["quartile1"]),
+            median_cov=None
+            if "median_cov" not in qc_dict
+            else float(qc_dict["median_cov"]),
+            quartile3=None
+            if "quartile3" not in qc_dict
+            else float(qc_dict["quartile3"]),
+            confidence_intervals=qc_dict.get("confidence_intervals"),
+            sampled_fraction=qc_dict.get("sampled_fraction"),
         )
     return QcMethodIndex(software=QcSoftware.POSTALIGNQC, result=qc_res)
 
 
+def parse_flagstat_results(bam_fpath: str, threads: int = 1) -> QcMethodIndex:
+    """Count the reads of a bam file by SAM flag.
+
+    :param bam_fpath: Path to the bam file
+    :type bam_fpath: str
+    :param threads: Number of threads used for decompressing the file
+    :type threads: int, optional
+    :return: Flagstat counts
+    :rtype: QcMethodIndex
+    """
+    LOG.info("Parsing bam file: %s", bam_fpath)
+    qc_res = get_flagstat(bam_fpath, threads=threads)
+    return QcMethodIndex(software=QcSoftware.FLAGSTAT, result=qc_res)
+
+
 def parse_alignment_results(
     sample_id: str,
     bam: File,
@@ -308,6 +625,12 @@ def parse_alignment_results(
     output: File,
     bed: File | None = None,
     baits: File | None = None,
+    picard_insert_size: bool = False,
+    interval_cache_dir: str | None = None,
+    picard_hsmetrics: bool = False,
+    quick: bool = False,
+    approximate: float | None = None,
+    ref_cache_dir: str | None = None,
 ) -> None:
     """Parse bam file and extract relevant metrics"""
     LOG.info("Parsing bam file: %s", bam.name)
@@ -318,6 +641,12 @@ def parse_alignment_results(
         cpus,
         getattr(bed, "name", None),
         getattr(baits, "name", None),
+        picard_insert_size,
+        interval_cache_dir,
+        picard_hsmetrics,
+        quick,
+        approximate,
+        ref_cache_dir,
     )
     qc_dict = qc.run()
     LOG.info("Storing results to: %s", output.name)
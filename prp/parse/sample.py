@@ -0,0 +1,592 @@
+"""Parse all analysis results of a sample.
+
+The results of each analysis software are parsed in independent steps that
+can be executed concurrently. The output of the steps are merged in a fixed
+order so the sample result is the same regardless of how the steps were run.
+"""
+
+import csv
+import inspect
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
+
+import click
+import numpy as np
+import pandas as pd
+
+from ..models.metadata import SoupType, SoupVersion
+from ..models.phenotype import ElementType
+from ..models.qc import QcMethodIndex
+from ..models.sample import MethodIndex, PipelineResult, ReferenceGenome
+from ..profiling import Profiler, get_profiler, profile_stage
+from .mapping import check_reference
+from .metadata import get_gb_genome_version, parse_run_info
+from .phenotype import (
+    parse_amrfinder_amr_pred,
+    parse_amrfinder_vir_pred,
+    parse_emmtyper_pred,
+    parse_mykrobe_amr_pred,
+    parse_resfinder_amr_pred,
+    parse_shigapass_pred,
+    parse_tbprofiler_amr_pred,
+    parse_virulencefinder_vir_pred,
+)
+from .phenotype.tbprofiler import (
+    EXPECTED_SCHEMA_VERSION as EXPECTED_TBPROFILER_SCHEMA_VERSION,
+)
+from .qc import parse_postalignqc_results, parse_quast_results
+from .species import get_mykrobe_spp_prediction, parse_kraken_result
+from .typing import (
+    parse_cgmlst_results,
+    parse_mlst_results,
+    parse_mykrobe_lineage_results,
+    parse_serotypefinder_oh_typing,
+    parse_tbprofiler_lineage_results,
+    parse_virulencefinder_stx_typing,
+)
+from .utils import _get_path, get_db_version
+from .variant import load_variants
+
+if TYPE_CHECKING:
+    from ..cache import ParseCache
+
+LOG = logging.getLogger(__name__)
+
+# result sections that steps can append entries to
+LIST_SECTIONS = (
+    "qc",
+    "typing_result",
+    "element_type_result",
+    "species_prediction",
+    "softwares",
+)
+VARIANT_SECTIONS = ("snv_variants", "sv_variants", "indel_variants")
+
+OUTPUT_SCHEMA_VERSION = 1
+
+StepResult = dict[str, Any]
+
+
+def _parse_quast(quast: str) -> StepResult:
+    LOG.info("Parse quast results")
+    res: QcMethodIndex = parse_quast_results(quast)
+    return {"qc": [res]}
+
+
+def _parse_quality(quality: str) -> StepResult:
+    LOG.info("Parse quality results")
+    res: QcMethodIndex = parse_postalignqc_results(quality)
+    return {"qc": [res]}
+
+
+def _parse_mlst(mlst: str) -> StepResult:
+    LOG.info("Parse mlst results")
+    res: MethodIndex = parse_mlst_results(mlst)
+    return {"typing_result": [res]}
+
+
+def _parse_cgmlst(cgmlst: str, correct_alleles: bool = False) -> StepResult:
+    LOG.info("Parse cgmlst results")
+    res: MethodIndex = parse_cgmlst_results(cgmlst, correct_alleles=correct_alleles)
+    return {"typing_result": [res]}
+
+
+def _parse_resfinder(resfinder: str) -> StepResult:
+    LOG.info("Parse resistance results")
+    results = {"element_type_result": []}
+    with open(resfinder, "r", encoding="utf-8") as resfinder_json:
+        pred_res = json.load(resfinder_json)
+        methods = [
+            ElementType.AMR,
+            ElementType.STRESS,
+        ]
+        for method in methods:
+            res: MethodIndex = parse_resfinder_amr_pred(pred_res, method)
+            # exclude empty results from output
+            if len(res.result.genes) > 0 and len(res.result.variants) > 0:
+                results["element_type_result"].append(res)
+    return results
+
+
+def _parse_amrfinder(amrfinder: str) -> StepResult:
+    LOG.info("Parse amr results")
+    results = {"element_type_result": []}
+    methods = [
+        ElementType.AMR,
+        ElementType.STRESS,
+    ]
+    for method in methods:
+        res: MethodIndex = parse_amrfinder_amr_pred(amrfinder, method)
+        results["element_type_result"].append(res)
+    vir: MethodIndex = parse_amrfinder_vir_pred(amrfinder)
+    results["element_type_result"].append(vir)
+    return results
+
+
+def _parse_virulencefinder(virulencefinder: str) -> StepResult:
+    LOG.info("Parse virulencefinder results")
+    results = {"element_type_result": [], "typing_result": []}
+    # virulence genes
+    vir: MethodIndex | None = parse_virulencefinder_vir_pred(virulencefinder)
+    if vir is not None:
+        results["element_type_result"].append(vir)
+
+    # stx typing
+    res: MethodIndex | None = parse_virulencefinder_stx_typing(virulencefinder)
+    if res is not None:
+        results["typing_result"].append(res)
+    return results
+
+
+def _parse_serotypefinder(serotypefinder: str) -> StepResult:
+    LOG.info("Parse serotypefinder results")
+    # OH typing
+    res: list[MethodIndex] | None = parse_serotypefinder_oh_typing(serotypefinder)
+    return {"typing_result": res if res is not None else []}
+
+
+def _parse_emmtyper(emmtyper: str) -> StepResult:
+    LOG.info("Parse emmtyper results")
+    # Emmtyping
+    res: list[MethodIndex] | None = parse_emmtyper_pred(emmtyper)
+    return {"typing_result": res if res is not None else []}
+
+
+def _parse_shigapass(shigapass: str) -> StepResult:
+    LOG.info("Parse shigapass results")
+    # Shigatyping
+    res: MethodIndex | None = parse_shigapass_pred(shigapass)
+    return {"typing_result": [res] if res is not None else []}
+
+
+def _parse_kraken(kraken: str) -> StepResult:
+    LOG.info("Parse kraken results")
+    return {"species_prediction": [parse_kraken_result(kraken)]}
+
+
+def _parse_mykrobe(mykrobe: str, sample_id: str) -> StepResult:
+    LOG.info("Parse mykrobe results")
+    results = {
+        "softwares": [],
+        "element_type_result": [],
+        "typing_result": [],
+        "species_prediction": [],
+    }
+    pred_res = pd.read_csv(mykrobe, quotechar='"')
+    pred_res.columns.values[3] = "variants"
+    pred_res.columns.values[4] = "genes"
+    pred_res.replace(["NA", np.nan], None, inplace=True)
+    pred_res = pred_res.to_dict(orient="records")
+
+    # verify that sample id is in prediction result
+    if not sample_id in pred_res[0]["sample"]:
+        LOG.warning(
+            "Sample id %s is not in Mykrobe result, possible sample mixup",
+            sample_id,
+        )
+        raise click.Abort()
+
+    # add mykrobe db version to the list of softwares
+    results["softwares"].append(
+        SoupVersion(
+            name="mykrobe-predictor",
+            version=pred_res[0]["mykrobe_version"],
+            type=SoupType.DB,
+        )
+    )
+    # parse mykrobe result
+    amr_res = parse_mykrobe_amr_pred(pred_res)
+    if amr_res is not None:
+        results["element_type_result"].append(amr_res)
+
+    lin_res: MethodIndex | None = parse_mykrobe_lineage_results(pred_res)
+    if lin_res is not None:
+        results["typing_result"].append(lin_res)
+
+    # parse mykrobe species prediction result
+    results["species_prediction"].append(get_mykrobe_spp_prediction(pred_res))
+    return results
+
+
+def _parse_tbprofiler(tbprofiler: str) -> StepResult:
+    LOG.info("Parse tbprofiler results")
+    with open(tbprofiler, "r", encoding="utf-8") as tbprofiler_json:
+        pred_res = json.load(tbprofiler_json)
+    # check schema version
+    schema_version = pred_res.get("schema_version")
+    if not EXPECTED_TBPROFILER_SCHEMA_VERSION == schema_version:
+        LOG.warning(
+            "Unsupported TbProfiler schema version - output might be inaccurate; result schema: %s; expected: %s",
+            schema_version,
+            EXPECTED_TBPROFILER_SCHEMA_VERSION,
+        )
+    # store pipeline version
+    db_info: list[SoupVersion] = [
+        SoupVersion(
+            name=pred_res["pipeline"]["db_version"]["name"],
+            version=get_db_version(pred_res["pipeline"]["db_version"]),
+            type=SoupType.DB,
+        )
+    ]
+    lin_res: MethodIndex = parse_tbprofiler_lineage_results(pred_res)
+    amr_res: MethodIndex = parse_tbprofiler_amr_pred(pred_res)
+    return {
+        "softwares": db_info,
+        "typing_result": [lin_res],
+        "element_type_result": [amr_res],
+    }
+
+
+def _parse_snv_vcf(snv_vcf: str, variant_regions: str | None = None) -> StepResult:
+    return {"snv_variants": load_variants(snv_vcf, variant_regions)["snv_variants"]}
+
+
+def _parse_sv_vcf(sv_vcf: str, variant_regions: str | None = None) -> StepResult:
+    return {"sv_variants": load_variants(sv_vcf, variant_regions)["sv_variants"]}
+
+
+def _parse_vcf(vcf: str, variant_regions: str | None = None) -> StepResult:
+    return load_variants(vcf, variant_regions)
+
+
+# Parse steps in the order their results are added to the sample result.
+# The first argument of a step is the input file, the step is skipped if
+# the file was not given.
+PARSE_STEPS: tuple[tuple[str, Callable[..., StepResult], tuple[str, ...]], ...] = (
+    ("quast", _parse_quast, ("quast",)),
+    ("quality", _parse_quality, ("quality",)),
+    ("mlst", _parse_mlst, ("mlst",)),
+    ("cgmlst", _parse_cgmlst, ("cgmlst", "correct_alleles")),
+    ("resfinder", _parse_resfinder, ("resfinder",)),
+    ("amrfinder", _parse_amrfinder, ("amrfinder",)),
+    ("virulencefinder", _parse_virulencefinder, ("virulencefinder",)),
+    ("serotypefinder", _parse_serotypefinder, ("serotypefinder",)),
+    ("emmtyper", _parse_emmtyper, ("emmtyper",)),
+    ("shigapass", _parse_shigapass, ("shigapass",)),
+    ("kraken", _parse_kraken, ("kraken",)),
+    ("mykrobe", _parse_mykrobe, ("mykrobe", "sample_id")),
+    ("tbprofiler", _parse_tbprofiler, ("tbprofiler",)),
+    ("snv_vcf", _parse_snv_vcf, ("snv_vcf", "variant_regions")),
+    ("sv_vcf", _parse_sv_vcf, ("sv_vcf", "variant_regions")),
+    ("vcf", _parse_vcf, ("vcf", "variant_regions")),
+)
+
+
+# Software names of the results added by the steps. Steps that are not listed
+# also add database versions to the pipeline info and are always rerun.
+STEP_SOFTWARES: dict[str, set[str]] = {
+    "quast": {"quast"},
+    "quality": {"postalignqc"},
+    "mlst": {"mlst"},
+    "cgmlst": {"chewbbaca"},
+    "resfinder": {"resfinder"},
+    "amrfinder": {"amrfinder"},
+    "virulencefinder": {"virulencefinder"},
+    "serotypefinder": {"serotypefinder"},
+    "emmtyper": {"emmtyper"},
+    "shigapass": {"shigapass"},
+    "kraken": {"bracken"},
+}
+
+
+def get_previous_step_result(name: str, previous: dict[str, Any]) -> StepResult | None:
+    """Extract the output of a parse step from a previous sample result.
+
+    :param name: Parse step name
+    :type name: str
+    :param previous: Previously generated sample result
+    :type previous: dict[str, Any]
+    :return: The step output or None if the step can not be reused.
+    :rtype: StepResult | None
+    """
+    match name:
+        case "snv_vcf":
+            return {"snv_variants": previous.get("snv_variants")}
+        case "sv_vcf":
+            return {"sv_variants": previous.get("sv_variants")}
+        case "vcf":
+            return {section: previous.get(section) for section in VARIANT_SECTIONS}
+    if name not in STEP_SOFTWARES:
+        return None
+    return {
+        section: [
+            entry
+            for entry in previous.get(section) or []
+            if entry.get("software") in STEP_SOFTWARES[name]
+        ]
+        for section in LIST_SECTIONS
+        if section != "softwares"
+    }
+
+
+def get_parse_tasks(**kwargs) -> list[tuple[str, Callable, dict[str, Any]]]:
+    """Get the parse steps that should be run for the given input files.
+
+    :return: Step name, function and keyword arguments for each step.
+    :rtype: list[tuple[str, Callable, dict[str, Any]]]
+    """
+    tasks = []
+    for name, func, params in PARSE_STEPS:
+        if kwargs.get(params[0]):
+            tasks.append((name, func, {param: kwargs.get(param) for param in params}))
+    return tasks
+
+
+def _run_task(
+    task: tuple[str, Callable, dict[str, Any]],
+    profile: bool = False,
+    cache: "ParseCache | None" = None,
+) -> tuple[StepResult, list[dict[str, Any]]]:
+    """Run a single parse step.
+
+    The profile of the step is returned as the step might be run in a worker
+    process.
+    """
+    name, func, kwargs = task
+    if cache is None:
+        run_step = partial(func, **kwargs)
+    else:
+        run_step = partial(cache, func, kwargs)
+    if not profile:
+        return run_step(), []
+    profiler = Profiler()
+    with profiler.stage(f"parse:{name}"):
+        step_result = run_step()
+    return step_result, profiler.stages
+
+
+def run_parse_tasks(
+    tasks: list[tuple[str, Callable, dict[str, Any]]],
+    workers: int = 1,
+    reused: dict[str, StepResult] | None = None,
+    cache: "ParseCache | None" = None,
+) -> list[StepResult]:
+    """Run parse steps, optionally on a pool of worker processes.
+
+    :param tasks: Parse steps from get_parse_tasks
+    :type tasks: list[tuple[str, Callable, dict[str, Any]]]
+    :param workers: Number of worker processes, defaults to 1
+    :type workers: int, optional
+    :param reused: Output of steps that should not be rerun, defaults to None
+    :type reused: dict[str, StepResult] | None, optional
+    :param cache: Cache of parse step outputs, defaults to None
+    :type cache: ParseCache | None, optional
+    :return: The result of each step in the same order as the tasks.
+    :rtype: list[StepResult]
+    """
+    reused = {} if reused is None else reused
+    pending = [task for task in tasks if task[0] not in reused]
+    if reused:
+        LOG.info("Reusing results of: %s", ", ".join(reused))
+    profiler = get_profiler()
+    run_task = partial(_run_task, profile=profiler is not None, cache=cache)
+    if workers > 1 and len(pending) > 1:
+        LOG.info("Parse %d results using %d workers", len(pending), workers)
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+            outputs = list(executor.map(run_task, pending))
+    else:
+        outputs = [run_task(task) for task in pending]
+    step_results = {}
+    for (name, *_), (step_result, stages) in zip(pending, outputs):
+        step_results[name] = step_result
+        if profiler is not None:
+            profiler.stages.extend(stages)
+    return [
+        reused[name] if name in reused else step_results[name] for name, *_ in tasks
+    ]
+
+
+def merge_step_results(results: dict[str, Any], step_results: list[StepResult]) -> None:
+    """Add the output of parse steps to the sample result in step order.
+
+    :param results: Sample result with a pipeline entry and empty list sections.
+    :type results: dict[str, Any]
+    :param step_results: Output of the parse steps.
+    :type step_results: list[StepResult]
+    """
+    for step_result in step_results:
+        for section, value in step_result.items():
+            if section == "softwares":
+                results["pipeline"].softwares.extend(value)
+            elif section in LIST_SECTIONS:
+                results[section].extend(value)
+            else:
+                results[section] = value
+
+
+def create_pipeline_result(  # pylint: disable=too-many-arguments,too-many-locals
+    sample_id: str,
+    run_metadata: str,
+    process_metadata: list[str] = (),
+    quast: str | None = None,
+    quality: str | None = None,
+    mlst: str | None = None,
+    cgmlst: str | None = None,
+    correct_alleles: bool = False,
+    resfinder: str | None = None,
+    amrfinder: str | None = None,
+    virulencefinder: str | None = None,
+    serotypefinder: str | None = None,
+    emmtyper: str | None = None,
+    shigapass: str | None = None,
+    kraken: str | None = None,
+    mykrobe: str | None = None,
+    tbprofiler: str | None = None,
+    snv_vcf: str | None = None,
+    sv_vcf: str | None = None,
+    vcf: str | None = None,
+    variant_regions: str | None = None,
+    bam: str | None = None,
+    reference_genome_fasta: str | None = None,
+    reference_genome_gff: str | None = None,
+    genome_annotation: list[str] = (),
+    symlink_dir: str | None = None,
+    workers: int = 1,
+    reused: dict[str, StepResult] | None = None,
+    cache: "ParseCache | None" = None,
+) -> PipelineResult:
+    """Combine the analysis results of a sample into a pipeline result.
+
+    :raises ValidationError: if the combined result is not valid.
+    :return: The validated sample result.
+    :rtype: PipelineResult
+    """
+    # Get basic sample object
+    with profile_stage("parse:run_metadata"):
+        sample_info, seq_info, pipeline_info = parse_run_info(
+            run_metadata, process_metadata
+        )
+    results = {
+        "sequencing": seq_info,
+        "pipeline": pipeline_info,
+        "qc": [],
+        "typing_result": [],
+        "element_type_result": [],
+        "species_prediction": [],
+        **sample_info,  # add sample_name & lims_id
+    }
+    # parse analysis results
+    tasks = get_parse_tasks(
+        sample_id=sample_id,
+        quast=quast,
+        quality=quality,
+        mlst=mlst,
+        cgmlst=cgmlst,
+        correct_alleles=correct_alleles,
+        resfinder=resfinder,
+        amrfinder=amrfinder,
+        virulencefinder=virulencefinder,
+        serotypefinder=serotypefinder,
+        emmtyper=emmtyper,
+        shigapass=shigapass,
+        kraken=kraken,
+        mykrobe=mykrobe,
+        tbprofiler=tbprofiler,
+        snv_vcf=snv_vcf,
+        sv_vcf=sv_vcf,
+        vcf=vcf,
+        variant_regions=variant_regions,
+    )
+    step_results = run_parse_tasks(tasks, workers=workers, reused=reused, cache=cache)
+    merge_step_results(results, step_results)
+
+    # entries for reference genome and read mapping
+    if all([bam, reference_genome_fasta, reference_genome_gff]):
+        # verify that everything pertains to the same reference genome
+        with profile_stage("parse:reference_genome"):
+            ref_accession, ref_name = get_gb_genome_version(reference_genome_fasta)
+        # store file names
+        fasta_idx_path = Path(f"{reference_genome_fasta}.fai")
+        results["reference_genome"] = ReferenceGenome(
+            name=ref_name,
+            accession=ref_accession,
+            fasta=Path(reference_genome_fasta).name,
+            fasta_index=fasta_idx_path.name if fasta_idx_path.is_file() else None,
+            genes=Path(reference_genome_gff).name,
+        )
+        # cram files can only be decoded with the reference they were written with
+        with profile_stage("parse:read_mapping"):
+            if not check_reference(bam, reference_genome_fasta):
+                raise click.BadParameter(
+                    f"{bam} was written with another reference than "
+                    f"{reference_genome_fasta}",
+                    param_hint="--bam",
+                )
+        results["read_mapping"] = _get_path(symlink_dir, "bam", bam)
+        # add annotations
+        annotations = [
+            {"name": f"annotation_{i}", "file": Path(annot).name}
+            for i, annot in enumerate(genome_annotation, start=1)
+        ]
+        vcf_dict = {"SV": sv_vcf, "SNV": snv_vcf, "VCF": vcf}
+        for name in vcf_dict:
+            vcf_filepath = vcf_dict[name]
+            if vcf_filepath:
+                vcf_filepath = _get_path(symlink_dir, "vcf", vcf_filepath)
+                annotations.append({"name": name, "file": vcf_filepath})
+        # store annotation results
+        results["genome_annotation"] = annotations if annotations else None
+
+    with profile_stage("validate"):
+        return PipelineResult(
+            sample_id=sample_id, schema_version=OUTPUT_SCHEMA_VERSION, **results
+        )
+
+
+def read_samplesheet(samplesheet: str) -> list[dict[str, Any]]:
+    """Read sample inputs from a tab separated samplesheet.
+
+    The columns are named as the create_bonsai_input options, dashes and
+    underscores are interchangeable. Options that accept multiple files are
+    comma separated and empty cells are ignored. An optional output column
+    sets the result file of the sample.
+
+    :param samplesheet: Samplesheet path
+    :type samplesheet: str
+    :raises ValueError: if the samplesheet has unknown or missing columns.
+    :return: Keyword arguments to create_pipeline_result for each sample.
+    :rtype: list[dict[str, Any]]
+    """
+    params = inspect.signature(create_pipeline_result).parameters
+    valid_columns = {"output", *params} - {"workers", "reused", "cache"}
+    required_columns = {"sample_id", "run_metadata"}
+    multi_value_columns = {
+        name for name, param in params.items() if isinstance(param.default, tuple)
+    }
+    flag_columns = {
+        name for name, param in params.items() if isinstance(param.default, bool)
+    }
+
+    with open(samplesheet, "r", encoding="utf-8", newline="") as tsvfile:
+        creader = csv.DictReader(tsvfile, delimiter="\t")
+        columns = {
+            col: col.strip().replace("-", "_") for col in creader.fieldnames or []
+        }
+        if unknown := set(columns.values()) - valid_columns:
+            raise ValueError(
+                f"Unknown samplesheet columns: {', '.join(sorted(unknown))}"
+            )
+        if missing := required_columns - set(columns.values()):
+            raise ValueError(
+                f"Missing samplesheet columns: {', '.join(sorted(missing))}"
+            )
+        samples = []
+        for row in creader:
+            sample = {}
+            for col, value in row.items():
+                name = columns[col]
+                value = (value or "").strip()
+                if name in multi_value_columns:
+                    sample[name] = [
+                        val.strip() for val in value.split(",") if val.strip()
+                    ]
+                elif name in flag_columns:
+                    sample[name] = value.lower() in ("1", "true", "yes")
+                elif value:
+                    sample[name] = value
+            samples.append(sample)
+    return samples
@@ -0,0 +1,185 @@
+"""Run the steps of a QC run concurrently.
+
+A step is either an external command or a python function. Steps only wait
+for the steps they require, independent steps are run at the same time with
+asyncio. Each step reserves a number of cpus from a shared budget before it
+is started, so the number of cpus in use never exceeds the budget.
+"""
+
+import asyncio
+import logging
+import subprocess
+from typing import Any, Callable, Iterable
+
+from ..profiling import profile_stage
+
+LOG = logging.getLogger(__name__)
+
+
+class ToolStep:  # pylint: disable=too-few-public-methods
+    """A command or function that is run once its required steps are done."""
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        name: str,
+        cmd: list[str] | None = None,
+        func: Callable[[], Any] | None = None,
+        requires: Iterable[str] = (),
+        cpus: int = 1,
+    ):
+        """Define a step.
+
+        :param name: Unique name of the step
+        :type name: str
+        :param cmd: Command of an external tool, defaults to None
+        :type cmd: list[str] | None, optional
+        :param func: Function run in a thread if there is no command
+        :type func: Callable[[], Any] | None, optional
+        :param requires: Names of the steps that must be done first
+        :type requires: Iterable[str], optional
+        :param cpus: Number of cpus used by the step, defaults to 1
+        :type cpus: int, optional
+        """
+        if (cmd is None) == (func is None):
+            raise ValueError(f"Step {name} must have either a command or a function")
+        self.name = name
+        self.cmd = cmd
+        self.func = func
+        self.requires = list(requires)
+        self.cpus = cpus
+
+
+class _CpuBudget:
+    """Number of cpus that are shared by the running steps."""
+
+    def __init__(self, cpus: int):
+        self.cpus = max(cpus, 1)
+        self.available = self.cpus
+        self.condition = asyncio.Condition()
+
+    async def acquire(self, cpus: int) -> int:
+        """Wait until the cpus are available and reserve them."""
+        cpus = min(max(cpus, 1), self.cpus)
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.available >= cpus)
+            self.available -= cpus
+        return cpus
+
+    async def release(self, cpus: int) -> None:
+        """Return reserved cpus to the budget."""
+        async with self.condition:
+            self.available += cpus
+            self.condition.notify_all()
+
+
+def get_reserved_cpus(steps: list[ToolStep]) -> int:
+    """Get the number of cpus used by the steps when they run at the same time.
+
+    Steps that are required by other steps are done before those start and
+    hand over their cpus, so only the steps that no step requires are counted.
+
+    :param steps: Steps to run
+    :type steps: list[ToolStep]
+    :return: Number of cpus to reserve for the steps.
+    :rtype: int
+    """
+    required = {name for step in steps for name in step.requires}
+    return sum(max(step.cpus, 1) for step in steps if step.name not in required)
+
+
+def _sort_steps(steps: list[ToolStep]) -> list[ToolStep]:
+    """Sort the steps so that every step comes after the steps it requires."""
+    by_name = {step.name: step for step in steps}
+    if len(by_name) != len(steps):
+        raise ValueError("Step names must be unique")
+    ordered: dict[str, ToolStep] = {}
+    visiting: set[str] = set()
+
+    def visit(step: ToolStep) -> None:
+        if step.name in ordered:
+            return
+        if step.name in visiting:
+            raise ValueError(f"Steps have circular requirements: {step.name}")
+        visiting.add(step.name)
+        for required in step.requires:
+            if required not in by_name:
+                raise ValueError(f"Step {step.name} requires unknown step {required}")
+            visit(by_name[required])
+        ordered[step.name] = step
+
+    for step in steps:
+        visit(step)
+    return list(ordered.values())
+
+
+async def _run_cmd(step: ToolStep) -> subprocess.CompletedProcess:
+    """Run the command of a step and capture its output."""
+    LOG.info("RUNNING: %s", " ".join(step.cmd))
+    process = await asyncio.create_subprocess_exec(
+        *step.cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+    result = subprocess.CompletedProcess(
+        step.cmd, process.returncode, stdout.decode(), stderr.decode()
+    )
+    if result.stdout:
+        LOG.debug("%s stdout: %s", step.name, result.stdout)
+    if result.stderr:
+        LOG.debug("%s stderr: %s", step.name, result.stderr)
+    result.check_returncode()
+    return result
+
+
+async def _run_step(
+    step: ToolStep, required: list[asyncio.Task], budget: _CpuBudget
+) -> Any:
+    """Run a step when its requirements are done and cpus are available."""
+    await asyncio.gather(*required)
+    cpus = await budget.acquire(step.cpus)
+    try:
+        if step.cmd is not None:
+            with profile_stage(f"subprocess:{step.name}"):
+                return await _run_cmd(step)
+        with profile_stage(step.name):
+            return await asyncio.to_thread(step.func)
+    finally:
+        await budget.release(cpus)
+
+
+async def _run_steps(steps: list[ToolStep], cpus: int) -> dict[str, Any]:
+    budget = _CpuBudget(cpus)
+    tasks: dict[str, asyncio.Task] = {}
+    for step in _sort_steps(steps):
+        required = [tasks[name] for name in step.requires]
+        tasks[step.name] = asyncio.create_task(_run_step(step, required, budget))
+    done, pending = await asyncio.wait(
+        tasks.values(), return_when=asyncio.FIRST_EXCEPTION
+    )
+    # stop the remaining steps if a step failed
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    # raise the error of the first failed step in order of requirements
+    for task in tasks.values():
+        if task in done and task.exception() is not None:
+            raise task.exception()
+    return {name: task.result() for name, task in tasks.items()}
+
+
+def run_tool_steps(steps: list[ToolStep], cpus: int = 1) -> dict[str, Any]:
+    """Run steps concurrently in the order given by their requirements.
+
+    :param steps: Steps to run
+    :type steps: list[ToolStep]
+    :param cpus: Number of cpus shared by the steps, defaults to 1
+    :type cpus: int, optional
+    :raises subprocess.CalledProcessError: If a command fails
+    :return: Completed process of commands or return value of functions by step.
+    :rtype: dict[str, Any]
+    """
+    return asyncio.run(_run_steps(steps, cpus))
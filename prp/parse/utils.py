@@ -1,4 +1,5 @@
 """Shared utility functions."""
+import hashlib
 import os
 from datetime import datetime
 
@@ -111,6 +112,25 @@ def _get_path(symlink_dir: str, subdir: str, filepath: str) -> str:
     )
 
 
+def get_checksum(filepath: str, chunk_size: int = 1024 * 1024) -> str | None:
+    """Get the sha256 checksum of a file.
+
+    :param filepath: File path
+    :type filepath: str
+    :param chunk_size: Number of bytes read at a time
+    :type chunk_size: int
+    :return: Hex digest of the file content or None if the file does not exist.
+    :rtype: str | None
+    """
+    if not os.path.isfile(filepath):
+        return None
+    checksum = hashlib.sha256()
+    with open(filepath, "rb") as fin:
+        for chunk in iter(lambda: fin.read(chunk_size), b""):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
 def parse_input_dir(
     input_dir: str, jasen_dir: str, symlink_dir: str, output_dir: str
 ) -> list[dict[str, str]]:
@@ -136,8 +156,8 @@ def parse_input_dir(
     if os.path.exists(input_dir):
         analysis_results_dir = os.path.join(input_dir, "analysis_result")
         for filename in os.listdir(analysis_results_dir):
-            if filename.endswith(".json"):
-                sample_id = filename.rstrip("_result.json")
+            if filename.endswith("_result.json"):
+                sample_id = filename.removesuffix("_result.json")
                 sample_array = create_sample_array(
                     species, input_dir, jasen_dir, sample_id, symlink_dir, output_dir
                 )
@@ -1,36 +1,37 @@
 """Parse variant from VCF files."""
 
 import logging
+import os
 import re
+from itertools import chain
+from typing import Iterable, Iterator
 
 from cyvcf2 import VCF, Variant
 
-from prp.models.phenotype import VariantBase, VariantType
 from prp.models.phenotype import TbProfilerVariant, VariantBase, VariantType
+from prp.models.variant_store import VariantStore
+
+from .intervals import IntervalIndex, load_interval_index
 
 LOG = logging.getLogger(__name__)
 SOURCE_PATTERN = r"##source=(.+)\n"
+VCF_INDEX_EXTENSIONS = (".tbi", ".csi")
+# result keys of the variant types that are kept
+VARIANT_BUCKETS = {
+    VariantType.SV: "sv_variants",
+    VariantType.INDEL: "indel_variants",
+    VariantType.SNV: "snv_variants",
+}
 
 
-def _filter_variants(variant_list):
-    # Initialize the results dictionary
-    filetered_variants = {
-        'sv_variants': [],
-        'indel_variants': [],
-        'snv_variants': []
-    }
-
-    # Iterate through each variant in the list
-    for variant in variant_list:
-        variant_type = dict(variant).get('variant_type')  # Extract the variant_type
-        # Append the variant to the appropriate key in the results dictionary
-        if variant_type == "SV":
-            filetered_variants['sv_variants'].append(variant)
-        elif variant_type == "INDEL":
-            filetered_variants['indel_variants'].append(variant)
-        elif variant_type == "SNV":
-            filetered_variants['snv_variants'].append(variant)
-    return filetered_variants
+def _filter_variants(variants: Iterable[dict]) -> dict[str, VariantStore]:
+    """Store variants by type as they are parsed, other types are dropped."""
+    filtered_variants = {bucket: VariantStore() for bucket in VARIANT_BUCKETS.values()}
+    for variant in variants:
+        bucket = VARIANT_BUCKETS.get(variant["variant_type"])
+        if bucket is not None:
+            filtered_variants[bucket].append(**variant)
+    return filtered_variants
 
 
 def _get_variant_type(variant) -> VariantType:
@@ -60,10 +61,12 @@ def _get_variant_subtype(ref_base, alt_base):
     return "TV"
 
 
-def parse_variant(variant: Variant, var_id: int, caller: str | None = None):
-    """Parse variant info from VCF row."""
+def _get_variant_values(
+    variant: Variant, var_id: int, caller: str | None = None
+) -> list[dict]:
+    """Get the values of the variants of a VCF row, one per alt allele."""
 
-    var_objs = []
+    var_values = []
     # check if variant passed qc filtering
     if len(variant.FILTERS) == 0:
         passed_qc = None
@@ -73,6 +76,9 @@ def parse_variant(variant: Variant, var_id: int, caller: str | None = None):
         passed_qc = False
 
     var_type: VariantType = _get_variant_type(variant)
+    frequency = variant.INFO.get("AF")
+    depth = variant.INFO.get("DP")
+    method = variant.INFO.get("SVMETHOD", caller)
 
     for alt_idx, alt_var in enumerate(variant.ALT):
         possible_minority_var = False
@@ -80,23 +86,30 @@ def parse_variant(variant: Variant, var_id: int, caller: str | None = None):
         if var_subtype == "UNKNOWN":
             var_subtype = _get_variant_subtype(variant.REF, alt_var)
             possible_minority_var = True
-        var_obj = VariantBase(
+        var_values.append(dict(
             id=var_id,
             variant_type=var_type,
             variant_subtype=var_subtype,
-            gene_symbol=variant.CHROM,
+            reference_sequence=variant.CHROM,
             start=variant.start,
             end=variant.end,
             ref_nt=variant.REF,
             alt_nt=alt_var,
-            frequency=variant.INFO.get("AF") if type(variant.INFO.get("AF")) != tuple else variant.INFO.get("AF")[alt_idx],
-            depth=variant.INFO.get("DP") if type(variant.INFO.get("DP")) != tuple else variant.INFO.get("DP")[alt_idx],
-            method=variant.INFO.get("SVMETHOD", caller),
+            frequency=frequency[alt_idx] if isinstance(frequency, tuple) else frequency,
+            depth=depth[alt_idx] if isinstance(depth, tuple) else depth,
+            method=method,
             confidence=variant.QUAL,
             passed_qc=passed_qc,
-        )
-        var_objs.append(var_obj)
-    return var_objs
+        ))
+    return var_values
+
+
+def parse_variant(variant: Variant, var_id: int, caller: str | None = None):
+    """Parse variant info from VCF row."""
+    return [
+        VariantBase(**values)
+        for values in _get_variant_values(variant, var_id=var_id, caller=caller)
+    ]
 
 
 def _get_variant_caller(vcf_obj: VCF) -> str | None:
@@ -107,24 +120,88 @@ def _get_variant_caller(vcf_obj: VCF) -> str | None:
     return None
 
 
-def load_variants(variant_file: str) -> list[VariantBase]:
-    """Load variants."""
+def _iter_variants(records: Iterable[Variant], caller: str | None) -> Iterator[dict]:
+    """Parse the variants of VCF rows one row at a time."""
+    for var_id, record in enumerate(records, start=1):
+        yield from _get_variant_values(record, var_id=var_id, caller=caller)
+
+
+def _has_index(variant_file: str) -> bool:
+    """Check if a variant file has a tabix or CSI index."""
+    return any(os.path.isfile(f"{variant_file}{ext}") for ext in VCF_INDEX_EXTENSIONS)
+
+
+def _fetch_regions(vcf_obj: VCF, regions: IntervalIndex) -> Iterator[Variant]:
+    """Fetch the records overlapping regions using the index of a variant file.
+
+    Records that overlap several regions are only returned once.
+    """
+    contigs = set(vcf_obj.seqnames)
+    prev_contig, prev_end = None, 0
+    for contig, start, end in regions.regions():
+        if contig not in contigs:
+            continue
+        for record in vcf_obj(f"{contig}:{start + 1}-{end}"):
+            # records starting before the previous region were fetched with it
+            if contig == prev_contig and record.start < prev_end:
+                continue
+            yield record
+        prev_contig, prev_end = contig, end
+
+
+def _iter_records(
+    vcf_obj: VCF, variant_file: str, regions: str | None
+) -> Iterator[Variant]:
+    """Iterate over the records of a variant file, optionally only in regions."""
+    if regions is None:
+        return iter(vcf_obj)
+    region_index = load_interval_index(regions)
+    if _has_index(variant_file):
+        return _fetch_regions(vcf_obj, region_index)
+    LOG.warning(
+        "Variant file %s is not indexed, reading all variants to select regions",
+        variant_file,
+    )
+    return (
+        record
+        for record in vcf_obj
+        if region_index.overlaps(record.CHROM, record.start, record.end)
+    )
+
+
+def load_variants(
+    variant_file: str, regions: str | None = None
+) -> dict[str, VariantStore] | None:
+    """Load variants by type in a single pass over the variant file.
+
+    The variants are stored by column and only converted to VariantBase
+    models when they are read or serialized. If regions are given only the
+    variants overlapping them are read, using the tabix or CSI index of the
+    variant file if there is one.
+
+    :param variant_file: Path to a VCF or BCF file
+    :type variant_file: str
+    :param regions: Bed file with the regions to load, defaults to None
+    :type regions: str | None, optional
+    :return: SV, INDEL and SNV variants, None if the file has no variants.
+    :rtype: dict[str, VariantStore] | None
+    """
     vcf_obj = VCF(variant_file)
     try:
-        next(vcf_obj)
-    except StopIteration:
-        LOG.warning("Variant file %s does not include any variants", variant_file)
-        return None
-    # re-read the variant file
-    vcf_obj = VCF(variant_file)
-
-    variant_caller = _get_variant_caller(vcf_obj)
-
-    # parse header from vcf file
-    variants = []
-    for var_id, variant in enumerate(vcf_obj, start=1):
-        variants.extend(parse_variant(variant, var_id=var_id, caller=variant_caller))
-    return _filter_variants(variants)
+        records = _iter_records(vcf_obj, variant_file, regions)
+        # peek at the first record to check that the file has variants
+        first_record = next(records, None)
+        if first_record is None and regions is not None:
+            LOG.info("Variant file %s has no variants in %s", variant_file, regions)
+            return _filter_variants([])
+        if first_record is None:
+            LOG.warning("Variant file %s does not include any variants", variant_file)
+            return None
+        variant_caller = _get_variant_caller(vcf_obj)
+        variants = _iter_variants(chain([first_record], records), variant_caller)
+        return _filter_variants(variants)
+    finally:
+        vcf_obj.close()
 
 
 def annotate_delly_variants(writer, vcf, annotation, annot_chrom=False):
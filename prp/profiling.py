@@ -0,0 +1,190 @@
+"""Record the time and memory used by the stages of a command.
+
+Stages are recorded with the profile_stage context manager, which does
+nothing unless a profiler has been started with the profiling context
+manager. The peak memory of a stage is measured by resetting the peak
+resident set size of the process at the start of the stage, which is only
+possible on Linux. On other platforms the peak since the process started is
+reported. Stages run in worker processes report the memory of the worker.
+
+Stages can also run at the same time in threads or asyncio tasks of the same
+process. The cpu time and memory of a process can not be split between
+them, so overlapping stages are marked as concurrent and report the usage of
+the whole process while they ran.
+"""
+
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import count
+from typing import Any, Iterator
+
+LOG = logging.getLogger(__name__)
+
+_PROFILER: "Profiler | None" = None
+# stages that the running code is nested in, copied to threads and tasks
+_STAGE_STACK: ContextVar[tuple[int, ...]] = ContextVar("stage_stack", default=())
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the peak resident set size of the process."""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="utf-8") as outp:
+            outp.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def _get_peak_rss() -> float:
+    """Get the peak resident set size of the process in MB."""
+    try:
+        with open("/proc/self/status", encoding="utf-8") as inpt:
+            for line in inpt:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kB on Linux
+    return max_rss / 1024**2 if sys.platform == "darwin" else max_rss / 1024
+
+
+def _get_cpu_times() -> tuple[float, float]:
+    """Get the cpu time used by the process and its waited for children."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime
+
+
+class Profiler:
+    """Collect the time and memory used by stages."""
+
+    def __init__(self):
+        self.stages: list[dict[str, Any]] = []
+        self.peak_rss_mb = _get_peak_rss()
+        # peak memory and concurrency of the running stages by stage id
+        self._active: dict[int, dict[str, Any]] = {}
+        self._stage_ids = count()
+        self._lock = threading.Lock()
+
+    def _start_stage(self) -> int:
+        """Register a running stage and reset the peak memory of the process."""
+        ancestors = _STAGE_STACK.get()
+        with self._lock:
+            stage_id = next(self._stage_ids)
+            overlapping = [
+                active
+                for other_id, active in self._active.items()
+                if other_id not in ancestors
+            ]
+            for active in overlapping:
+                active["concurrent"] = True
+            # keep the peak of the running stages and the whole run before
+            # resetting it
+            peak_rss_mb = _get_peak_rss()
+            self.peak_rss_mb = max(self.peak_rss_mb, peak_rss_mb)
+            for active in self._active.values():
+                active["peak_rss_mb"] = max(active["peak_rss_mb"], peak_rss_mb)
+            _reset_peak_rss()
+            self._active[stage_id] = {
+                "peak_rss_mb": 0.0,
+                "concurrent": len(overlapping) > 0,
+            }
+        return stage_id
+
+    def _end_stage(self, stage_id: int) -> dict[str, Any]:
+        """Get the peak memory and concurrency of a stage that is done."""
+        with self._lock:
+            usage = self._active.pop(stage_id)
+            peak_rss_mb = _get_peak_rss()
+            self.peak_rss_mb = max(self.peak_rss_mb, peak_rss_mb)
+            usage["peak_rss_mb"] = max(usage["peak_rss_mb"], peak_rss_mb)
+        return usage
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Record the wall time, cpu time and peak memory of a stage.
+
+        Cpu time of subprocesses started and waited for in the stage is
+        reported separately from the cpu time of prp. Stages that overlap
+        with stages of other threads or tasks are marked as concurrent.
+        """
+        stage_id = self._start_stage()
+        token = _STAGE_STACK.set((*_STAGE_STACK.get(), stage_id))
+        cpu_start, child_cpu_start = _get_cpu_times()
+        wall_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - wall_start
+            cpu_end, child_cpu_end = _get_cpu_times()
+            _STAGE_STACK.reset(token)
+            usage = self._end_stage(stage_id)
+            self.stages.append(
+                {
+                    "name": name,
+                    "pid": os.getpid(),
+                    "wall_time": round(wall_time, 6),
+                    "cpu_time": round(cpu_end - cpu_start, 6),
+                    "subprocess_cpu_time": round(child_cpu_end - child_cpu_start, 6),
+                    "peak_rss_mb": round(usage["peak_rss_mb"], 3),
+                    "concurrent": usage["concurrent"],
+                }
+            )
+
+
+def get_profiler() -> Profiler | None:
+    """Get the active profiler."""
+    return _PROFILER
+
+
+@contextmanager
+def profile_stage(name: str) -> Iterator[None]:
+    """Record a stage if profiling is active."""
+    if _PROFILER is None:
+        yield
+    else:
+        with _PROFILER.stage(name):
+            yield
+
+
+@contextmanager
+def profiling(output: str | None, command: str) -> Iterator[Profiler | None]:
+    """Profile the stages of a command and write a report when it is done.
+
+    :param output: Path of the json report, profiling is disabled if None
+    :type output: str | None
+    :param command: Name of the profiled command
+    :type command: str
+    """
+    global _PROFILER  # pylint: disable=global-statement
+
+    if output is None:
+        yield None
+        return
+    _PROFILER = profiler = Profiler()
+    cpu_start, child_cpu_start = _get_cpu_times()
+    wall_start = time.perf_counter()
+    try:
+        yield profiler
+    finally:
+        _PROFILER = None
+        cpu_end, child_cpu_end = _get_cpu_times()
+        report = {
+            "command": command,
+            "wall_time": round(time.perf_counter() - wall_start, 6),
+            "cpu_time": round(cpu_end - cpu_start, 6),
+            "subprocess_cpu_time": round(child_cpu_end - child_cpu_start, 6),
+            "peak_rss_mb": round(max(profiler.peak_rss_mb, _get_peak_rss()), 3),
+            "stages": profiler.stages,
+        }
+        LOG.info("Writing profile to: %s", output)
+        with open(output, "w", encoding="utf-8") as outp:
+            json.dump(report, outp, indent=2)
@@ -0,0 +1,152 @@
+"""Run prp commands in a long-running server process.
+
+The server imports the parsers and builds the data model validators once.
+Every job is run in a forked copy of the server so jobs are isolated from
+each other while sharing the warm interpreter state.
+"""
+
+import io
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Any
+
+import click
+
+LOG = logging.getLogger(__name__)
+
+# commands that can be run by the server
+SERVE_COMMANDS = ("create-bonsai-input", "create-cdm-input", "validate")
+
+
+class _ForkingUnixServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server that handles each request in a forked process."""
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    """Run a job sent as a single line of json."""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            args, cwd = list(request["args"]), request.get("cwd")
+        except (ValueError, KeyError, TypeError) as err:
+            response = {"exit_code": 2, "stdout": "", "stderr": f"Invalid job: {err}\n"}
+        else:
+            response = run_job(args, cwd)
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+def run_job(args: list[str], cwd: str | None = None) -> dict[str, Any]:
+    """Run a prp command and capture its output.
+
+    Errors raised by the command are written to the captured stderr so that
+    a reply is always sent to the client.
+
+    :param args: Command line arguments, starting with the command name
+    :type args: list[str]
+    :param cwd: Working directory of the job, defaults to None
+    :type cwd: str | None, optional
+    :return: Exit code and the output written to stdout and stderr.
+    :rtype: dict[str, Any]
+    """
+    from .cli import cli  # pylint: disable=import-outside-toplevel
+
+    if len(args) == 0 or args[0] not in SERVE_COMMANDS:
+        return {
+            "exit_code": 2,
+            "stdout": "",
+            "stderr": f"Command must be one of: {', '.join(SERVE_COMMANDS)}\n",
+        }
+    if cwd is not None:
+        os.chdir(cwd)
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    # send log messages of the job to the captured stderr
+    handlers = [
+        h for h in logging.root.handlers if isinstance(h, logging.StreamHandler)
+    ]
+    streams = [handler.setStream(stderr) for handler in handlers]
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                # the code of ctx.exit is returned when not in standalone mode
+                exit_code = (
+                    cli.main(args=list(args), prog_name="prp", standalone_mode=False)
+                    or 0
+                )
+            except click.ClickException as err:
+                err.show()
+                exit_code = err.exit_code
+            except click.Abort:
+                click.echo("Aborted!", err=True)
+                exit_code = 1
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+                exit_code = 1
+    finally:
+        for handler, stream in zip(handlers, streams):
+            handler.setStream(stream)
+    return {
+        "exit_code": exit_code,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+    }
+
+
+def warm_up(reference_genomes: list[str] = ()) -> None:
+    """Import parsers and read reference genome metadata ahead of the jobs."""
+    # pylint: disable=import-outside-toplevel,unused-import
+    from .models.sample import PipelineResult  # noqa: F401
+    from .parse.metadata import get_gb_genome_version
+    from .parse.sample import create_pipeline_result  # noqa: F401
+
+    for fasta_path in reference_genomes:
+        LOG.info("Preloading reference genome: %s", fasta_path)
+        get_gb_genome_version(fasta_path)
+
+
+def serve(socket_path: str, reference_genomes: list[str] = ()) -> None:
+    """Accept jobs on a Unix socket until interrupted.
+
+    :param socket_path: Path of the Unix socket
+    :type socket_path: str
+    :param reference_genomes: Reference genomes to preload, defaults to ()
+    :type reference_genomes: list[str], optional
+    """
+    warm_up(reference_genomes)
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    # remove the socket also when the server is terminated
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    with _ForkingUnixServer(socket_path, JobHandler) as server:
+        LOG.info("Listening for jobs on %s", socket_path)
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(socket_path)
+
+
+def submit_job(socket_path: str, args: list[str], cwd: str) -> dict[str, Any]:
+    """Send a job to a prp server and wait for the result.
+
+    :param socket_path: Path of the server Unix socket
+    :type socket_path: str
+    :param args: Command line arguments, starting with the command name
+    :type args: list[str]
+    :param cwd: Working directory of the job
+    :type cwd: str
+    :return: Exit code and the output written to stdout and stderr.
+    :rtype: dict[str, Any]
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps({"args": args, "cwd": cwd}).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as response:
+            return json.loads(response.readline())
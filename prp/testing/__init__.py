@@ -0,0 +1 @@
+"""Utilities for testing prp on generated data."""
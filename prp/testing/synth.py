@@ -0,0 +1,697 @@
+"""Generate synthetic pipeline results at production scale.
+
+The files follow the format of the tools run by JASEN so they can be parsed
+by prp, but the content is random. The same seed always gives the same
+output.
+"""
+
+import json
+import logging
+import os
+import random
+import tempfile
+from pathlib import Path
+from typing import Any
+
+LOG = logging.getLogger(__name__)
+
+NUCLEOTIDES = "ACGT"
+AMINO_ACIDS = (
+    "Ala", "Arg", "Asn", "Asp", "Cys", "Gln", "Glu", "Gly", "His", "Ile",
+    "Leu", "Lys", "Met", "Phe", "Pro", "Ser", "Thr", "Trp", "Tyr", "Val",
+)  # fmt: skip
+CHEWBBACA_ERRORS = ("LNF", "PLOT3", "PLOT5", "NIPH", "NIPHEM", "ALM", "ASM", "LOTSC")
+MTUBERCULOSIS_CONTIG = ("NC_000962.3", 4411532)
+
+# gene name, locus tag, feature id and associated drug of tbprofiler genes
+TBPROFILER_GENES = (
+    ("rpoB", "Rv0667", "CCP43410", "rifampicin"),
+    ("katG", "Rv1908c", "CCP44675", "isoniazid"),
+    ("inhA", "Rv1484", "CCP44244", "isoniazid"),
+    ("embB", "Rv3795", "CCP46624", "ethambutol"),
+    ("pncA", "Rv2043c", "CCP44816", "pyrazinamide"),
+    ("gyrA", "Rv0006", "CCP42728", "fluoroquinolones"),
+    ("rpsL", "Rv0682", "CCP43425", "streptomycin"),
+    ("ethA", "Rv3854c", "CCP46683", "ethionamide"),
+)
+# gene name, resistance class and antibiotics of resfinder genes
+RESFINDER_GENES = (
+    ("blaTEM-1B", "beta-lactam", ("ampicillin", "piperacillin", "cephalothin")),
+    ("aac(6')-Ib", "aminoglycoside", ("tobramycin", "amikacin", "dibekacin")),
+    ("aph(3'')-Ib", "aminoglycoside", ("streptomycin",)),
+    ("sul2", "folate pathway antagonist", ("sulfamethoxazole",)),
+    ("dfrA17", "folate pathway antagonist", ("trimethoprim",)),
+    ("tet(A)", "tetracycline", ("tetracycline", "doxycycline")),
+    ("catA1", "amphenicol", ("chloramphenicol",)),
+    ("mph(A)", "macrolide", ("azithromycin", "erythromycin")),
+)
+# gene name, accession and antibiotics of pointfinder genes
+POINTFINDER_GENES = (
+    ("gyrA", "CP073768.1", ("ciprofloxacin", "nalidixic acid")),
+    ("parC", "CP084529.1", ("ciprofloxacin", "nalidixic acid")),
+    ("ampC", "CP037449.1", ("ampicillin", "cephalothin")),
+)
+
+
+def write_chewbbaca_matrix(
+    output: str,
+    n_loci: int = 7000,
+    n_samples: int = 1,
+    novel_rate: float = 0.02,
+    missing_rate: float = 0.01,
+    seed: int = 0,
+) -> str:
+    """Write a chewBBACA allele call matrix.
+
+    :param output: Path of the matrix
+    :type output: str
+    :param n_loci: Number of loci in the scheme, defaults to 7000
+    :type n_loci: int, optional
+    :param n_samples: Number of samples, defaults to 1
+    :type n_samples: int, optional
+    :param novel_rate: Fraction of inferred novel alleles, defaults to 0.02
+    :type novel_rate: float, optional
+    :param missing_rate: Fraction of missing alleles, defaults to 0.01
+    :type missing_rate: float, optional
+    :param seed: Seed of the random generator, defaults to 0
+    :type seed: int, optional
+    :return: Path of the matrix
+    :rtype: str
+    """
+    rng = random.Random(seed)
+    loci = [f"INNUENDO_wgMLST-{16024 + idx:08d}.fasta" for idx in range(n_loci)]
+    with open(output, "w", encoding="utf-8") as outp:
+        outp.write("\t".join(["FILE", *loci]) + "\n")
+        for sample_idx in range(1, n_samples + 1):
+            alleles = []
+            for _ in range(n_loci):
+                draw = rng.random()
+                if draw < missing_rate:
+                    alleles.append(rng.choice(CHEWBBACA_ERRORS))
+                elif draw < missing_rate + novel_rate:
+                    alleles.append(f"INF-{rng.randint(100, 999)}")
+                else:
+                    alleles.append(str(rng.randint(1, 60)))
+            outp.write("\t".join([f"sample_{sample_idx}.fasta", *alleles]) + "\n")
+    return output
+
+
+def write_basecov(
+    output: str,
+    n_bases: int = 1_000_000,
+    contig: str = MTUBERCULOSIS_CONTIG[0],
+    mean_depth: int = 60,
+    sample_id: str = "sample_1",
+    seed: int = 0,
+) -> str:
+    """Write a sambamba depth base file.
+
+    The coverage follow a random walk around the mean depth with occasional
+    drops to zero coverage.
+
+    :param output: Path of the coverage file
+    :type output: str
+    :param n_bases: Number of positions, defaults to 1000000
+    :type n_bases: int, optional
+    :param contig: Name of the contig, defaults to NC_000962.3
+    :type contig: str, optional
+    :param mean_depth: Mean coverage, defaults to 60
+    :type mean_depth: int, optional
+    :param sample_id: Sample name, defaults to sample_1
+    :type sample_id: str, optional
+    :param seed: Seed of the random generator, defaults to 0
+    :type seed: int, optional
+    :return: Path of the coverage file
+    :rtype: str
+    """
+    rng = random.Random(seed)
+    depth = mean_depth
+    with open(output, "w", encoding="utf-8") as outp:
+        outp.write("REF\tPOS\tCOV\tA\tC\tG\tT\tDEL\tREFSKIP\tSAMPLE\n")
+        lines = []
+        for pos in range(n_bases):
+            # drift towards the mean depth
+            drift = (mean_depth > depth) - (mean_depth < depth)
+            depth = max(0, depth + drift + rng.randint(-2, 2))
+            cov = 0 if rng.random() < 0.001 else depth
+            counts = [0, 0, 0, 0]
+            counts[rng.randrange(4)] = cov
+            row = [contig, pos, cov, *counts, 0, 0, sample_id]
+            lines.append("\t".join(map(str, row)) + "\n")
+            if len(lines) == 10_000:
+                outp.writelines(lines)
+                lines = []
+        outp.writelines(lines)
+    return output
+
+
+def _vcf_header(sample_id: str) -> list[str]:
+    """Get the header of a freebayes VCF file."""
+    contig, length = MTUBERCULOSIS_CONTIG
+    return [
+        "##fileformat=VCFv4.2",
+        '##FILTER=<ID=PASS,Description="All filters passed">',
+        "##source=freeBayes v1.3.6",
+        "##reference=reference/ref.fa",
+        f"##contig=<ID={contig},length={length}>",
+        '##INFO=<ID=DP,Number=1,Type=Integer,Description="Total read depth">',
+        '##INFO=<ID=RO,Number=1,Type=Integer,Description="Reference observations">',
+        '##INFO=<ID=AO,Number=A,Type=Integer,Description="Alternate observations">',
+        '##INFO=<ID=AB,Number=A,Type=Float,Description="Allele balance">',
+        '##INFO=<ID=TYPE,Number=A,Type=String,Description="The type of allele">',
+        '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">',
+        '##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Read Depth">',
+        '##FORMAT=<ID=RO,Number=1,Type=Integer,Description="Reference observations">',
+        '##FORMAT=<ID=AO,Number=A,Type=Integer,Description="Alternate observations">',
+        f"#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t{sample_id}",
+    ]
+
+
+def _vcf_records(n_records: int, rng: random.Random) -> list[str]:
+    """Get SNVs and indels at increasing positions of the genome."""
+    contig, length = MTUBERCULOSIS_CONTIG
+    spacing = max(1, length // (n_records + 1))
+    records = []
+    for idx in range(n_records):
+        pos = 1 + idx * spacing + rng.randrange(max(1, spacing - 10))
+        ref = rng.choice(NUCLEOTIDES)
+        draw = rng.random()
+        if draw < 0.9:
+            alt, var_type = rng.choice([nt for nt in NUCLEOTIDES if nt != ref]), "snp"
+        elif draw < 0.95:
+            alt, var_type = (
+                ref + "".join(rng.choices(NUCLEOTIDES, k=rng.randint(1, 5))),
+                "ins",
+            )
+        else:
+            ref, alt, var_type = (
+                ref + "".join(rng.choices(NUCLEOTIDES, k=rng.randint(1, 5))),
+                ref,
+                "del",
+            )
+        depth = rng.randint(10, 250)
+        info = f"AB=0;AO={depth};DP={depth};RO=0;TYPE={var_type}"
+        qual = f"{depth * 26.5:.2f}"
+        fmt = f"1/1:{depth}:0:{depth}"
+        records.append(
+            "\t".join(
+                [contig, str(pos), ".", ref, alt, qual, ".", info, "GT:DP:RO:AO", fmt]
+            )
+        )
+    return records
+
+
+def write_vcf(
+    output: str, n_records: int = 100_000, sample_id: str = "sample_1", seed: int = 0
+) -> str:
+    """Write a VCF file with variants called by freebayes.
+
+    The file is written as BCF if the path ends with .bcf and as bgzipped VCF
+    if the path ends with .vcf.gz.
+
+    :param output: Path of the variant file
+    :type output: str
+    :param n_records: Number of variants, defaults to 100000
+    :type n_records: int, optional
+    :param sample_id: Sample name, defaults to sample_1
+    :type sample_id: str, optional
+    :param seed: Seed of the random generator, defaults to 0
+    :type seed: int, optional
+    :return: Path of the variant file
+    :rtype: str
+    """
+    rng = random.Random(seed)
+    lines = _vcf_header(sample_id) + _vcf_records(n_records, rng)
+    if output.endswith(".bcf") or output.endswith(".vcf.gz"):
+        import pysam  # pylint: disable=import-outside-toplevel
+
+        mode = "wb" if output.endswith(".bcf") else "wz"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            vcf_path = os.path.join(tmp_dir, "variants.vcf")
+            Path(vcf_path).write_text("\n".join(lines) + "\n", encoding="utf-8")
+            with pysam.VariantFile(vcf_path) as inpt, pysam.VariantFile(
+                output, mode, header=inpt.header
+            ) as outp:
+                for record in inpt:
+                    outp.write(record)
+    else:
+        Path(output).write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return output
+
+
+def write_reference(
+    output: str,
+    length: int = 100_000,
+    contig: str = MTUBERCULOSIS_CONTIG[0],
+    seed: int = 0,
+) -> str:
+    """Write an indexed reference genome fasta with a single contig.
+
+    :param output: Path of the fasta file
+    :type output: str
+    :param length: Length of the contig, defaults to 100000
+    :type length: int, optional
+    :param contig: Name of the contig, defaults to NC_000962.3
+    :type contig: str, optional
+    :param seed: Seed of the random generator, defaults to 0
+    :type seed: int, optional
+    :return: Path of the fasta file
+    :rtype: str
+    """
+    import pysam  # pylint: disable=import-outside-toplevel
+
+    rng = random.Random(seed)
+    sequence = "".join(rng.choices(NUCLEOTIDES, k=length))
+    with open(output, "w", encoding="utf-8") as outp:
+        outp.write(f">{contig}\n")
+        for start in range(0, length, 60):
+            outp.write(sequence[start : start + 60] + "\n")
+    pysam.faidx(output)
+    return output
+
+
+def _read_pair(
+    rng: random.Random,
+    sequence: str,
+    pair_idx: int,
+    read_length: int,
+    insert_size: int,
+    duplicate_rate: float,
+) -> list[dict[str, Any]]:
+    """Get the alignments of a read pair as keyword arguments to pysam."""
+    # normally distributed insert sizes with a few long outliers
+    mean_size = insert_size * 4 if rng.random() < 0.01 else insert_size
+    insert_size = round(rng.gauss(mean_size, insert_size * 0.1))
+    insert_size = min(max(insert_size, read_length), len(sequence) // 2)
+    start1 = rng.randrange(0, len(sequence) - insert_size)
+    start2 = start1 + insert_size - read_length
+    mapq = 0 if rng.random() < 0.05 else 60
+    common_flag = 0x1
+    if rng.random() < duplicate_rate:
+        common_flag |= 0x400
+    if rng.random() < 0.01:
+        common_flag |= 0x200
+    mate_unmapped = rng.random() < 0.01
+    if not mate_unmapped:
+        common_flag |= 0x2
+    reads = []
+    for idx, start in enumerate((start1, start2)):
+        unmapped = mate_unmapped and idx == 1
+        draw = rng.random()
+        if unmapped:
+            cigar, ref_span = None, 0
+        elif draw < 0.03:
+            cigar, ref_span = f"70M2D{read_length - 70}M", read_length + 2
+        elif draw < 0.05:
+            cigar, ref_span = f"70M2I{read_length - 72}M", read_length - 2
+        else:
+            cigar, ref_span = f"{read_length}M", read_length
+        if unmapped:
+            seq = "".join(rng.choices(NUCLEOTIDES, k=read_length))
+            start = start1
+        else:
+            seq = sequence[start : start + ref_span]
+            if "D" in cigar:
+                seq = seq[:70] + seq[72:]
+            elif "I" in cigar:
+                seq = seq[:70] + "AC" + seq[70:]
+        flag = common_flag | (0x40 if idx == 0 else 0x80)
+        if unmapped:
+            flag = (flag | 0x4) & ~0x2
+        elif mate_unmapped:
+            flag |= 0x8
+        # the first read is forward and the second reverse
+        flag |= 0x20 if idx == 0 and not mate_unmapped else 0
+        flag |= 0x10 if idx == 1 and not unmapped else 0
+        reads.append(
+            {
+                "name": f"read_{pair_idx}",
+                "flag": flag,
+                "start": start,
+                "mate_start": start2 if idx == 0 and not mate_unmapped else start1,
+                "cigar": cigar,
+                "mapq": 0 if unmapped else mapq,
+                "seq": seq,
+                "tlen": 0
+                if mate_unmapped
+                else (insert_size if idx == 0 else -insert_size),
+            }
+        )
+    return reads
+
+
+def write_bam(
+    output: str,
+    n_pairs: int = 10_000,
+    reference: str | None = None,
+    read_length: int = 150,
+    insert_size: int = 350,
+    duplicate_rate: float = 0.05,
+    seed: int = 0,
+) -> str:
+    """Write a sorted and indexed bam file with paired reads.
+
+    The reads are sampled from the reference genome with normally distributed
+    insert sizes. A few percent of the reads are duplicates, fail qc, have
+    mapping quality 0, contain indels, have an unmapped mate or are from pairs
+    with a long insert.
+
+    :param output: Path of the bam file
+    :type output: str
+    :param n_pairs: Number of read pairs, defaults to 10000
+    :type n_pairs: int, optional
+    :param reference: Reference fasta, defaults to a random 100 kb genome
+    :type reference: str | None, optional
+    :param read_length: Read length, defaults to 150
+    :type read_length: int, optional
+    :param insert_size: Mean insert size, defaults to 350
+    :type insert_size: int, optional
+    :param duplicate_rate: Fraction of duplicate reads, defaults to 0.05
+    :type duplicate_rate: float, optional
+    :param seed: Seed of the random generator, defaults to 0
+    :type seed: int, optional
+    :return: Path of the bam file
+    :rtype: str
+    """
+    import pysam  # pylint: disable=import-outside-toplevel
+
+    rng = random.Random(seed)
+    if reference is None:
+        contig = MTUBERCULOSIS_CONTIG[0]
+        sequence = "".join(random.Random(seed).choices(NUCLEOTIDES, k=100_000))
+    else:
+        with pysam.FastaFile(reference) as fasta:
+            contig = fasta.references[0]
+            sequence = fasta.fetch(contig)
+    reads = []
+    for pair_idx in range(n_pairs):
+        reads.extend(
+            _read_pair(
+                rng, sequence, pair_idx, read_length, insert_size, duplicate_rate
+            )
+        )
+    reads.sort(key=lambda read: (read["start"], read["name"]))
+    header = {
+        "HD": {"VN": "1.6", "SO": "coordinate"},
+        "SQ": [{"SN": contig, "LN": len(sequence)}],
+        "RG": [{"ID": "synthetic", "SM": "sample_1"}],
+    }
+    with pysam.AlignmentFile(output, "wb", header=header) as outp:
+        for read in reads:
+            segment = pysam.AlignedSegment(outp.header)
+            segment.query_name = read["name"]
+            segment.flag = read["flag"]
+            segment.reference_id = 0
+            segment.reference_start = read["start"]
+            segment.mapping_quality = read["mapq"]
+            if read["cigar"] is not None:
+                segment.cigarstring = read["cigar"]
+            segment.next_reference_id = 0
+            segment.next_reference_start = read["mate_start"]
+            segment.template_length = read["tlen"]
+            segment.query_sequence = read["seq"]
+            segment.query_qualities = pysam.qualitystring_to_array(
+                "I" * len(read["seq"])
+            )
+            segment.set_tag("RG", "synthetic")
+            outp.write(segment)
+    pysam.index(output)
+    return output
+
+
+def _tbprofiler_variant(rng: random.Random, passed_qc: bool) -> dict[str, Any]:
+    """Get a tbprofiler variant in a resistance gene."""
+    gene_name, locus_tag, feature_id, drug = rng.choice(TBPROFILER_GENES)
+    ref, alt = rng.sample(NUCLEOTIDES, 2)
+    codon = rng.randint(1, 1000)
+    nt_change = f"c.{codon * 3 - 2}{ref}>{alt}"
+    aa_change = f"p.{rng.choice(AMINO_ACIDS)}{codon}{rng.choice(AMINO_ACIDS)}"
+    depth = rng.randint(10, 250) if passed_qc else rng.randint(1, 9)
+    annotation = [
+        {
+            "type": "drug_resistance",
+            "drug": drug,
+            "original_mutation": aa_change,
+            "confidence": rng.choice(
+                ["Assoc w R", "Assoc w R - Interim", "Uncertain significance"]
+            ),
+            "source": "WHO catalogue v2",
+            "comment": "",
+        }
+    ]
+    return {
+        "chrom": MTUBERCULOSIS_CONTIG[0],
+        "pos": rng.randint(1, MTUBERCULOSIS_CONTIG[1]),
+        "ref": ref,
+        "alt": alt,
+        "depth": depth,
+        "freq": round(rng.uniform(0.1, 1.0), 4),
+        "sv": False,
+        "filter": "pass" if passed_qc else "hard_fail",
+        "forward_reads": depth // 2,
+        "reverse_reads": depth - depth // 2,
+        "sv_len": None,
+        "gene_id": locus_tag,
+        "gene_name": gene_name,
+        "feature_id": feature_id,
+        "type": "missense_variant",
+        "change": aa_change,
+        "nucleotide_change": nt_change,
+        "protein_change": aa_change,
+        "annotation": annotation,
+        "consequences": [
+            {
+                "gene_id": locus_tag,
+                "gene_name": gene_name,
+                "feature_id": feature_id,
+                "type": "missense_variant",
+                "nucleotide_change": nt_change,
+                "protein_change": aa_change,
+                "annotation": annotation,
+            }
+        ],
+        "drugs": annotation,
+        "locus_tag": locus_tag,
+        "gene_associated_drugs": [drug],
+    }
+
+
+def make_tbprofiler_result(
+    n_variants: int = 10_000, sample_id: str = "sample_1", seed: int = 0
+) -> dict[str, Any]:
+    """Create a tbprofiler result.
+
+    A tenth of the variants are resistance variants and a tenth fail qc.
+
+    :param n_variants: Number of variants, defaults to 10000
+    :type n_variants: int, optional
+    :param sample_id: Sample name, defaults to sample_1
+    :type sample_id: str, optional
+    :param seed: Seed of the random generator, defaults to 0
+    :type seed: int, optional
+    :return: The tbprofiler result
+    :rtype: dict[str, Any]
+    """
+    rng = random.Random(seed)
+    n_dr = n_qc_fail = n_variants // 10
+    support = [
+        {
+            "id": "lineage2",
+            "chrom": MTUBERCULOSIS_CONTIG[0],
+            "pos": rng.randint(1, MTUBERCULOSIS_CONTIG[1]),
+            "target_allele_count": rng.randint(50, 250),
+            "other_allele_count": 0,
+            "target_allele_percent": 100.0,
+        }
+        for _ in range(5)
+    ]
+    return {
+        "schema_version": "1.0.0",
+        "id": sample_id,
+        "timestamp": "2024-01-01T00:00:00.000000",
+        "pipeline": {
+            "software_version": "6.2.1",
+            "db_version": {"name": "tbdb", "commit": "synthetic"},
+            "software": [
+                {"process": "variant_calling", "software": "freebayes"},
+                {"process": "mapping", "software": "bwa"},
+            ],
+        },
+        "notes": [],
+        "lineage": [
+            {
+                "fraction": 1.0,
+                "lineage": "lineage2",
+                "family": "East-Asian",
+                "rd": "RD105",
+                "support": support,
+            }
+        ],
+        "main_lineage": "lineage2",
+        "sub_lineage": "lineage2.2.1",
+        "spoligotype": None,
+        "drtype": "MDR-TB",
+        "dr_variants": [_tbprofiler_variant(rng, True) for _ in range(n_dr)],
+        "other_variants": [
+            _tbprofiler_variant(rng, True) for _ in range(n_variants - n_dr - n_qc_fail)
+        ],
+        "qc_fail_variants": [_tbprofiler_variant(rng, False) for _ in range(n_qc_fail)],
+        "qc": {"percent_reads_mapped": 99.1, "num_reads_mapped": 1_000_000},
+        "linked_samples": [],
+    }
+
+
+def make_resfinder_result(
+    n_genes: int = 1000, n_variations: int = 100, seed: int = 0
+) -> dict[str, Any]:
+    """Create a resfinder result.
+
+    :param n_genes: Number of resistance genes, defaults to 1000
+    :type n_genes: int, optional
+    :param n_variations: Number of point mutations, defaults to 100
+    :type n_variations: int, optional
+    :param seed: Seed of the random generator, defaults to 0
+    :type seed: int, optional
+    :return: The resfinder result
+    :rtype: dict[str, Any]
+    """
+    rng = random.Random(seed)
+    seq_regions = {}
+    seq_variations = {}
+    phenotypes: dict[str, dict[str, Any]] = {}
+
+    def _add_phenotypes(antibiotics, amr_class, region_key=None, variation_key=None):
+        for antibiotic in antibiotics:
+            pheno = phenotypes.setdefault(
+                antibiotic,
+                {
+                    "type": "phenotype",
+                    "amr_classes": [amr_class],
+                    "seq_regions": [],
+                    "seq_variations": [],
+                    "ref_database": ["ResFinder-2.1.1"],
+                    "category": "amr",
+                    "key": antibiotic,
+                    "amr_resistance": antibiotic,
+                    "amr_resistant": True,
+                    "amr_species_relevant": True,
+                    "grade": 3,
+                },
+            )
+            if region_key is not None:
+                pheno["seq_regions"].append(region_key)
+            if variation_key is not None:
+                pheno["seq_variations"].append(variation_key)
+
+    def _seq_region(name, acc, database, antibiotics):
+        ref_length = rng.randint(300, 3000)
+        aln_length = rng.randint(ref_length // 2, ref_length)
+        return {
+            "type": "seq_region",
+            "phenotypes": list(antibiotics),
+            "ref_database": [database],
+            "gene": True,
+            "ref_id": f"{name}_1_{acc}",
+            "name": name,
+            "ref_acc": acc,
+            "identity": round(rng.uniform(80, 100), 2),
+            "alignment_length": aln_length,
+            "ref_seq_length": ref_length,
+            "depth": round(rng.uniform(10, 200), 2),
+            "ref_start_pos": 1,
+            "ref_end_pos": aln_length,
+            "pmids": [],
+            "notes": [""],
+            "coverage": round(100 * aln_length / ref_length, 2),
+            "grade": 3,
+            "key": f"{name};;1;;{acc}",
+        }
+
+    for idx in range(n_genes):
+        base_name, amr_class, antibiotics = RESFINDER_GENES[idx % len(RESFINDER_GENES)]
+        region = _seq_region(
+            f"{base_name}_{idx}", f"AY{100000 + idx}", "ResFinder-2.1.1", antibiotics
+        )
+        seq_regions[region["key"]] = region
+        _add_phenotypes(antibiotics, amr_class, region_key=region["key"])
+
+    for name, acc, antibiotics in POINTFINDER_GENES:
+        region = _seq_region(name, acc, "PointFinder-4.0.0", antibiotics)
+        seq_regions[region["key"]] = region
+
+    for idx in range(n_variations):
+        name, acc, antibiotics = POINTFINDER_GENES[idx % len(POINTFINDER_GENES)]
+        ref_codon = "".join(rng.choices(NUCLEOTIDES, k=3))
+        var_codon = (
+            ref_codon[0]
+            + rng.choice([nt for nt in NUCLEOTIDES if nt != ref_codon[1]])
+            + ref_codon[2]
+        )
+        pos = idx + 1
+        key = f"{name};;1;;{acc};;{pos};;{var_codon.lower()}"
+        seq_variations[key] = {
+            "type": "seq_variation",
+            "ref_database": "PointFinder-4.0.0",
+            "seq_regions": [f"{name};;1;;{acc}"],
+            "phenotypes": list(antibiotics),
+            "seq_var": f"p.S{pos}L",
+            "ref_codon": ref_codon.lower(),
+            "var_codon": var_codon.lower(),
+            "codon_change": f"{ref_codon.lower()}>{var_codon.lower()}",
+            "nuc_change": "l",
+            "ref_aa": "s",
+            "var_aa": "l",
+            "ref_start_pos": pos,
+            "ref_end_pos": pos,
+            "substitution": True,
+            "deletion": False,
+            "insertion": False,
+            "ref_id": f"{name};;1;;{acc}_{pos}_l",
+            "key": key,
+            "pmids": [],
+            "notes": [""],
+        }
+        _add_phenotypes(antibiotics, "quinolone", variation_key=key)
+
+    return {
+        "type": "software_result",
+        "databases": {
+            "ResFinder-2.1.1": {
+                "type": "database",
+                "database_name": "ResFinder",
+                "database_version": "2.1.1",
+                "key": "ResFinder-2.1.1",
+            },
+            "PointFinder-4.0.0": {
+                "type": "database",
+                "database_name": "PointFinder",
+                "database_version": "4.0.0",
+                "key": "PointFinder-4.0.0",
+            },
+        },
+        "seq_regions": seq_regions,
+        "seq_variations": seq_variations,
+        "phenotypes": phenotypes,
+        "software_executions": {
+            "synthetic": {
+                "type": "software_exec",
+                "parameters": {"method": "kma", "species": "escherichia coli"},
+                "key": "synthetic",
+            }
+        },
+        "aln_hits": {},
+        "software_name": "ResFinder",
+        "software_version": "4.4.1",
+        "software_commit": "unknown",
+        "run_date": "2024-01-01",
+        "key": "ResFinder-4.4.1",
+        "provided_species": "escherichia coli",
+        "result_summary": "",
+    }
+
+
+def write_json(result: dict[str, Any], output: str) -> str:
+    """Write a generated result as json."""
+    with open(output, "w", encoding="utf-8") as outp:
+        json.dump(result, outp, indent=2)
+    return output
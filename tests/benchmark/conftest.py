@@ -0,0 +1,123 @@
+"""Fixtures for timing parsers on scaled inputs.
+
+The inputs are created by replicating the content of the test fixtures.
+Timings are compared with the baseline in baseline.json, update the baseline
+with --prp-benchmark-save.
+"""
+
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+BASELINE_PATH = Path(__file__).parent.joinpath("baseline.json")
+TIMINGS: dict[str, float] = {}
+
+
+def scale_table(path: str, output: Path, factor: int) -> str:
+    """Replicate the rows of a tab separated file with a header."""
+    header, *rows = Path(path).read_text(encoding="utf-8").splitlines()
+    output.write_text("\n".join([header, *rows * factor]) + "\n", encoding="utf-8")
+    return str(output)
+
+
+def scale_cgmlst(path: str, output: Path, factor: int) -> str:
+    """Replicate the loci of a chewBBACA allele call matrix."""
+    header, row = Path(path).read_text(encoding="utf-8").splitlines()[:2]
+    sample_col, *loci = header.split("\t")
+    sample_id, *alleles = row.split("\t")
+    scaled_loci = [f"{locus}_{i}" for i in range(factor) for locus in loci]
+    lines = [
+        "\t".join([sample_col, *scaled_loci]),
+        "\t".join([sample_id, *alleles * factor]),
+    ]
+    output.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(output)
+
+
+def scale_vcf(path: str, output: Path, factor: int) -> str:
+    """Replicate the records of a VCF file at increasing positions."""
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    header = [line for line in lines if line.startswith("#")]
+    records = [line.split("\t") for line in lines if not line.startswith("#")]
+    offset = max(int(rec[1]) for rec in records)
+    scaled = []
+    for i in range(factor):
+        for rec in records:
+            scaled.append("\t".join([rec[0], str(int(rec[1]) + i * offset), *rec[2:]]))
+    output.write_text("\n".join([*header, *scaled]) + "\n", encoding="utf-8")
+    return str(output)
+
+
+def scale_resfinder(path: str, factor: int) -> dict:
+    """Replicate the genes and variants of a resfinder result."""
+    with open(path, encoding="utf-8") as inpt:
+        pred = json.load(inpt)
+    regions, variations = dict(pred["seq_regions"]), dict(pred["seq_variations"])
+    for i in range(1, factor):
+        pred["seq_regions"].update({f"{key}_{i}": val for key, val in regions.items()})
+        for key, val in variations.items():
+            pred["seq_variations"][f"{key}_{i}"] = {
+                **val,
+                "seq_regions": [f"{region}_{i}" for region in val["seq_regions"]],
+            }
+    return pred
+
+
+def scale_tbprofiler(path: str, factor: int) -> dict:
+    """Replicate the variants of a tbprofiler result."""
+    with open(path, encoding="utf-8") as inpt:
+        pred = json.load(inpt)
+    for section in ("dr_variants", "other_variants"):
+        pred[section] = pred[section] * factor
+    return pred
+
+
+@pytest.fixture()
+def prp_benchmark(request):
+    """Time a function and compare it with the baseline.
+
+    The function is run a few times and the fastest run is reported.
+    """
+    config = request.config
+    with open(BASELINE_PATH, encoding="utf-8") as inpt:
+        baseline = json.load(inpt)
+
+    def _benchmark(func, *args, rounds: int = 3, **kwargs):
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            func(*args, **kwargs)
+            timings.append(time.perf_counter() - start)
+        elapsed = min(timings)
+        name = request.node.nodeid.split("::", 1)[1]
+        TIMINGS[name] = elapsed
+        tolerance = config.getoption("--prp-benchmark-tolerance")
+        if name in baseline and not config.getoption("--prp-benchmark-save"):
+            assert (
+                elapsed <= baseline[name] * tolerance
+            ), f"{name} took {elapsed:.4f}s, baseline is {baseline[name]:.4f}s"
+        return elapsed
+
+    return _benchmark
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    """Report benchmark timings."""
+    if not TIMINGS:
+        return
+    terminalreporter.section("prp benchmark")
+    for name, elapsed in sorted(TIMINGS.items()):
+        terminalreporter.write_line(f"{elapsed:10.4f}s  {name}")
+    if config.getoption("--prp-benchmark-save"):
+        with open(BASELINE_PATH, encoding="utf-8") as inpt:
+            baseline = json.load(inpt)
+        baseline.update({name: round(elapsed, 6) for name, elapsed in TIMINGS.items()})
+        with open(BASELINE_PATH, "w", encoding="utf-8") as outp:
+            json.dump(dict(sorted(baseline.items())), outp, indent=2)
+            outp.write("\n")
+        terminalreporter.write_line(f"Stored baseline in {BASELINE_PATH}")
+    if json_path := config.getoption("--prp-benchmark-json"):
+        with open(json_path, "w", encoding="utf-8") as outp:
+            json.dump(TIMINGS, outp, indent=2)
@@ -0,0 +1,202 @@
+"""Benchmark parsers on inputs of increasing size."""
+
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from prp.cli import create_bonsai_input
+from prp.models.phenotype import ElementType
+from prp.parse import (
+    load_variants,
+    parse_amrfinder_amr_pred,
+    parse_amrfinder_vir_pred,
+    parse_cgmlst_results,
+    parse_emmtyper_pred,
+    parse_kraken_result,
+    parse_mlst_results,
+    parse_postalignqc_results,
+    parse_quast_results,
+    parse_resfinder_amr_pred,
+    parse_serotypefinder_oh_typing,
+    parse_shigapass_pred,
+    parse_tbprofiler_amr_pred,
+    parse_tbprofiler_lineage_results,
+    parse_virulencefinder_stx_typing,
+    parse_virulencefinder_vir_pred,
+)
+from prp.parse.qc import QC
+from prp.testing.synth import write_basecov, write_vcf
+
+from .conftest import (
+    scale_cgmlst,
+    scale_resfinder,
+    scale_table,
+    scale_tbprofiler,
+    scale_vcf,
+)
+
+pytestmark = pytest.mark.prp_benchmark
+
+THRESHOLDS = ["1", "10", "30", "100", "250", "500", "1000"]
+
+
+@pytest.mark.parametrize("factor", [1, 10])
+def test_parse_cgmlst_results(prp_benchmark, ecoli_chewbbaca_path, tmp_path, factor):
+    """Benchmark parsing chewBBACA results."""
+    path = scale_cgmlst(ecoli_chewbbaca_path, tmp_path.joinpath("cgmlst.tsv"), factor)
+    prp_benchmark(parse_cgmlst_results, path)
+
+
+@pytest.mark.parametrize("factor", [1, 10, 100])
+def test_parse_amrfinder_amr_pred(
+    prp_benchmark, ecoli_amrfinder_path, tmp_path, factor
+):
+    """Benchmark parsing amrfinder resistance results."""
+    path = scale_table(ecoli_amrfinder_path, tmp_path.joinpath("amr.tsv"), factor)
+    prp_benchmark(parse_amrfinder_amr_pred, path, ElementType.AMR)
+
+
+@pytest.mark.parametrize("factor", [1, 10, 100])
+def test_parse_amrfinder_vir_pred(
+    prp_benchmark, ecoli_amrfinder_path, tmp_path, factor
+):
+    """Benchmark parsing amrfinder virulence results."""
+    path = scale_table(ecoli_amrfinder_path, tmp_path.joinpath("amr.tsv"), factor)
+    prp_benchmark(parse_amrfinder_vir_pred, path)
+
+
+@pytest.mark.parametrize("factor", [1, 10, 100])
+def test_parse_resfinder_amr_pred(prp_benchmark, ecoli_resfinder_path, factor):
+    """Benchmark parsing resfinder results."""
+    pred = scale_resfinder(ecoli_resfinder_path, factor)
+    prp_benchmark(parse_resfinder_amr_pred, pred, ElementType.AMR)
+
+
+@pytest.mark.parametrize("factor", [1, 10, 100])
+def test_parse_tbprofiler_amr_pred(
+    prp_benchmark, mtuberculosis_tbprofiler_path, factor
+):
+    """Benchmark parsing tbprofiler resistance results."""
+    pred = scale_tbprofiler(mtuberculosis_tbprofiler_path, factor)
+    prp_benchmark(parse_tbprofiler_amr_pred, pred)
+
+
+def test_parse_tbprofiler_lineage_results(prp_benchmark, mtuberculosis_tbprofiler_path):
+    """Benchmark parsing tbprofiler lineage results."""
+    pred = scale_tbprofiler(mtuberculosis_tbprofiler_path, 1)
+    prp_benchmark(parse_tbprofiler_lineage_results, pred)
+
+
+@pytest.mark.parametrize("factor", [1, 100, 1000])
+def test_load_variants(prp_benchmark, mtuberculosis_snv_vcf_path, tmp_path, factor):
+    """Benchmark loading variants from a VCF file."""
+    path = scale_vcf(mtuberculosis_snv_vcf_path, tmp_path.joinpath("snv.vcf"), factor)
+    prp_benchmark(load_variants, path)
+
+
+def test_load_variants_100k(prp_benchmark, tmp_path):
+    """Benchmark loading a VCF file with 100000 variants."""
+    path = write_vcf(str(tmp_path.joinpath("snv.vcf")), n_records=100_000)
+    prp_benchmark(load_variants, path, rounds=1)
+
+
+@pytest.mark.parametrize("factor", [1, 10, 100])
+def test_parse_kraken_result(prp_benchmark, ecoli_bracken_path, tmp_path, factor):
+    """Benchmark parsing bracken results."""
+    path = scale_table(ecoli_bracken_path, tmp_path.joinpath("bracken.tsv"), factor)
+    prp_benchmark(parse_kraken_result, path)
+
+
+@pytest.mark.parametrize("n_bases", [10_000, 100_000, 1_000_000])
+def test_parse_basecov_bed(prp_benchmark, tmp_path, n_bases):
+    """Benchmark parsing sambamba base coverage files."""
+    path = write_basecov(str(tmp_path.joinpath("basecov.bed")), n_bases)
+    qc = QC.__new__(QC)
+    qc.results = {}
+    prp_benchmark(qc.parse_basecov_bed, path, THRESHOLDS, rounds=1)
+
+
+def test_parse_small_results(
+    prp_benchmark,
+    ecoli_quast_path,
+    ecoli_bwa_path,
+    ecoli_mlst_path,
+    ecoli_virulencefinder_stx_pred_stx_path,
+    ecoli_serotypefinder_path,
+    ecoli_shigapass_path,
+    streptococcus_emmtyper_path,
+):
+    """Benchmark parsers of results that do not grow with the genome size."""
+
+    def _parse_all():
+        parse_quast_results(ecoli_quast_path)
+        parse_postalignqc_results(ecoli_bwa_path)
+        parse_mlst_results(ecoli_mlst_path)
+        parse_virulencefinder_vir_pred(ecoli_virulencefinder_stx_pred_stx_path)
+        parse_virulencefinder_stx_typing(ecoli_virulencefinder_stx_pred_stx_path)
+        parse_serotypefinder_oh_typing(ecoli_serotypefinder_path)
+        parse_shigapass_pred(ecoli_shigapass_path)
+        parse_emmtyper_pred(streptococcus_emmtyper_path)
+
+    prp_benchmark(_parse_all)
+
+
+@pytest.mark.parametrize("factor", [1, 10])
+def test_create_bonsai_input(
+    prp_benchmark,
+    tmp_path,
+    factor,
+    ecoli_analysis_meta_path,
+    ecoli_quast_path,
+    ecoli_bwa_path,
+    ecoli_amrfinder_path,
+    ecoli_resfinder_path,
+    ecoli_resfinder_meta_path,
+    ecoli_virulencefinder_stx_pred_stx_path,
+    ecoli_mlst_path,
+    ecoli_chewbbaca_path,
+    ecoli_bracken_path,
+    mtuberculosis_snv_vcf_path,
+):
+    """Benchmark creating a result file end-to-end."""
+    output = tmp_path.joinpath("result.json")
+    args = [
+        "-i",
+        "test_ecoli_1",
+        "--run-metadata",
+        ecoli_analysis_meta_path,
+        "--quality",
+        ecoli_bwa_path,
+        "--quast",
+        ecoli_quast_path,
+        "--amrfinder",
+        scale_table(ecoli_amrfinder_path, tmp_path.joinpath("amr.tsv"), factor),
+        "--resfinder",
+        ecoli_resfinder_path,
+        "--virulencefinder",
+        ecoli_virulencefinder_stx_pred_stx_path,
+        "--process-metadata",
+        ecoli_resfinder_meta_path,
+        "--mlst",
+        ecoli_mlst_path,
+        "--cgmlst",
+        scale_cgmlst(ecoli_chewbbaca_path, tmp_path.joinpath("cgmlst.tsv"), factor),
+        "--kraken",
+        scale_table(ecoli_bracken_path, tmp_path.joinpath("bracken.tsv"), factor),
+        "--vcf",
+        scale_vcf(
+            mtuberculosis_snv_vcf_path, tmp_path.joinpath("snv.vcf"), factor * 100
+        ),
+        "--output",
+        str(output),
+    ]
+    runner = CliRunner()
+
+    def _create_bonsai_input():
+        result = runner.invoke(create_bonsai_input, args)
+        assert result.exit_code == 0
+
+    prp_benchmark(_create_bonsai_input)
+    with open(output, encoding="utf-8") as inpt:
+        assert json.load(inpt)["sample_id"] == "test_ecoli_1"
@@ -0,0 +1,31 @@
+"""Benchmark the startup time of the PRP cli."""
+
+import subprocess
+import sys
+
+import pytest
+
+pytestmark = pytest.mark.prp_benchmark
+
+
+def _run_cli(*args: str) -> None:
+    """Run the cli in a new interpreter."""
+    subprocess.run(
+        [sys.executable, "-c", "from prp.cli import cli; cli()", *args],
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.mark.parametrize("command", ["--help", "print-schema"])
+def test_cli_startup(prp_benchmark, command):
+    """Benchmark commands that do not parse any results."""
+    prp_benchmark(_run_cli, command)
+
+
+def test_validate_startup(prp_benchmark, simple_pipeline_result, tmp_path):
+    """Benchmark validating a result."""
+    path = tmp_path.joinpath("result.json")
+    path.write_text(simple_pipeline_result.model_dump_json())
+
+    prp_benchmark(_run_cli, "validate", "--output", str(path))
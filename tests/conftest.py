@@ -1,5 +1,7 @@
 """Test fixtures."""
 
+import pytest
+
 from .fixtures import *
 from prp.models import PipelineResult
 from prp.models.metadata import PipelineInfo, SequencingInfo
@@ -39,3 +41,35 @@ def simple_pipeline_result():
         typing_result=[],
         element_type_result=[],
     )
+
+
+def pytest_addoption(parser):
+    """Add options for running benchmarks."""
+    group = parser.getgroup("prp-benchmark")
+    group.addoption(
+        "--prp-benchmark", action="store_true", help="Run benchmarks of the parsers."
+    )
+    group.addoption(
+        "--prp-benchmark-save",
+        action="store_true",
+        help="Store the benchmark timings as the new baseline.",
+    )
+    group.addoption(
+        "--prp-benchmark-tolerance",
+        type=float,
+        default=3.0,
+        help="Fail benchmarks slower than the baseline times this factor.",
+    )
+    group.addoption(
+        "--prp-benchmark-json", help="Write the benchmark timings to a json file."
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip benchmarks unless requested."""
+    if config.getoption("--prp-benchmark") or config.getoption("--prp-benchmark-save"):
+        return
+    skip_benchmark = pytest.mark.skip(reason="use --prp-benchmark to run benchmarks")
+    for item in items:
+        if "prp_benchmark" in item.keywords:
+            item.add_marker(skip_benchmark)
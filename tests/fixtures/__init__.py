@@ -1,5 +1,8 @@
 """Fixtures"""
 
+import os
+import shutil
+
 from .ecoli import *
 from .mtuberculosis import *
 from .saureus import *
@@ -9,4 +12,54 @@ from .streptococcus import *
 @pytest.fixture()
 def mlst_result_path_no_call(data_path):
     """Get path for mlst file where alleles was not called."""
-    return str(data_path.joinpath("mlst.nocall.json"))
\ No newline at end of file
+    return str(data_path.joinpath("mlst.nocall.json"))
+
+@pytest.fixture(scope="session")
+def synthetic_reference_path(tmp_path_factory):
+    """Get path to a generated reference genome."""
+    from prp.testing.synth import write_reference
+
+    path = tmp_path_factory.mktemp("reference").joinpath("reference.fasta")
+    return write_reference(str(path), length=20_000)
+
+
+@pytest.fixture(scope="session")
+def synthetic_bam_path(tmp_path_factory, synthetic_reference_path):
+    """Get path to a generated bam file with paired reads."""
+    from prp.testing.synth import write_bam
+
+    path = tmp_path_factory.mktemp("bam").joinpath("sample.bam")
+    return write_bam(str(path), n_pairs=2000, reference=synthetic_reference_path)
+
+
+@pytest.fixture(name="cram_path")
+def fixture_cram_path(synthetic_bam_path, synthetic_reference_path, tmp_path):
+    """Write a cram file with a reference that is removed afterwards."""
+    import pysam
+
+    reference = str(tmp_path / "removed.fasta")
+    shutil.copy(synthetic_reference_path, reference)
+    path = str(tmp_path / "sample.cram")
+    pysam.view(
+        "-C", "-T", reference, "-o", path, synthetic_bam_path, catch_stdout=False
+    )
+    os.remove(reference)
+    return path
+
+
+@pytest.fixture(name="ref_cache_dir")
+def fixture_ref_cache_dir(tmp_path, monkeypatch):
+    """Get a reference cache directory and restore the htslib settings."""
+    monkeypatch.setenv("REF_PATH", "")
+    monkeypatch.setenv("REF_CACHE", "")
+    return str(tmp_path / "ref_cache")
+
+
+@pytest.fixture(name="mismatched_reference_path")
+def fixture_mismatched_reference_path(synthetic_reference_path, tmp_path):
+    """Write a reference with the same sequence names but other sequences."""
+    path = tmp_path / "other.fasta"
+    with open(synthetic_reference_path, encoding="utf-8") as inpt:
+        header, *lines = inpt.read().splitlines()
+    path.write_text("\n".join([header, *lines[::-1]]), encoding="utf-8")
+    return str(path)
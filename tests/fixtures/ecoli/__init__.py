@@ -109,3 +109,46 @@ def ecoli_cdm_input(data_path):
     path = data_path.joinpath("ecoli", "cdm_input.json")
     with open(path, "rb") as inpt:
         return json.load(inpt)
+
+
+@pytest.fixture()
+def ecoli_jasen_outdir(data_path, tmp_path):
+    """Create a JASEN output and install directory with one ecoli sample.
+
+    Returns paths to the species output directory and the JASEN directory.
+    """
+    sample_id = "ecoli_test_1"
+    fixture_dir = data_path.joinpath("ecoli")
+    input_dir = tmp_path.joinpath("outdir", "ecoli")
+    files = {
+        "analysis_meta.json": f"analysis_metadata/{sample_id}_analysis_meta.json",
+        "bracken.out": f"kraken/{sample_id}_bracken.out",
+        "bwa.qc": f"postalignqc/{sample_id}_bwa.qc",
+        "quast.tsv": f"quast/{sample_id}_quast.tsv",
+        "amrfinder.out": f"amrfinderplus/{sample_id}_amrfinder.out",
+        "chewbbaca.out": f"chewbbaca/{sample_id}_chewbbaca.out",
+        "mlst.json": f"mlst/{sample_id}_mlst.json",
+        "resfinder.json": f"resfinder/{sample_id}_resfinder.json",
+        "resfinder_meta.json": f"resfinder/{sample_id}_resfinder_meta.json",
+        "serotypefinder.json": f"serotypefinder/{sample_id}_serotypefinder.json",
+        "serotypefinder_meta.json": f"serotypefinder/{sample_id}_serotypefinder_meta.json",
+        "virulencefinder.json": f"virulencefinder/{sample_id}_virulencefinder.json",
+        "virulencefinder_meta.json": f"virulencefinder/{sample_id}_virulencefinder_meta.json",
+    }
+    for fixture_name, dest in files.items():
+        dest_path = input_dir.joinpath(dest)
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        dest_path.write_bytes(fixture_dir.joinpath(fixture_name).read_bytes())
+    input_dir.joinpath("analysis_result").mkdir()
+    input_dir.joinpath("analysis_result", f"{sample_id}_result.json").write_text("{}")
+
+    # reference genome in the JASEN install directory
+    jasen_dir = tmp_path.joinpath("jasen")
+    genome_dir = jasen_dir.joinpath("assets", "genomes", "escherichia_coli")
+    genome_dir.mkdir(parents=True)
+    genome_dir.joinpath("GCF_000005845.2.fasta").write_text(
+        ">NC_000913.3 Escherichia coli str. K-12 substr. MG1655, complete genome\n"
+        "AGCTTTTCATTCTGACTGCAACGGGCAATATGTCTCTGTGTGGATTAAAAAAAGAGTGTCTGATAGCAGC\n"
+    )
+    genome_dir.joinpath("GCF_000005845.2.gff").write_text("##gff-version 3\n")
+    return str(input_dir), str(jasen_dir)
@@ -0,0 +1,86 @@
+"""Test estimating alignment metrics from sampled regions."""
+
+import pysam
+import pytest
+
+from prp.parse.approximate_qc import collect_approximate_stats, get_sample_blocks
+from prp.parse.coverage import get_regions
+from prp.parse.qc import DEPTH_THRESHOLDS, QC
+
+
+def test_get_sample_blocks():
+    """Test splitting regions into blocks and picking a fraction of them."""
+    regions = [("c1", 0, 1050), ("c2", 100, 300)]
+
+    blocks, n_blocks = get_sample_blocks(regions, 0.5, block_size=100)
+
+    assert n_blocks == 13
+    assert len(blocks) == 7
+    assert blocks == sorted(blocks)
+    assert all(end - start <= 100 for _, start, end in blocks)
+    # at least two blocks are picked
+    assert len(get_sample_blocks(regions, 0.01, block_size=100)[0]) == 2
+
+
+@pytest.fixture(name="exact_qc", scope="module")
+def fixture_exact_qc(synthetic_bam_path, synthetic_reference_path):
+    """Get the exact QC metrics of the synthetic bam file."""
+    return QC("sample_1", synthetic_bam_path, synthetic_reference_path, 1).run()
+
+
+@pytest.mark.parametrize("fraction", [0.3, 0.5, 1.0])
+def test_collect_approximate_stats(synthetic_bam_path, exact_qc, fraction):
+    """Test that the exact metrics are within the confidence intervals."""
+    with pysam.AlignmentFile(synthetic_bam_path) as bam:
+        regions = get_regions(bam)
+
+    stats = collect_approximate_stats(
+        synthetic_bam_path, regions, fraction, DEPTH_THRESHOLDS, block_size=500
+    )
+
+    intervals = stats["confidence_intervals"]
+    for name in ("mean_cov", "dup_pct", "ins_size"):
+        low, high = intervals[name]
+        assert low <= stats[name] <= high
+        assert low <= exact_qc[name] <= high
+    low, high = intervals["pct_above_x.30"]
+    assert low <= exact_qc["pct_above_x"]["30"] <= high
+    if fraction == 1.0:
+        # every block is sampled
+        assert stats["mean_cov"] == pytest.approx(exact_qc["mean_cov"])
+        assert stats["pct_above_x"] == pytest.approx(exact_qc["pct_above_x"])
+        # outliers are trimmed the same way as for the whole file
+        assert stats["ins_size"] == pytest.approx(exact_qc["ins_size"])
+
+
+def test_run_approximate(synthetic_bam_path, synthetic_reference_path, exact_qc):
+    """Test that approximate results have exact read counts from the index."""
+    qc = QC(
+        "sample_1", synthetic_bam_path, synthetic_reference_path, 1, approximate=0.5
+    )
+
+    results = qc.run()
+
+    assert results["n_mapped_reads_by_contig"] == exact_qc["n_mapped_reads_by_contig"]
+    # the reference is split into two blocks, which are both sampled
+    assert results["sampled_fraction"] == 1.0
+    assert set(results["confidence_intervals"]) >= {"mean_cov", "dup_pct", "ins_size"}
+
+
+def test_run_approximate_cram(cram_path, synthetic_reference_path, ref_cache_dir):
+    """Test estimating QC metrics of a cram file without an index."""
+    qc = QC(
+        "sample_1",
+        cram_path,
+        synthetic_reference_path,
+        1,
+        approximate=0.5,
+        ref_cache_dir=ref_cache_dir,
+    )
+
+    results = qc.run()
+
+    assert results["sampled_fraction"] == 1.0
+    assert set(results["confidence_intervals"]) >= {"mean_cov", "dup_pct", "ins_size"}
+    # counting the reads of a cram file requires decoding all of them
+    assert "n_total_reads" not in results
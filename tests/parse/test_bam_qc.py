@@ -0,0 +1,157 @@
+"""Test collecting alignment metrics in a single pass."""
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pysam
+import pytest
+
+from prp.parse.bam_qc import (
+    MappedReadCounter,
+    MappingQualityHistogram,
+    collect_alignment_stats,
+    collect_alignment_stats_parallel,
+    get_index_read_counts,
+)
+from prp.parse.coverage import DEPTH_EXCLUDE_FLAGS, DepthAccumulator, get_regions
+from prp.parse.flagstat import FlagstatCounter, get_flagstat
+from prp.parse.insert_size import InsertSizeCounter, get_insert_size_metrics
+from prp.parse.qc import get_qc_accumulators
+
+
+def _get_region_depth(bam_path: str, regions: list[tuple]) -> list[int]:
+    """Count the reads covering each position of the regions one read at a time."""
+    with pysam.AlignmentFile(bam_path) as bam:
+        depth = np.zeros(bam.lengths[0], dtype=int)
+        for read in bam:
+            if read.flag & DEPTH_EXCLUDE_FLAGS or read.mapping_quality == 0:
+                continue
+            depth[read.reference_start : read.reference_end] += 1
+    region_depth = [depth[start:end] for _, start, end in regions]
+    return np.bincount(np.concatenate(region_depth)).tolist()
+
+
+@pytest.mark.parametrize("window_size", [137, 1000, 1_000_000])
+@pytest.mark.parametrize("with_bed", [False, True])
+def test_collect_alignment_stats(synthetic_bam_path, tmp_path, window_size, with_bed):
+    """Test that a single pass gives the same metrics as separate passes."""
+    bed = None
+    if with_bed:
+        bed = str(tmp_path / "regions.bed")
+        with open(bed, "w", encoding="utf-8") as outp:
+            outp.write("NC_000962.3\t100\t600\nNC_000962.3\t5000\t5200\n")
+    with pysam.AlignmentFile(synthetic_bam_path) as bam:
+        regions = get_regions(bam, bed)
+    accumulators = {
+        "flagstat": FlagstatCounter(),
+        "insert_size": InsertSizeCounter(stop_after=1000),
+        "depth": DepthAccumulator(regions, window_size=window_size),
+    }
+
+    stats = collect_alignment_stats(synthetic_bam_path, accumulators, threads=2)
+
+    assert stats["flagstat"] == get_flagstat(synthetic_bam_path)
+    assert stats["insert_size"] == get_insert_size_metrics(
+        synthetic_bam_path, stop_after=1000
+    )
+    assert stats["depth"].tolist() == _get_region_depth(synthetic_bam_path, regions)
+
+
+def test_mapping_quality_histogram(synthetic_bam_path):
+    """Test counting the mapping quality of primary alignments."""
+    with pysam.AlignmentFile(synthetic_bam_path) as bam:
+        expected = Counter(read.mapping_quality for read in bam if not read.is_unmapped)
+
+    stats = collect_alignment_stats(
+        synthetic_bam_path, {"mapq": MappingQualityHistogram()}
+    )
+
+    assert stats["mapq"] == dict(expected)
+
+
+def test_depth_accumulator_unsorted(synthetic_bam_path):
+    """Test that unsorted alignments are rejected."""
+    with pysam.AlignmentFile(synthetic_bam_path) as bam:
+        depth = DepthAccumulator(get_regions(bam), window_size=100)
+        reads = [read for read in bam if read.mapping_quality > 0][:100]
+    depth.add(reads[-1])
+
+    with pytest.raises(ValueError):
+        depth.add(reads[0])
+
+
+@pytest.fixture(scope="module")
+def multi_contig_bam_path(synthetic_bam_path, tmp_path_factory):
+    """Write a bam with reads on two of three contigs and unplaced reads."""
+    tmp_dir = tmp_path_factory.mktemp("multi_contig")
+    with pysam.AlignmentFile(synthetic_bam_path) as bam:
+        length = bam.lengths[0]
+        header = {
+            "HD": {"VN": "1.6", "SO": "coordinate"},
+            "SQ": [{"SN": name, "LN": length} for name in ("c1", "c2", "c3")],
+        }
+        reads = list(bam)
+    unsorted_path = str(tmp_dir / "unsorted.bam")
+    with pysam.AlignmentFile(unsorted_path, "wb", header=header) as outp:
+        for contig in ("c1", "c2"):
+            for read in reads:
+                values = {**read.to_dict(), "ref_name": contig, "next_ref_name": "="}
+                outp.write(pysam.AlignedSegment.from_dict(values, outp.header))
+        for read in reads[:50]:
+            values = {
+                **read.to_dict(),
+                "flag": "4",
+                "ref_name": "*",
+                "ref_pos": "0",
+                "next_ref_name": "*",
+                "next_ref_pos": "0",
+                "cigar": "*",
+            }
+            outp.write(pysam.AlignedSegment.from_dict(values, outp.header))
+    path = str(tmp_dir / "multi_contig.bam")
+    pysam.sort("-o", path, unsorted_path)
+    pysam.index(path)
+    return path
+
+
+@pytest.mark.parametrize("n_shards", [1, 5, 16])
+@pytest.mark.parametrize("with_bed", [False, True])
+def test_collect_alignment_stats_parallel(
+    multi_contig_bam_path, tmp_path, n_shards, with_bed
+):
+    """Test that merging the shards gives the same metrics as a single pass."""
+    bed = None
+    if with_bed:
+        bed = str(tmp_path / "regions.bed")
+        with open(bed, "w", encoding="utf-8") as outp:
+            outp.write("c1\t100\t15000\nc2\t5000\t5200\nc3\t10\t20\nc4\t0\t50\n")
+    with pysam.AlignmentFile(multi_contig_bam_path) as bam:
+        regions = get_regions(bam, bed)
+    expected = collect_alignment_stats(
+        multi_contig_bam_path, get_qc_accumulators(regions)
+    )
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        stats = collect_alignment_stats_parallel(
+            multi_contig_bam_path, get_qc_accumulators, regions, executor, n_shards
+        )
+
+    assert stats["flagstat"] == expected["flagstat"]
+    assert stats["mapq"] == expected["mapq"]
+    assert stats["mapped_by_contig"] == expected["mapped_by_contig"]
+    assert stats["depth"].tolist() == expected["depth"].tolist()
+
+
+def test_get_index_read_counts(multi_contig_bam_path):
+    """Test that the index gives the same read counts as reading the file."""
+    stats = collect_alignment_stats(
+        multi_contig_bam_path, {"mapped": MappedReadCounter()}
+    )
+
+    with pysam.AlignmentFile(multi_contig_bam_path) as bam:
+        mapped, n_unmapped = get_index_read_counts(bam)
+        n_reads = sum(1 for _ in bam.fetch(until_eof=True))
+
+    assert mapped == {"c1": stats["mapped"]["c1"], "c2": stats["mapped"]["c2"], "c3": 0}
+    assert sum(mapped.values()) + n_unmapped == n_reads
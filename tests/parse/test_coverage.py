@@ -0,0 +1,111 @@
+"""Test calculating depth statistics."""
+
+import numpy as np
+import pandas as pd
+import pysam
+import pytest
+
+from prp.parse.coverage import (
+    DepthAccumulator,
+    get_basecov_histogram,
+    get_depth_stats,
+    get_regions,
+)
+from prp.parse.qc import QC
+from prp.testing.synth import write_basecov
+
+THRESHOLDS = ["1", "10", "30", "100", "250", "500", "1000"]
+
+
+def _get_position_depth(bam_path: str) -> np.ndarray:
+    """Count the reads covering each position one read at a time."""
+    with pysam.AlignmentFile(bam_path) as bam:
+        depth = np.zeros(bam.lengths[0], dtype=int)
+        for read in bam:
+            if read.is_unmapped or read.is_duplicate or read.is_qcfail:
+                continue
+            if read.mapping_quality > 0:
+                depth[read.reference_start : read.reference_end] += 1
+    return depth
+
+
+def _get_depth_histogram(bam_path: str, bed: str | None = None, **kwargs):
+    """Build a depth histogram by adding every read to an accumulator."""
+    with pysam.AlignmentFile(bam_path) as bam:
+        accumulator = DepthAccumulator(get_regions(bam, bed), **kwargs)
+        for read in bam:
+            accumulator.add(read)
+    return accumulator.result()
+
+
+@pytest.mark.parametrize("window_size", [137, 1000, 1_000_000])
+def test_depth_accumulator(synthetic_bam_path, window_size):
+    """Test that the depth of every position is counted."""
+    depth = _get_position_depth(synthetic_bam_path)
+
+    histogram = _get_depth_histogram(synthetic_bam_path, window_size=window_size)
+
+    assert histogram.tolist() == np.bincount(depth).tolist()
+
+
+@pytest.mark.parametrize("window_size", [137, 1_000_000])
+def test_depth_accumulator_regions(synthetic_bam_path, tmp_path, window_size):
+    """Test that only positions in the bed regions are counted."""
+    depth = _get_position_depth(synthetic_bam_path)
+    bed_path = tmp_path / "regions.bed"
+    bed_path.write_text("NC_000962.3\t100\t600\nNC_000962.3\t5000\t5200\n")
+
+    histogram = _get_depth_histogram(
+        synthetic_bam_path, bed=str(bed_path), window_size=window_size
+    )
+
+    expected = np.bincount(np.concatenate([depth[100:600], depth[5000:5200]]))
+    assert histogram.tolist() == expected.tolist()
+
+
+def _get_pandas_depth_stats(basecov_path: str, thresholds: list[str]) -> dict:
+    """Calculate depth stats by loading the whole base coverage file."""
+    df = pd.read_csv(basecov_path, sep="\t", comment="#", header=0)
+    tot_bases = len(df)
+    pct_above = {
+        min_val: 100 * (len(df[df["COV"] >= int(min_val)]) / tot_bases)
+        for min_val in thresholds
+    }
+    quartile1 = df["COV"].quantile(0.25)
+    median_cov = df["COV"].median()
+    quartile3 = df["COV"].quantile(0.75)
+    return {
+        "pct_above_x": pct_above,
+        "mean_cov": df["COV"].mean(),
+        "coverage_uniformity": (quartile3 - quartile1) / median_cov
+        if quartile1 and quartile3 and median_cov
+        else None,
+        "quartile1": quartile1,
+        "median_cov": median_cov,
+        "quartile3": quartile3,
+    }
+
+
+@pytest.mark.parametrize("mean_depth", [0, 2, 60, 700])
+@pytest.mark.parametrize("chunk_size", [100, 1_000_000])
+def test_parse_basecov_bed(tmp_path, mean_depth, chunk_size):
+    """Test that the stats are identical to those calculated with pandas."""
+    basecov_path = write_basecov(
+        str(tmp_path / "basecov.bed"), n_bases=5001, mean_depth=mean_depth
+    )
+    expected = _get_pandas_depth_stats(basecov_path, THRESHOLDS)
+
+    histogram = get_basecov_histogram(basecov_path, chunk_size=chunk_size)
+    qc = QC.__new__(QC)
+    qc.results = {}
+    qc.parse_basecov_bed(basecov_path, THRESHOLDS)
+
+    assert get_depth_stats(histogram, THRESHOLDS) == expected
+    assert qc.results == expected
+    # the values are identical, not only equal
+    assert repr(qc.results) == repr(
+        {
+            key: val if isinstance(val, (dict, type(None))) else float(val)
+            for key, val in expected.items()
+        }
+    )
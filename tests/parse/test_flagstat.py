@@ -0,0 +1,82 @@
+"""Test counting reads by SAM flag."""
+
+import random
+import re
+
+import pysam
+import pytest
+
+from prp.models.qc import FlagstatResult
+from prp.parse.flagstat import get_flagstat
+
+# flagstat categories in the order reported by samtools
+SAMTOOLS_CATEGORIES = [
+    "total",
+    "primary",
+    "secondary",
+    "supplementary",
+    "duplicates",
+    "primary_duplicates",
+    "mapped",
+    "primary_mapped",
+    "paired",
+    "read1",
+    "read2",
+    "properly_paired",
+    "both_mapped",
+    "singletons",
+    "mate_diff_chr",
+    "mate_diff_chr_mapq5",
+]
+
+
+def _parse_samtools_flagstat(bam_path: str) -> dict:
+    """Get the passed and failed counts of each category from samtools."""
+    lines = pysam.flagstat(bam_path).splitlines()
+    counts = {}
+    for name, line in zip(SAMTOOLS_CATEGORIES, lines):
+        passed, failed = re.match(r"(\d+) \+ (\d+)", line).groups()
+        counts[name] = {"passed": int(passed), "failed": int(failed)}
+    return counts
+
+
+@pytest.fixture(scope="module")
+def random_flag_bam_path(tmp_path_factory):
+    """Write a bam file with reads with random flags on two contigs."""
+    rng = random.Random(1)
+    header = {
+        "HD": {"VN": "1.6", "SO": "unsorted"},
+        "SQ": [{"SN": "chr1", "LN": 10_000}, {"SN": "chr2", "LN": 10_000}],
+    }
+    path = str(tmp_path_factory.mktemp("flagstat").joinpath("flags.bam"))
+    with pysam.AlignmentFile(path, "wb", header=header) as bam:
+        for idx in range(5000):
+            read = pysam.AlignedSegment(bam.header)
+            read.query_name = f"read{idx}"
+            read.flag = rng.getrandbits(12)
+            read.reference_id = rng.randint(0, 1)
+            read.next_reference_id = rng.randint(0, 1)
+            read.reference_start = rng.randint(0, 9000)
+            read.next_reference_start = rng.randint(0, 9000)
+            read.mapping_quality = rng.choice([0, 3, 5, 60])
+            read.query_sequence = "A" * 50
+            read.cigarstring = "50M"
+            bam.write(read)
+    return path
+
+
+@pytest.mark.parametrize("threads", [1, 2])
+def test_get_flagstat(random_flag_bam_path, threads):
+    """Test that all categories are counted the same as samtools flagstat."""
+    result = get_flagstat(random_flag_bam_path, threads=threads)
+
+    assert isinstance(result, FlagstatResult)
+    assert result.model_dump() == _parse_samtools_flagstat(random_flag_bam_path)
+
+
+def test_get_flagstat_paired_reads(synthetic_bam_path):
+    """Test counting the reads of a bam with paired reads."""
+    result = get_flagstat(synthetic_bam_path)
+
+    assert result.model_dump() == _parse_samtools_flagstat(synthetic_bam_path)
+    assert result.paired.passed + result.paired.failed == 4000
@@ -0,0 +1,107 @@
+"""Test calculating hybrid capture metrics."""
+
+import numpy as np
+import pysam
+import pytest
+
+from prp.parse.bam_qc import collect_alignment_stats
+from prp.parse.hsmetrics import (
+    HS_EXCLUDE_FLAGS,
+    MIN_MAPQ,
+    NEAR_DISTANCE,
+    HsBaseCounter,
+    get_hs_metrics,
+    get_target_depth_accumulator,
+    load_hs_panel,
+)
+
+CONTIG = "NC_000962.3"
+
+
+@pytest.fixture(name="panel_beds")
+def fixture_panel_beds(tmp_path):
+    """Write bed files of baits and targets."""
+    baits = tmp_path / "baits.bed"
+    baits.write_text(
+        f"{CONTIG}\t1000\t3000\n{CONTIG}\t9000\t9500\n{CONTIG}\t15000\t16000\n",
+        encoding="utf-8",
+    )
+    targets = tmp_path / "targets.bed"
+    targets.write_text(
+        f"{CONTIG}\t1100\t2900\n{CONTIG}\t9100\t9400\n{CONTIG}\t15100\t15900\n",
+        encoding="utf-8",
+    )
+    return str(baits), str(targets)
+
+
+@pytest.fixture(name="mapq0_bam_path")
+def fixture_mapq0_bam_path(synthetic_bam_path, tmp_path):
+    """Write the synthetic bam file with reads on a bait with mapping quality 0."""
+    path = str(tmp_path / "mapq0.bam")
+    with pysam.AlignmentFile(synthetic_bam_path) as bam, pysam.AlignmentFile(
+        path, "wb", template=bam
+    ) as outp:
+        for read in bam:
+            if 1000 <= read.reference_start < 1500:
+                read.mapping_quality = 0
+            outp.write(read)
+    return path
+
+
+def test_get_hs_metrics(mapq0_bam_path, panel_beds):
+    """Test the hybrid capture metrics against counts of every position."""
+    baits_bed, targets_bed = panel_beds
+    panel = load_hs_panel(baits_bed, targets_bed)
+    with pysam.AlignmentFile(mapq0_bam_path) as bam:
+        genome_size = sum(bam.lengths)
+        reads = [read for read in bam if not read.flag & HS_EXCLUDE_FLAGS]
+    # reads with mapping quality 0 are not counted, same as Picard
+    assert any(read.mapping_quality == 0 for read in reads)
+    reads = [read for read in reads if read.mapping_quality > 0]
+    baits = np.zeros(genome_size, dtype=bool)
+    near = np.zeros(genome_size, dtype=bool)
+    targets = np.zeros(genome_size, dtype=bool)
+    for _, start, end in panel.baits.regions():
+        baits[start:end] = True
+        near[max(start - NEAR_DISTANCE, 0) : end + NEAR_DISTANCE] = True
+    for _, start, end in panel.targets.regions():
+        targets[start:end] = True
+    expected = {"aligned": 0, "on_bait": 0, "near_bait": 0, "off_bait": 0}
+    depth = np.zeros(genome_size, dtype=int)
+    for read in reads:
+        aligned = np.zeros(genome_size, dtype=bool)
+        for start, end in read.get_blocks():
+            aligned[start:end] = True
+        expected["aligned"] += aligned.sum()
+        if near[read.reference_start : read.reference_end].any():
+            expected["on_bait"] += (aligned & baits).sum()
+            expected["near_bait"] += (aligned & ~baits).sum()
+        else:
+            expected["off_bait"] += aligned.sum()
+        if read.mapping_quality >= MIN_MAPQ:
+            depth += aligned
+    target_depth = depth[targets]
+
+    stats = collect_alignment_stats(
+        mapq0_bam_path,
+        {
+            "bases": HsBaseCounter(panel),
+            "depth": get_target_depth_accumulator(panel.targets.regions()),
+        },
+    )
+    result = get_hs_metrics(stats["bases"], stats["depth"], panel, genome_size)
+
+    assert result.pf_uq_bases_aligned == expected["aligned"]
+    assert result.on_bait_bases == expected["on_bait"]
+    assert result.near_bait_bases == expected["near_bait"]
+    assert result.off_bait_bases == expected["off_bait"]
+    assert result.bait_territory == 3500
+    assert result.target_territory == 2900
+    assert result.pct_selected_bases == pytest.approx(
+        (expected["on_bait"] + expected["near_bait"]) / expected["aligned"]
+    )
+    assert result.fold_enrichment == pytest.approx(
+        (expected["on_bait"] / expected["aligned"]) / (3500 / genome_size)
+    )
+    assert result.mean_target_coverage == pytest.approx(target_depth.mean())
+    assert result.median_target_coverage == pytest.approx(np.median(target_depth))
@@ -0,0 +1,43 @@
+"""Test calculating insert size metrics."""
+
+import numpy as np
+import pysam
+import pytest
+
+from prp.parse.insert_size import get_insert_size_metrics
+
+
+def _get_insert_sizes(bam_path: str, stop_after: int | None = None) -> np.ndarray:
+    """Get the insert sizes of the FR pairs, counted by the second read."""
+    sizes = []
+    with pysam.AlignmentFile(bam_path) as bam:
+        for idx, read in enumerate(bam.fetch(until_eof=True)):
+            if stop_after and idx >= stop_after:
+                break
+            if (
+                read.is_read2
+                and not (read.is_unmapped or read.mate_is_unmapped)
+                and not (read.is_duplicate or read.is_secondary)
+                and read.is_reverse != read.mate_is_reverse
+                and read.template_length != 0
+            ):
+                sizes.append(abs(read.template_length))
+    return np.array(sizes)
+
+
+@pytest.mark.parametrize("stop_after", [None, 500])
+def test_get_insert_size_metrics(synthetic_bam_path, stop_after):
+    """Test that the metrics are calculated like Picard."""
+    sizes = _get_insert_sizes(synthetic_bam_path, stop_after)
+    median = np.median(sizes)
+    mad = np.median(np.abs(sizes - median))
+    trimmed = sizes[sizes <= int(median + 10 * mad)]
+
+    result = get_insert_size_metrics(synthetic_bam_path, stop_after=stop_after)
+
+    assert result.pair_orientation == "FR"
+    assert result.read_pairs == len(sizes)
+    assert result.median_insert_size == median
+    assert result.median_absolute_deviation == mad
+    assert result.mean_insert_size == pytest.approx(trimmed.mean())
+    assert result.standard_deviation == pytest.approx(trimmed.std(ddof=1))
@@ -0,0 +1,42 @@
+"""Test indexing the regions of bed files."""
+
+import random
+
+from prp.parse.intervals import IntervalIndex, load_interval_index
+
+CONTIG = "NC_000962.3"
+
+
+def test_interval_index():
+    """Test that the index gives the same overlaps as a set of positions."""
+    rng = random.Random(1)
+    regions = []
+    for _ in range(50):
+        start = rng.randrange(0, 5000)
+        regions.append((CONTIG, start, start + rng.randrange(1, 200)))
+    positions = {pos for _, start, end in regions for pos in range(start, end)}
+
+    index = IntervalIndex(regions)
+
+    assert index.territory == len(positions)
+    for _ in range(500):
+        start = rng.randrange(0, 5500)
+        end = start + rng.randrange(1, 300)
+        expected = len(positions.intersection(range(start, end)))
+        assert index.overlap(CONTIG, start, end) == expected
+        assert index.overlaps(CONTIG, start, end) == (expected > 0)
+    assert not index.overlaps("other", 0, 5000)
+
+
+def test_load_interval_index(tmp_path):
+    """Test that the index of a bed file is only built once."""
+    bed = tmp_path / "targets.bed"
+    bed.write_text(f"{CONTIG}\t10\t20\n{CONTIG}\t15\t30\n", encoding="utf-8")
+
+    index = load_interval_index(str(bed))
+
+    assert load_interval_index(str(bed)) is index
+    assert index.regions() == [(CONTIG, 10, 30)]
+    # the index is rebuilt if the content of the file changes
+    bed.write_text(f"{CONTIG}\t10\t20\n", encoding="utf-8")
+    assert load_interval_index(str(bed)).territory == 10
@@ -0,0 +1,80 @@
+"""Test reading cram files with a reference cache."""
+
+import os
+
+import pysam
+
+from prp.parse.mapping import (
+    check_reference,
+    get_reference_md5,
+    get_reference_seq_accnr,
+    is_cram,
+    setup_reference_cache,
+)
+from prp.parse.qc import QC
+
+
+def test_setup_reference_cache(
+    cram_path, synthetic_bam_path, synthetic_reference_path, ref_cache_dir
+):
+    """Test decoding a cram file with sequences from the cache."""
+    setup_reference_cache(synthetic_reference_path, ref_cache_dir)
+
+    (md5,) = get_reference_md5(synthetic_reference_path, None).values()
+    assert os.path.isfile(os.path.join(ref_cache_dir, md5[:2], md5[2:4], md5[4:]))
+    with pysam.AlignmentFile(cram_path) as cram, pysam.AlignmentFile(
+        synthetic_bam_path
+    ) as bam:
+        for cram_read, bam_read in zip(cram, bam, strict=True):
+            assert cram_read.query_sequence == bam_read.query_sequence
+
+
+def test_check_reference(
+    cram_path, synthetic_bam_path, synthetic_reference_path, mismatched_reference_path
+):
+    """Test comparing the sequences of a cram file with a reference."""
+    assert is_cram(cram_path)
+    assert not is_cram(synthetic_bam_path)
+    assert check_reference(cram_path, synthetic_reference_path)
+    assert not check_reference(cram_path, mismatched_reference_path)
+    assert check_reference(synthetic_bam_path, mismatched_reference_path)
+    assert get_reference_seq_accnr(cram_path, synthetic_reference_path) == (
+        get_reference_seq_accnr(synthetic_bam_path)
+    )
+
+
+def test_qc_cram(
+    cram_path, synthetic_bam_path, synthetic_reference_path, ref_cache_dir
+):
+    """Test that the QC metrics of a cram file are the same as of a bam file."""
+    expected = QC("sample_1", synthetic_bam_path, synthetic_reference_path, 1).run()
+
+    qc = QC(
+        "sample_1",
+        cram_path,
+        synthetic_reference_path,
+        2,
+        ref_cache_dir=ref_cache_dir,
+    )
+
+    assert qc.run() == expected
+
+
+def test_qc_cram_quick(
+    cram_path, synthetic_bam_path, synthetic_reference_path, ref_cache_dir
+):
+    """Test counting the reads of a cram file without counts in its index."""
+    expected = QC(
+        "sample_1", synthetic_bam_path, synthetic_reference_path, 1, quick=True
+    ).run()
+
+    qc = QC(
+        "sample_1",
+        cram_path,
+        synthetic_reference_path,
+        1,
+        quick=True,
+        ref_cache_dir=ref_cache_dir,
+    )
+
+    assert qc.run() == expected
@@ -0,0 +1,148 @@
+"""Test running QC steps concurrently."""
+
+import subprocess
+import time
+
+import pytest
+
+from prp.parse.qc import QC
+from prp.parse.tool_graph import ToolStep, get_reserved_cpus, run_tool_steps
+from prp.testing.synth import MTUBERCULOSIS_CONTIG
+
+
+def test_run_tool_steps_requirements(tmp_path):
+    """Test that steps are run after the steps they require."""
+    path = tmp_path / "out.txt"
+    steps = [
+        ToolStep("read", func=path.read_text, requires=["write"]),
+        ToolStep("write", cmd=["sh", "-c", f"echo done > {path}"]),
+    ]
+
+    outputs = run_tool_steps(steps)
+
+    assert outputs["read"] == "done\n"
+    assert outputs["write"].returncode == 0
+
+
+@pytest.mark.parametrize("cpus, min_time, max_time", [(1, 0.6, 10), (2, 0, 0.55)])
+def test_run_tool_steps_cpus(cpus, min_time, max_time):
+    """Test that independent steps are run concurrently within the cpu budget."""
+    steps = [
+        ToolStep("sleep_cmd", cmd=["sleep", "0.3"]),
+        ToolStep("sleep_func", func=lambda: time.sleep(0.3)),
+    ]
+
+    start = time.perf_counter()
+    run_tool_steps(steps, cpus=cpus)
+
+    assert min_time <= time.perf_counter() - start < max_time
+
+
+def test_run_tool_steps_failure():
+    """Test that the output of a failed command is captured."""
+    steps = [
+        ToolStep("fail", cmd=["sh", "-c", "echo bad input >&2; exit 3"]),
+        ToolStep("after", func=lambda: None, requires=["fail"]),
+    ]
+
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        run_tool_steps(steps)
+
+    assert excinfo.value.returncode == 3
+    assert excinfo.value.stderr == "bad input\n"
+
+
+@pytest.mark.parametrize("requires", [["missing"], ["second"]])
+def test_run_tool_steps_invalid_requirements(requires):
+    """Test that unknown and circular requirements are rejected."""
+    steps = [
+        ToolStep("first", func=lambda: None, requires=requires),
+        ToolStep("second", func=lambda: None, requires=["first"]),
+    ]
+
+    with pytest.raises(ValueError):
+        run_tool_steps(steps)
+
+
+def test_get_reserved_cpus():
+    """Test that steps required by other steps do not reserve cpus."""
+    steps = [
+        ToolStep("intervals", func=lambda: None),
+        ToolStep("hsmetrics", cmd=["true"], requires=["intervals"], cpus=2),
+        ToolStep("ismetrics", cmd=["true"]),
+    ]
+
+    assert get_reserved_cpus(steps) == 3
+
+
+def test_qc_alignment_stats_cpus(
+    synthetic_bam_path, synthetic_reference_path, monkeypatch
+):
+    """Test that the alignment stats leave cpus for the Picard commands."""
+    used_cpus = []
+    collect_stats = QC.collect_stats
+
+    def record_cpus(self, insert_size, hs_panel=None, cpus=None):
+        used_cpus.append(cpus)
+        return collect_stats(self, insert_size, hs_panel, cpus)
+
+    monkeypatch.setattr(QC, "collect_stats", record_cpus)
+    monkeypatch.setattr(QC, "get_ismetrics_cmd", lambda self: ["true"])
+    monkeypatch.setattr(QC, "parse_picard_ismetrics", lambda self: None)
+    qc = QC(
+        "sample_1",
+        synthetic_bam_path,
+        synthetic_reference_path,
+        4,
+        picard_insert_size=True,
+    )
+
+    qc.run()
+
+    assert used_cpus == [3]
+
+
+def test_qc_alignment_stats_cpus_hsmetrics(
+    synthetic_bam_path, synthetic_reference_path, tmp_path, monkeypatch
+):
+    """Test that the interval lists required by Picard do not reserve cpus."""
+    used_cpus = []
+    collect_stats = QC.collect_stats
+
+    def record_cpus(self, insert_size, hs_panel=None, cpus=None):
+        used_cpus.append(cpus)
+        return collect_stats(self, insert_size, hs_panel, cpus)
+
+    monkeypatch.setattr(QC, "collect_stats", record_cpus)
+    monkeypatch.setattr(QC, "create_interval_list", lambda self, bed: bed)
+    monkeypatch.setattr(QC, "get_hsmetrics_cmd", lambda self: ["true"])
+    monkeypatch.setattr(QC, "parse_hsmetrics", lambda self, path: None)
+    beds = []
+    for name in ("targets", "baits"):
+        bed = tmp_path / f"{name}.bed"
+        bed.write_text(f"{MTUBERCULOSIS_CONTIG[0]}\t100\t2000\n")
+        beds.append(str(bed))
+    qc = QC(
+        "sample_1",
+        synthetic_bam_path,
+        synthetic_reference_path,
+        4,
+        bed=beds[0],
+        baits=beds[1],
+        picard_hsmetrics=True,
+    )
+
+    qc.run()
+
+    # the two interval lists are done before CollectHsMetrics is started
+    assert used_cpus == [3]
+
+
+def test_qc_system_p_failure(synthetic_bam_path, synthetic_reference_path):
+    """Test that the output of a failed function step command is captured."""
+    qc = QC("sample_1", synthetic_bam_path, synthetic_reference_path, 1)
+
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        qc.system_p(["sh", "-c", "echo bad input >&2; exit 3"])
+
+    assert excinfo.value.stderr == "bad input\n"
@@ -1,5 +1,13 @@
 """Test parse variants."""
-from prp.parse.variant import load_variants
+import pysam
+import pytest
+from cyvcf2 import VCF
+from pydantic import TypeAdapter
+
+from prp.models.phenotype import VariantType
+from prp.models.variant_store import VariantList, VariantStore
+from prp.parse.variant import _get_variant_caller, load_variants, parse_variant
+from prp.testing.synth import write_vcf
 
 
 def test_parse_sv_variants(mtuberculosis_sv_vcf_path):
@@ -14,3 +22,94 @@ def test_parse_snv_variants(mtuberculosis_snv_vcf_path):
 
     variants = load_variants(mtuberculosis_snv_vcf_path)
     assert len(variants) == 3
+
+
+def test_load_variants_empty(tmp_path):
+    """Test that files without variants are loaded as None."""
+    path = write_vcf(str(tmp_path / "empty.vcf"), n_records=0)
+
+    assert load_variants(path) is None
+
+
+def test_load_variants_serialization(mtuberculosis_snv_vcf_path):
+    """Test that stored variants are serialized as parsed variant models."""
+    vcf_obj = VCF(mtuberculosis_snv_vcf_path)
+    caller = _get_variant_caller(vcf_obj)
+    expected = [
+        variant
+        for var_id, record in enumerate(vcf_obj, start=1)
+        for variant in parse_variant(record, var_id=var_id, caller=caller)
+        if variant.variant_type == VariantType.SNV.value
+    ]
+    vcf_obj.close()
+
+    variants = load_variants(mtuberculosis_snv_vcf_path)["snv_variants"]
+
+    assert isinstance(variants, VariantStore)
+    assert list(variants) == expected
+    adapter = TypeAdapter(VariantList)
+    assert adapter.dump_json(variants) == adapter.dump_json(expected)
+
+
+@pytest.fixture(name="indexed_vcf_path")
+def fixture_indexed_vcf_path(tmp_path):
+    """Write a bgzip compressed VCF with a tabix index."""
+    path = write_vcf(str(tmp_path / "variants.vcf"), n_records=1000)
+    return pysam.tabix_index(path, preset="vcf", keep_original=True)
+
+
+def _get_variant_positions(variants):
+    return [
+        (variant.start, variant.alt_nt)
+        for bucket in sorted(variants)
+        for variant in variants[bucket]
+    ]
+
+
+def test_load_variants_regions(indexed_vcf_path, tmp_path):
+    """Test loading the variants of overlapping regions from an indexed VCF."""
+    all_variants = load_variants(indexed_vcf_path)
+    starts = sorted(variant.start for variant in all_variants["snv_variants"])
+    regions = [
+        ("NC_000962.3", starts[10] - 5, starts[20] + 1),
+        ("NC_000962.3", starts[15], starts[30] + 1),
+        ("NC_000962.3", starts[500], starts[500] + 1),
+        ("unknown_contig", 0, 1000),
+    ]
+    bed = tmp_path / "regions.bed"
+    bed.write_text(
+        "".join(f"{contig}\t{start}\t{end}\n" for contig, start, end in regions),
+        encoding="utf-8",
+    )
+
+    variants = load_variants(indexed_vcf_path, str(bed))
+    expected = {
+        bucket: [
+            variant
+            for variant in store
+            if any(
+                start < variant.end and variant.start < end for _, start, end in regions
+            )
+        ]
+        for bucket, store in all_variants.items()
+    }
+
+    assert len(variants["snv_variants"]) >= 22
+    assert _get_variant_positions(variants) == _get_variant_positions(expected)
+    # variant files without an index are read in full
+    unindexed = load_variants(indexed_vcf_path[: -len(".gz")], str(bed))
+    assert _get_variant_positions(unindexed) == _get_variant_positions(expected)
+
+
+def test_load_variants_regions_without_variants(indexed_vcf_path, tmp_path):
+    """Test that regions without variants are loaded as empty results."""
+    bed = tmp_path / "regions.bed"
+    bed.write_text("unknown_contig\t0\t1000\n", encoding="utf-8")
+
+    variants = load_variants(indexed_vcf_path, str(bed))
+
+    assert {bucket: len(store) for bucket, store in variants.items()} == {
+        "sv_variants": 0,
+        "indel_variants": 0,
+        "snv_variants": 0,
+    }
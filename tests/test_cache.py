@@ -0,0 +1,87 @@
+"""Test the cache of parse step outputs."""
+
+import os
+
+from prp.cache import ParseCache
+from prp.parse.qc import QC, get_interval_list_path
+from prp.parse.sample import _parse_quast
+
+
+def test_cache_key_depends_on_file_content(tmp_path):
+    """Test that the key changes when the content of an input file changes."""
+    cache = ParseCache(str(tmp_path / "cache"), max_size=1024**2)
+    input_path = tmp_path / "quast.tsv"
+    input_path.write_text("first")
+    first_key = cache.get_key(_parse_quast, {"quast": str(input_path)})
+    assert first_key == cache.get_key(_parse_quast, {"quast": str(input_path)})
+
+    input_path.write_text("second")
+    assert first_key != cache.get_key(_parse_quast, {"quast": str(input_path)})
+
+
+def test_cache_reuses_step_output(tmp_path, ecoli_quast_path):
+    """Test that a cached step is not parsed again."""
+    cache = ParseCache(str(tmp_path / "cache"), max_size=1024**2)
+    calls = []
+
+    def _parse(quast):
+        calls.append(quast)
+        return _parse_quast(quast)
+
+    first = cache(_parse, {"quast": ecoli_quast_path})
+    second = cache(_parse, {"quast": ecoli_quast_path})
+
+    assert len(calls) == 1
+    assert first == second
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Test that the least recently used entries are evicted first."""
+    cache = ParseCache(str(tmp_path / "cache"), max_size=2500)
+    value = "x" * 1000
+    for idx, key in enumerate(["a", "b"]):
+        cache.put(key, value)
+        os.utime(os.path.join(cache.cache_dir, f"{key}.pkl"), (idx, idx))
+    # use the oldest entry so it is kept
+    assert cache.get("a") == value
+    cache.put("c", value)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == value
+    assert cache.get("c") == value
+
+
+def test_interval_list_path_depends_on_content(tmp_path):
+    """Test that interval lists are identified by the bed and dict content."""
+    cache_dir = str(tmp_path / "intervals")
+    paths = {}
+    for name, bed_content, dict_content in [
+        ("first", "chr1\t0\t10\n", "@SQ\tSN:chr1\tLN:100\n"),
+        ("copy", "chr1\t0\t10\n", "@SQ\tSN:chr1\tLN:100\n"),
+        ("other_dict", "chr1\t0\t10\n", "@SQ\tSN:chr1\tLN:200\n"),
+    ]:
+        (tmp_path / name).mkdir()
+        bed = tmp_path / name / "panel.bed"
+        bed.write_text(bed_content)
+        dict_file = tmp_path / name / "ref.fasta.dict"
+        dict_file.write_text(dict_content)
+        paths[name] = get_interval_list_path(cache_dir, str(bed), str(dict_file))
+
+    assert paths["first"] == paths["copy"]
+    assert paths["first"] != paths["other_dict"]
+    assert os.path.dirname(paths["first"]) == cache_dir
+
+
+def test_create_interval_list_reuses_cached(tmp_path, synthetic_bam_path):
+    """Test that an interval list in the cache is not created again."""
+    bed = tmp_path / "panel.bed"
+    bed.write_text("NC_000962.3\t0\t10\n")
+    reference = str(tmp_path / "ref.fasta")
+    qc = QC("sample", synthetic_bam_path, reference, 1, str(bed), str(bed))
+    qc.interval_cache_dir = str(tmp_path / "intervals")
+    interval_list = qc.get_interval_list_path(str(bed))
+    os.makedirs(qc.interval_cache_dir)
+    with open(interval_list, "w", encoding="utf-8") as outp:
+        outp.write("cached")
+
+    assert qc.create_interval_list(str(bed)) == interval_list
@@ -1,19 +1,26 @@
 """Test PRP cli functions."""
 
 import json
+import os
+from pathlib import Path
 from typing import Literal
 
+import pytest
 from click.testing import CliRunner
 
 from prp.cli import (
     annotate_delly,
     create_bonsai_input,
     create_cdm_input,
+    create_qc_result,
     add_igv_annotation_track,
+    create_bonsai_input_batch,
+    rerun_bonsai_input,
 )
 from prp.models import PipelineResult
 from prp.models.base import RWModel
 from prp.models.phenotype import ElementType
+from prp.parse.qc import parse_postalignqc_results
 
 
 def test_create_output_saureus(
@@ -187,6 +194,184 @@ def test_cdm_input_cmd(
             assert cdm_output == ecoli_cdm_input
 
 
+def test_cdm_input_cmd_flagstat(synthetic_bam_path):
+    """Test adding read counts of a bam file to the CDM input."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        output_fname = "test_ouptut"
+        args = ["--bam", synthetic_bam_path, "--output", output_fname]
+        result = runner.invoke(create_cdm_input, args)
+
+        assert result.exit_code == 0
+        with open(output_fname, "rb") as inpt:
+            (flagstat,) = json.load(inpt)
+        assert flagstat["software"] == "flagstat"
+        assert sum(flagstat["result"]["paired"].values()) == 4000
+
+
+def test_cdm_input_cmd_flagstat_cram(
+    cram_path, synthetic_reference_path, mismatched_reference_path, ref_cache_dir
+):
+    """Test counting the reads of a cram file decoded with its reference."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        args = ["--bam", cram_path, "--ref-cache-dir", ref_cache_dir]
+        result = runner.invoke(
+            create_cdm_input,
+            [*args, "--reference", synthetic_reference_path, "--output", "cdm.json"],
+        )
+        assert result.exit_code == 0
+        with open("cdm.json", "rb") as inpt:
+            (flagstat,) = json.load(inpt)
+        assert sum(flagstat["result"]["paired"].values()) == 4000
+
+        # cram files can not be read without their reference
+        for reference in ([], ["--reference", mismatched_reference_path]):
+            result = runner.invoke(
+                create_cdm_input, [*args, *reference, "--output", "other.json"]
+            )
+            assert result.exit_code == 2
+
+
+def test_create_output_cram_mismatched_reference(
+    cram_path, ecoli_analysis_meta_path, mismatched_reference_path
+):
+    """Test that cram files written with another reference are rejected."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("genes.gff", "w", encoding="utf-8") as outp:
+            outp.write("##gff-version 3\n")
+        args = [
+            "-i",
+            "test_ecoli_1",
+            "--run-metadata",
+            ecoli_analysis_meta_path,
+            "--bam",
+            cram_path,
+            "--reference-genome-fasta",
+            mismatched_reference_path,
+            "--reference-genome-gff",
+            "genes.gff",
+            "--output",
+            "result.json",
+        ]
+        result = runner.invoke(create_bonsai_input, args)
+
+        assert result.exit_code != 0
+        assert "another reference" in result.output
+        assert not os.path.exists("result.json")
+
+
+def test_create_qc_result(synthetic_bam_path, synthetic_reference_path):
+    """Test calculating QC metrics of a bam file without external tools."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        outputs = {}
+        for cpus in ("1", "2"):
+            output_fname = f"qc_{cpus}.json"
+            args = [
+                "--sample-id",
+                "sample_1",
+                "--bam",
+                synthetic_bam_path,
+                "--reference",
+                synthetic_reference_path,
+                "--cpus",
+                cpus,
+                "--output",
+                output_fname,
+            ]
+            result = runner.invoke(create_qc_result, args)
+            assert result.exit_code == 0
+            with open(output_fname, encoding="utf-8") as inpt:
+                outputs[cpus] = json.load(inpt)
+
+        res = parse_postalignqc_results("qc_1.json").result
+        assert 300 < res.ins_size < 400
+        assert 0 < res.ins_size_dev < 100
+        assert res.n_read_pairs <= res.n_reads
+        # the results of the parallel run are identical
+        assert outputs["1"] == outputs["2"]
+
+
+def test_create_qc_result_hsmetrics(synthetic_bam_path, synthetic_reference_path):
+    """Test calculating hybrid capture metrics without Picard."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("baits.bed", "w", encoding="utf-8") as outp:
+            outp.write("NC_000962.3\t1000\t3000\nNC_000962.3\t9000\t9500\n")
+        with open("targets.bed", "w", encoding="utf-8") as outp:
+            outp.write("NC_000962.3\t1100\t2900\nNC_000962.3\t9100\t9400\n")
+        outputs = {}
+        for cpus in ("1", "2"):
+            output_fname = f"qc_{cpus}.json"
+            args = [
+                "--sample-id",
+                "sample_1",
+                "--bam",
+                synthetic_bam_path,
+                "--reference",
+                synthetic_reference_path,
+                "--bed",
+                "targets.bed",
+                "--baits",
+                "baits.bed",
+                "--cpus",
+                cpus,
+                "--output",
+                output_fname,
+            ]
+            result = runner.invoke(create_qc_result, args)
+            assert result.exit_code == 0
+            with open(output_fname, encoding="utf-8") as inpt:
+                outputs[cpus] = json.load(inpt)
+
+        assert 0 < outputs["1"]["pct_on_target"] <= 1
+        assert outputs["1"]["fold_enrichment"] > 0
+        assert outputs["1"]["median_coverage"] > 0
+        # the results of the parallel run are identical
+        assert outputs["1"] == outputs["2"]
+
+
+def test_create_qc_result_quick(synthetic_bam_path, synthetic_reference_path):
+    """Test counting mapped reads from the bam index."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        for quick in (True, False):
+            args = [
+                "--sample-id",
+                "sample_1",
+                "--bam",
+                synthetic_bam_path,
+                "--reference",
+                synthetic_reference_path,
+                "--output",
+                f"qc_{quick}.json",
+            ]
+            result = runner.invoke(create_qc_result, args + ["--quick"] * quick)
+            assert result.exit_code == 0
+
+        quick_res = parse_postalignqc_results("qc_True.json").result
+        full_res = parse_postalignqc_results("qc_False.json").result
+        assert quick_res.mean_cov is None
+        # the index counts include reads failing qc
+        assert quick_res.n_reads is None
+        assert quick_res.n_total_reads == 4000
+        # reads are counted the same way in both modes
+        for field in (
+            "n_total_reads",
+            "n_total_mapped_reads",
+            "n_mapped_reads_by_contig",
+        ):
+            assert getattr(quick_res, field) == getattr(full_res, field)
+        assert full_res.n_total_mapped_reads == sum(
+            full_res.n_mapped_reads_by_contig.values()
+        )
+        # reads failing qc are not counted in the full results
+        assert full_res.n_reads < full_res.n_total_reads
+        assert full_res.n_mapped_reads < full_res.n_total_mapped_reads
+
+
 def test_annotate_delly(
     mtuberculosis_delly_bcf_path, converged_bed_path, annotated_delly_path
 ):
@@ -315,3 +500,290 @@ def test_create_output_mtuberculosis(
         # 2. that the output datamodel can be used to format input data as well
         output_data_model = PipelineResult(**prp_output)
         assert prp_output == json.loads(output_data_model.model_dump_json())
+
+
+def test_create_output_variant_regions(
+    mtuberculosis_analysis_meta_path, mtuberculosis_snv_vcf_path
+):
+    """Test only including the variants in regions of a bed file."""
+    sample_id = "test_mtuberculosis_1"
+    output_file = f"{sample_id}.json"
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("regions.bed", "w", encoding="utf-8") as bed:
+            bed.write("NC_000962.3\t1800\t1900\n")
+        args = [
+            "-i",
+            sample_id,
+            "--run-metadata",
+            mtuberculosis_analysis_meta_path,
+            "--snv-vcf",
+            mtuberculosis_snv_vcf_path,
+            "--variant-regions",
+            "regions.bed",
+            "--output",
+            output_file,
+        ]
+        result = runner.invoke(create_bonsai_input, args)
+        assert result.exit_code == 0
+
+        with open(output_file) as inpt:
+            prp_output = json.load(inpt)
+        assert [variant["start"] for variant in prp_output["snv_variants"]] == [1848]
+
+
+def test_rerun_bonsai_input_parallel(ecoli_jasen_outdir):
+    """Test that samples are rerun in parallel and that failures are isolated."""
+    input_dir, jasen_dir = ecoli_jasen_outdir
+    # add a sample without any analysis results
+    result_dir = Path(input_dir).joinpath("analysis_result")
+    result_dir.joinpath("ecoli_test_2_result.json").write_text("{}")
+
+    runner = CliRunner()
+    args = ["--input-dir", input_dir, "--jasen-dir", jasen_dir, "--jobs", "2"]
+    result = runner.invoke(rerun_bonsai_input, args)
+
+    # test that the broken sample did not stop the run
+    assert result.exit_code == 1
+    assert "ecoli_test_1: OK" in result.output
+    assert "ecoli_test_2: FAILED" in result.output
+
+    # test that the result of the good sample was regenerated
+    with open(result_dir.joinpath("ecoli_test_1_result.json")) as inpt:
+        prp_output = json.load(inpt)
+    assert prp_output["sample_id"] == "ecoli_test_1"
+
+
+def test_create_output_parallel_workers(
+    mtuberculosis_analysis_meta_path,
+    mtuberculosis_bracken_path,
+    mtuberculosis_bwa_path,
+    mtuberculosis_mykrobe_path,
+    mtuberculosis_snv_vcf_path,
+    mtuberculosis_sv_vcf_path,
+    mtuberculosis_quast_path,
+    mtuberculosis_tbprofiler_path,
+):
+    """Test that parsing results in parallel gives the same output."""
+    sample_id = "test_mtuberculosis_1"
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        args = [
+            "-i",
+            sample_id,
+            "--run-metadata",
+            mtuberculosis_analysis_meta_path,
+            "--kraken",
+            mtuberculosis_bracken_path,
+            "--quality",
+            mtuberculosis_bwa_path,
+            "--mykrobe",
+            mtuberculosis_mykrobe_path,
+            "--snv-vcf",
+            mtuberculosis_snv_vcf_path,
+            "--sv-vcf",
+            mtuberculosis_sv_vcf_path,
+            "--quast",
+            mtuberculosis_quast_path,
+            "--tbprofiler",
+            mtuberculosis_tbprofiler_path,
+        ]
+        result = runner.invoke(create_bonsai_input, [*args, "--output", "serial.json"])
+        assert result.exit_code == 0
+        result = runner.invoke(
+            create_bonsai_input, [*args, "--workers", "3", "--output", "parallel.json"]
+        )
+        assert result.exit_code == 0
+
+        # test that the output is identical
+        with open("serial.json") as serial, open("parallel.json") as parallel:
+            assert json.load(serial) == json.load(parallel)
+
+
+@pytest.mark.parametrize("workers", ["1", "3"])
+def test_create_output_profile(
+    workers, ecoli_analysis_meta_path, ecoli_quast_path, ecoli_bwa_path, ecoli_mlst_path
+):
+    """Test writing the time and memory used by each stage."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        args = [
+            "-i",
+            "test_ecoli_1",
+            "--run-metadata",
+            ecoli_analysis_meta_path,
+            "--quast",
+            ecoli_quast_path,
+            "--quality",
+            ecoli_bwa_path,
+            "--mlst",
+            ecoli_mlst_path,
+            "--workers",
+            workers,
+            "--profile",
+            "profile.json",
+            "--output",
+            "result.json",
+        ]
+        result = runner.invoke(create_bonsai_input, args)
+        assert result.exit_code == 0
+
+        with open("profile.json", encoding="utf-8") as inpt:
+            profile = json.load(inpt)
+        assert profile["command"] == "create_bonsai_input"
+        assert [stage["name"] for stage in profile["stages"]] == [
+            "parse:run_metadata",
+            "parse:quast",
+            "parse:quality",
+            "parse:mlst",
+            "validate",
+            "serialize",
+        ]
+        for stage in profile["stages"]:
+            assert stage["wall_time"] >= 0
+            assert stage["peak_rss_mb"] > 0
+
+
+def test_create_output_cached(
+    ecoli_analysis_meta_path, ecoli_quast_path, ecoli_bwa_path, ecoli_chewbbaca_path
+):
+    """Test that results created from the parse cache are identical."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        args = [
+            "-i",
+            "test_ecoli_1",
+            "--run-metadata",
+            ecoli_analysis_meta_path,
+            "--quast",
+            ecoli_quast_path,
+            "--quality",
+            ecoli_bwa_path,
+            "--cgmlst",
+            ecoli_chewbbaca_path,
+            "--cache-dir",
+            "cache",
+        ]
+        result = runner.invoke(create_bonsai_input, [*args, "--output", "first.json"])
+        assert result.exit_code == 0
+        assert len(os.listdir("cache")) == 3
+
+        result = runner.invoke(create_bonsai_input, [*args, "--output", "second.json"])
+        assert result.exit_code == 0
+        with open("first.json") as first, open("second.json") as second:
+            assert json.load(first) == json.load(second)
+
+
+def test_rerun_bonsai_input_incremental(ecoli_jasen_outdir):
+    """Test that unchanged samples are skipped and changed steps are rerun."""
+    input_dir, jasen_dir = ecoli_jasen_outdir
+    result_path = Path(input_dir).joinpath(
+        "analysis_result", "ecoli_test_1_result.json"
+    )
+    args = ["--input-dir", input_dir, "--jasen-dir", jasen_dir]
+    runner = CliRunner()
+
+    # test that the first run creates a manifest
+    result = runner.invoke(rerun_bonsai_input, args)
+    assert result.exit_code == 0
+    assert Path(input_dir).joinpath("analysis_result", "prp_manifest.json").is_file()
+
+    # test that a sample with unchanged inputs is skipped
+    result = runner.invoke(rerun_bonsai_input, args)
+    assert result.exit_code == 0
+    assert "ecoli_test_1: unchanged" in result.output
+
+    # test that a partial rerun gives the same result as a full rerun
+    quast_path = Path(input_dir).joinpath("quast", "ecoli_test_1_quast.tsv")
+    quast = quast_path.read_text().splitlines()
+    header = quast[0].split("\t")
+    values = quast[1].split("\t")
+    values[header.index("N50")] = "12345"
+    quast_path.write_text("\n".join([quast[0], "\t".join(values), *quast[2:]]) + "\n")
+    result = runner.invoke(rerun_bonsai_input, args)
+    assert result.exit_code == 0
+    assert "ecoli_test_1: OK" in result.output
+    partial = json.loads(result_path.read_text())
+    assert partial["qc"][0]["result"]["n50"] == 12345
+
+    result = runner.invoke(rerun_bonsai_input, [*args, "--force"])
+    assert result.exit_code == 0
+    assert "ecoli_test_1: OK" in result.output
+    assert partial == json.loads(result_path.read_text())
+
+
+def test_create_bonsai_input_batch(
+    ecoli_analysis_meta_path,
+    ecoli_quast_path,
+    ecoli_bwa_path,
+    ecoli_resfinder_path,
+    ecoli_resfinder_meta_path,
+    ecoli_virulencefinder_meta_path,
+    mtuberculosis_analysis_meta_path,
+    mtuberculosis_mykrobe_path,
+):
+    """Test creating results for all samples in a samplesheet."""
+    header = [
+        "sample-id",
+        "run-metadata",
+        "quast",
+        "quality",
+        "resfinder",
+        "process-metadata",
+        "mykrobe",
+    ]
+    ecoli_row = [
+        ecoli_analysis_meta_path,
+        ecoli_quast_path,
+        ecoli_bwa_path,
+        ecoli_resfinder_path,
+        f"{ecoli_resfinder_meta_path},{ecoli_virulencefinder_meta_path}",
+        "",
+    ]
+    # mykrobe result of another sample
+    mixup_row = [
+        mtuberculosis_analysis_meta_path,
+        "",
+        "",
+        "",
+        "",
+        mtuberculosis_mykrobe_path,
+    ]
+    rows = [
+        header,
+        ["test_ecoli_1", *ecoli_row],
+        ["test_ecoli_2", *ecoli_row],
+        ["test_mixup_1", *mixup_row],
+    ]
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolated_filesystem():
+        with open("samplesheet.tsv", "w") as outp:
+            outp.write("\n".join("\t".join(row) for row in rows) + "\n")
+
+        # test writing one result file per sample
+        args = ["--samplesheet", "samplesheet.tsv", "--output-dir", "results"]
+        result = runner.invoke(create_bonsai_input_batch, args)
+        assert result.exit_code == 1
+        assert "test_mixup_1: FAILED" in result.output
+        for sample_id in ["test_ecoli_1", "test_ecoli_2"]:
+            with open(f"results/{sample_id}_result.json") as inpt:
+                prp_output = json.load(inpt)
+            assert prp_output["sample_id"] == sample_id
+            assert len(prp_output["pipeline"]["softwares"]) == 3
+
+        # test streaming results as newline-delimited json
+        args = ["--samplesheet", "samplesheet.tsv", "--ndjson"]
+        result = runner.invoke(create_bonsai_input_batch, args)
+        assert result.exit_code == 1
+        lines = result.stdout.splitlines()
+        assert [json.loads(line)["sample_id"] for line in lines] == [
+            "test_ecoli_1",
+            "test_ecoli_2",
+        ]
+        assert "test_mixup_1: FAILED" in result.stderr
+
+        # test processing samples in parallel gives the same output in order
+        parallel = runner.invoke(create_bonsai_input_batch, [*args, "--jobs", "2"])
+        assert parallel.exit_code == 1
+        assert parallel.stdout == result.stdout
+        assert "test_mixup_1: FAILED" in parallel.stderr
@@ -0,0 +1,68 @@
+"""Test recording the time and memory used by stages."""
+
+import asyncio
+import threading
+
+from prp.profiling import Profiler, _reset_peak_rss
+
+
+def test_stage_nested():
+    """Test that nested stages keep the peak memory of the outer stage."""
+    profiler = Profiler()
+
+    with profiler.stage("outer"):
+        data = b"x" * 200 * 1024**2
+        del data
+        with profiler.stage("inner"):
+            pass
+
+    inner, outer = profiler.stages
+    assert [inner["name"], outer["name"]] == ["inner", "outer"]
+    assert not inner["concurrent"] and not outer["concurrent"]
+    if _reset_peak_rss():
+        assert outer["peak_rss_mb"] >= inner["peak_rss_mb"] + 150
+
+
+def test_stage_concurrent_threads():
+    """Test that stages overlapping in threads are marked as concurrent."""
+    profiler = Profiler()
+    barrier = threading.Barrier(2)
+
+    def run_stage(name):
+        with profiler.stage(name):
+            barrier.wait()
+
+    threads = [threading.Thread(target=run_stage, args=(n,)) for n in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with profiler.stage("after"):
+        pass
+
+    assert {stage["name"]: stage["concurrent"] for stage in profiler.stages} == {
+        "a": True,
+        "b": True,
+        "after": False,
+    }
+
+
+def test_stage_concurrent_tasks():
+    """Test that stages overlapping in asyncio tasks are marked as concurrent."""
+    profiler = Profiler()
+
+    async def run_stage(name):
+        with profiler.stage(name):
+            await asyncio.sleep(0.01)
+
+    async def run_stages():
+        with profiler.stage("outer"):
+            await asyncio.gather(run_stage("a"), run_stage("b"))
+
+    asyncio.run(run_stages())
+
+    assert {stage["name"]: stage["concurrent"] for stage in profiler.stages} == {
+        "a": True,
+        "b": True,
+        "outer": False,
+    }
@@ -0,0 +1,116 @@
+"""Test running PRP commands on a server."""
+
+import json
+import threading
+
+import click
+import pytest
+from click.testing import CliRunner
+
+from prp import serve
+from prp.cli import cli, client
+from prp.serve import JobHandler, _ForkingUnixServer, run_job
+
+
+@pytest.fixture()
+def prp_server(tmp_path):
+    """Start a PRP server and return the path to its socket."""
+    socket_path = str(tmp_path.joinpath("prp.sock"))
+    server = _ForkingUnixServer(socket_path, JobHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield socket_path
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_validate(prp_server, simple_pipeline_result):
+    """Test validating a result file on the server."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("result.json", "w") as outp:
+            outp.write(simple_pipeline_result.model_dump_json())
+        result = runner.invoke(
+            client, ["--socket", prp_server, "validate", "--output", "result.json"]
+        )
+        assert result.exit_code == 0
+        assert 'The file "result.json" is valid' in result.output
+
+
+def test_client_create_cdm_input(
+    prp_server, ecoli_quast_path, ecoli_bwa_path, ecoli_chewbbaca_path, ecoli_cdm_input
+):
+    """Test that jobs write output relative to the client working directory."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        args = [
+            "--socket",
+            prp_server,
+            "create-cdm-input",
+            "--quast",
+            ecoli_quast_path,
+            "--quality",
+            ecoli_bwa_path,
+            "--cgmlst",
+            ecoli_chewbbaca_path,
+            "--output",
+            "cdm.json",
+        ]
+        result = runner.invoke(client, args)
+        assert result.exit_code == 0
+
+        with open("cdm.json", "rb") as inpt:
+            assert json.load(inpt) == ecoli_cdm_input
+
+
+def test_client_failing_job(prp_server):
+    """Test that usage errors are returned to the client."""
+    runner = CliRunner()
+    result = runner.invoke(client, ["--socket", prp_server, "validate"])
+    assert result.exit_code == 2
+    assert "Missing option" in result.output
+
+
+def test_run_job_unsupported_command():
+    """Test that only supported commands can be run."""
+    response = run_job(["annotate-delly", "--help"])
+    assert response["exit_code"] == 2
+
+
+def test_run_job_failing_parser(ecoli_analysis_meta_path, tmp_path):
+    """Test that errors raised by parsers are returned as a failed job."""
+    quast_path = tmp_path.joinpath("quast.tsv")
+    quast_path.write_text("malformed\n")
+    args = [
+        "create-bonsai-input",
+        "-i",
+        "S1",
+        "-u",
+        ecoli_analysis_meta_path,
+        "-q",
+        str(quast_path),
+        "-o",
+        str(tmp_path.joinpath("result.json")),
+    ]
+
+    response = run_job(args)
+
+    assert response["exit_code"] == 1
+    assert "Traceback" in response["stderr"]
+
+
+def test_run_job_exit_code(monkeypatch):
+    """Test that the exit code of a command is returned."""
+
+    @click.command("exit-job")
+    @click.pass_context
+    def exit_job(ctx):
+        click.echo("exiting")
+        ctx.exit(3)
+
+    monkeypatch.setitem(cli.commands, "exit-job", exit_job)
+    monkeypatch.setattr(serve, "SERVE_COMMANDS", ("exit-job",))
+
+    response = run_job(["exit-job"])
+
+    assert response == {"exit_code": 3, "stdout": "exiting\n", "stderr": ""}
@@ -0,0 +1,58 @@
+"""Test that the PRP cli starts without importing the parsers.
+
+The startup time is measured by the opt-in benchmark suite, see
+tests/benchmark/test_startup.py.
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+# modules that should only be imported by the commands that use them
+HEAVY_MODULES = ("numpy", "pandas", "pysam", "cyvcf2", "Bio", "prp.parse")
+
+CLI_SCRIPT = """
+import sys
+from prp.cli import cli
+try:
+    cli(sys.argv[1:])
+except SystemExit:
+    pass
+print(",".join(mod for mod in {modules} if mod in sys.modules), file=sys.stderr)
+"""
+
+
+def _get_imported_modules(*args: str) -> list[str]:
+    """Run the cli in a new interpreter and get the heavy modules it imported."""
+    script = CLI_SCRIPT.format(modules=HEAVY_MODULES)
+    proc = subprocess.run(
+        [sys.executable, "-c", script, *args],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return [mod for mod in proc.stderr.strip().split(",") if mod]
+
+
+@pytest.fixture()
+def result_path(simple_pipeline_result, tmp_path):
+    """Write a pipeline result to file."""
+    path = tmp_path.joinpath("result.json")
+    path.write_text(simple_pipeline_result.model_dump_json())
+    return str(path)
+
+
+def test_help_startup():
+    """Test that printing the help does not import parsers."""
+    assert _get_imported_modules("--help") == []
+
+
+def test_validate_startup(result_path):
+    """Test that validating a result does not import parsers."""
+    assert _get_imported_modules("validate", "--output", result_path) == []
+
+
+def test_print_schema_startup():
+    """Test that printing the schema does not import parsers."""
+    assert _get_imported_modules("print-schema") == []
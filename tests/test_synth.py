@@ -0,0 +1,94 @@
+"""Test generating synthetic pipeline results."""
+
+import json
+
+from click.testing import CliRunner
+
+from prp.cli import synth
+from prp.models.phenotype import ElementType
+from prp.parse import (
+    load_variants,
+    parse_cgmlst_results,
+    parse_resfinder_amr_pred,
+    parse_tbprofiler_amr_pred,
+)
+from prp.parse.qc import QC
+from prp.testing.synth import (
+    make_resfinder_result,
+    make_tbprofiler_result,
+    write_basecov,
+    write_chewbbaca_matrix,
+    write_vcf,
+)
+
+
+def test_write_chewbbaca_matrix(tmp_path):
+    """Test that generated cgMLST matrices can be parsed."""
+    path = write_chewbbaca_matrix(str(tmp_path / "cgmlst.tsv"), n_loci=500, n_samples=3)
+
+    with open(path, encoding="utf-8") as inpt:
+        assert len(inpt.readlines()) == 4
+    result = parse_cgmlst_results(path)
+    assert len(result.result.alleles) == 500
+    assert result.result.n_novel > 0
+    assert result.result.n_missing > 0
+
+
+def test_write_chewbbaca_matrix_is_reproducible(tmp_path):
+    """Test that the same seed gives the same matrix."""
+    first = write_chewbbaca_matrix(str(tmp_path / "first.tsv"), n_loci=100, seed=1)
+    second = write_chewbbaca_matrix(str(tmp_path / "second.tsv"), n_loci=100, seed=1)
+
+    with open(first, encoding="utf-8") as inpt1, open(
+        second, encoding="utf-8"
+    ) as inpt2:
+        assert inpt1.read() == inpt2.read()
+
+
+def test_write_basecov(tmp_path):
+    """Test that generated coverage files can be parsed."""
+    path = write_basecov(str(tmp_path / "basecov.bed"), n_bases=1000, mean_depth=30)
+
+    qc = QC.__new__(QC)
+    qc.results = {}
+    qc.parse_basecov_bed(path, ["1", "10"])
+    assert 20 < qc.results["mean_cov"] < 40
+
+
+def test_write_vcf(tmp_path):
+    """Test that generated VCF and BCF files can be loaded."""
+    for fname in ("variants.vcf", "variants.bcf"):
+        path = write_vcf(str(tmp_path / fname), n_records=200)
+
+        variants = load_variants(path)
+        n_variants = sum(len(var) for var in variants.values())
+        assert n_variants == 200
+
+
+def test_make_tbprofiler_result():
+    """Test that generated tbprofiler results can be parsed."""
+    result = parse_tbprofiler_amr_pred(make_tbprofiler_result(n_variants=100))
+
+    assert len(result.result.variants) == 100
+
+
+def test_make_resfinder_result():
+    """Test that generated resfinder results can be parsed."""
+    pred = make_resfinder_result(n_genes=50, n_variations=10)
+    result = parse_resfinder_amr_pred(pred, ElementType.AMR)
+
+    assert len(result.result.genes) == 50
+    assert len(result.result.variants) == 10
+
+
+def test_synth_cli(tmp_path):
+    """Test writing synthetic results with the cli."""
+    output = tmp_path / "tbprofiler.json"
+    runner = CliRunner()
+    result = runner.invoke(
+        synth, ["tbprofiler", "--output", str(output), "--variants", "20"]
+    )
+
+    assert result.exit_code == 0
+    with open(output, encoding="utf-8") as inpt:
+        assert len(json.load(inpt)["dr_variants"]) == 2